@@ -0,0 +1,74 @@
+from desktop_client_hfr_voltage.processor import StreamBuffer
+from desktop_client_hfr_voltage.running import RunningStatistics
+from desktop_client_hfr_voltage.spectrum import SpectrumEngine
+import argparse
+import time
+import numpy
+
+BUFFER_SIZE = 60000
+
+
+def create_channels(count: int, segment_size: int, span: int):
+    storages = [StreamBuffer(BUFFER_SIZE) for _ in range(count)]
+    engines = [SpectrumEngine(segment_size, span) for _ in range(count)]
+    statistics = [RunningStatistics(span, BUFFER_SIZE) for _ in range(count)]
+    return storages, engines, statistics
+
+
+def ingest(storages, statistics, block: int, tick: int, rng):
+    times = (numpy.arange(block) + tick * block) * 1e-3
+
+    for storage, stats in zip(storages, statistics):
+        storage.extend(rng.normal(512, 8, block), times)
+        stats.update(storage)
+
+
+def run(count: int, segment_size: int, span: int, block: int, ticks: int) -> float:
+    rng = numpy.random.default_rng(0)
+    storages, engines, statistics = create_channels(count, segment_size, span)
+    elapsed = 0.0
+
+    for tick in range(ticks):
+        ingest(storages, statistics, block, tick, rng)
+        start = time.perf_counter()
+
+        for engine, storage in zip(engines, storages):
+            engine.update(storage)
+
+        for stats, storage in zip(statistics, storages):
+            stats.mean(), stats.deviation(), stats.extremes(storage)
+
+        elapsed += time.perf_counter() - start
+
+    return elapsed / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Per-tick processing cost as the number of channels grows.')
+    parser.add_argument('--segment-size', type=int, default=4096)
+    parser.add_argument('--span', type=int, default=16384)
+    parser.add_argument('--block', type=int, default=2048,
+                        help='samples ingested per channel between ticks')
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='timed passes per configuration; the median is reported')
+    args = parser.parse_args()
+
+    def median(count: int) -> float:
+        return float(numpy.median([run(count, args.segment_size, args.span, args.block, args.ticks)
+                                   for _ in range(args.repeats)]))
+
+    # An untimed pass pays for the lazy SciPy import, FFT plans and caches,
+    # which would otherwise be charged to the first configuration.
+    run(1, args.segment_size, args.span, args.block, args.ticks)
+
+    print('{:>8} {:>12} {:>14}'.format('channels', 'total, ms', 'per channel'))
+
+    for count in (1, 2, 4, 8, 16):
+        total = median(count)
+        print('{:>8} {:>12.3f} {:>14.3f}'.format(count, total * 1000, total * 1000 / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import os
+import resource
+import tempfile
+import threading
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6 import QtCore  # noqa: E402
+
+# Benchmarks must never touch the operator's configuration file, so QSettings
+# is pointed at a scratch directory before the package creates its instance.
+QtCore.QSettings.setPath(QtCore.QSettings.Format.NativeFormat,
+                         QtCore.QSettings.Scope.UserScope, tempfile.mkdtemp(prefix='hfr-bench-'))
+
+from desktop_client_hfr_voltage.settings import Settings  # noqa: E402
+
+CHANNEL_KEYS = [
+    'title', 'direct_x_converted', 'fft_x_converted', 'factor', 'instant_rate',
+    'processing_rate', 'direct_processing_size', 'fft_processing_size', 'fft_segment_size',
+    'fft_window', 'fft_averaging', 'fft_y_log_mode', 'direct_x_view_range',
+    'direct_y_view_range', 'fft_x_view_range', 'fft_y_view_range',
+]
+
+
+def configure(channels: int, payload_format: str = 'text', processing_rate: int = 20) -> list[str]:
+    Settings.set_default()
+    Settings.settings.remove('C1')
+    names = ['C%d' % index for index in range(channels)]
+
+    for name in names:
+        for key in CHANNEL_KEYS:
+            Settings.set_for_channel(name, key, Settings.get_for_channel('C0', key))
+
+        Settings.set_for_channel(name, 'title', name)
+        Settings.set_for_channel(name, 'topic', '/bench/' + name.lower())
+        Settings.set_for_channel(name, 'payload_format', payload_format)
+        Settings.set_for_channel(name, 'processing_rate', processing_rate)
+        Settings.set_for_channel(name, 'instant_rate', 5)
+
+    Settings.reload()
+    return names
+
+
+def peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Message:
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+# In-process stand-in for paho's Client: publish() runs the subscribed callback
+# synchronously on the publishing thread, as paho's network thread would.
+class FakeClient:
+    def __init__(self, **options):
+        self.callbacks = {}
+        self.subscriptions = []
+        self.stopped = threading.Event()
+        self.on_connect = self.on_connect_fail = self.on_disconnect = self.on_message = None
+
+    def message_callback_add(self, topic, callback):
+        self.callbacks[topic] = callback
+
+    def message_callback_remove(self, topic):
+        self.callbacks.pop(topic, None)
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def connect(self, host):
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_forever(self):
+        self.stopped.wait()
+
+    def disconnect(self):
+        self.stopped.set()
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.extend([topic] if isinstance(topic, str) else [item[0] for item in topic])
+        return 0, len(self.subscriptions)
+
+    def unsubscribe(self, topic):
+        return 0, 0
+
+    def publish(self, topic, payload):
+        callback = self.callbacks.get(topic)
+
+        if callback is not None:
+            callback(self, None, Message(topic, payload))
+        elif self.on_message is not None:
+            self.on_message(self, None, Message(topic, payload))
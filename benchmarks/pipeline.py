@@ -0,0 +1,279 @@
+from .harness import FakeClient, configure, peak_rss_kb
+from PyQt6 import QtCore, QtWidgets
+from desktop_client_hfr_voltage.controller import bind
+from desktop_client_hfr_voltage.payload import encode_binary
+from desktop_client_hfr_voltage.processor import Processor, ProcessorManager
+from desktop_client_hfr_voltage.settings import Settings
+from desktop_client_hfr_voltage.stream import Stream
+from desktop_client_hfr_voltage.view import MainWindow, StreamWidget
+import argparse
+import collections
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+import numpy
+
+CHANNELS = [1, 2, 4, 8, 16]
+PAYLOADS = ['text', 'binary']
+BATCH_SIZE = 256
+PERIOD = 1e-4
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+
+    p50, p90, p99 = numpy.percentile(values, [50, 90, 99])
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': max(values)}
+
+
+class Producer(threading.Thread):
+    def __init__(self, client: FakeClient, topics: list[str], payload_format: str, rate: float):
+        super().__init__(name='Producer', daemon=True)
+        self.client = client
+        self.topics = topics
+        self.payload_format = payload_format
+        self.rate = rate
+        self.published = 0
+        self.stopped = threading.Event()
+
+    def payload(self, sequence: int, values: numpy.ndarray) -> bytes:
+        if self.payload_format == 'text':
+            return str(values[0]).encode()
+
+        first = time.time() - (len(values) - 1) * PERIOD
+        return encode_binary(values, sequence, first, PERIOD)
+
+    def run(self):
+        size = 1 if self.payload_format == 'text' else BATCH_SIZE
+        values = 512 + 64 * numpy.sin(numpy.arange(size) / 16)
+        sequence = 0
+        started = time.perf_counter()
+
+        while not self.stopped.is_set():
+            for topic in self.topics:
+                self.client.publish(topic, self.payload(sequence, values))
+
+            self.published += size * len(self.topics)
+            sequence += 1
+
+            if self.rate > 0:
+                delay = started + sequence * size / self.rate - time.perf_counter()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+
+def run_pipeline(channels: int, payload_format: str, duration: float, rate: float) -> dict:
+    names = configure(channels, payload_format)
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    view = MainWindow()
+    manager = ProcessorManager()
+    client = FakeClient()
+    stream = Stream(lambda **options: client)
+    sources, latencies = [], []
+
+    for name in names:
+        processor = manager.create(name)
+        widget = StreamWidget(name, view)
+        source = stream.branch(name)
+        stamps = collections.deque()
+
+        bind(processor, widget)
+        view.add_stream_widget(widget)
+        processor.attach_source(source)
+        sources.append(source)
+
+        # Runs on the processor thread at emission time, then again on the GUI
+        # thread after the widget has rendered the same emission.
+        processor.updateDirectChartData.connect(
+            lambda x, y, p=processor, s=stamps: s.append(p.storage.latest_times(1)[-1]),
+            QtCore.Qt.ConnectionType.DirectConnection)
+        processor.updateDirectChartData.connect(
+            lambda x, y, s=stamps: latencies.append(time.time() - s.popleft()) if s else None)
+
+    view.show()
+    manager.start()
+    producer = Producer(client, [source.topic for source in sources], payload_format, rate)
+
+    # Let timers and layouts settle before measuring.
+    QtCore.QTimer.singleShot(500, app.quit)
+    app.exec()
+    latencies.clear()
+    processed_before = sum(processor.received for processor in manager.processors)
+    lost_before = sum(source.lost() for source in sources)
+    shed_before = sum(source.queue.shed for source in sources)
+
+    producer.start()
+    started = time.perf_counter()
+    QtCore.QTimer.singleShot(int(duration * 1000), app.quit)
+    app.exec()
+    elapsed = time.perf_counter() - started
+    producer.stopped.set()
+    producer.join()
+
+    # Gap samples stand for shed or missing data and are not counted as processed.
+    processed = sum(processor.received for processor in manager.processors) - processed_before
+    lost = sum(source.lost() for source in sources) - lost_before
+    shed = sum(source.queue.shed for source in sources) - shed_before
+    backlog = sum(source.queue.depth() for source in sources)
+    manager.terminate()
+
+    return {
+        'scenario': 'pipeline',
+        'channels': channels,
+        'payload': payload_format,
+        'rate_per_channel': rate,
+        'duration_s': elapsed,
+        'offered_samples_per_s': producer.published / elapsed,
+        'processed_samples_per_s': processed / elapsed,
+        'shed_samples': shed,
+        'lost_samples': lost,
+        # A run that had to shed data is over capacity, whatever it processed.
+        'sustainable': shed == 0 and lost == 0,
+        'final_backlog_samples': backlog,
+        'ingest_to_plot_latency_ms': {key: value * 1000 for key, value in percentiles(latencies).items()},
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_ticks(block: int, repeats: int) -> dict:
+    configure(1)
+    processor = Processor('C0')
+    allowed = Settings.general().processing_size_range
+    # Range stops are inclusive in the settings.
+    sizes = [*allowed, allowed.stop]
+    sizes = sorted({sizes[0], *sizes[len(sizes) // 4::len(sizes) // 4], sizes[-1]})
+    rng = numpy.random.default_rng(0)
+    timestamp = time.time()
+    results = []
+
+    def ingest():
+        nonlocal timestamp
+        values = rng.normal(512, 8, block)
+        processor.storage.extend(values, timestamp + numpy.arange(block) * PERIOD)
+        processor.statistics.update(processor.storage)
+        timestamp += block * PERIOD
+
+    while processor.storage.filled() < processor.storage.size():
+        ingest()
+
+    for tab, name in ((0, 'direct'), (1, 'fft')):
+        processor.set_current_tab(tab)
+
+        for size in sizes:
+            processor.set_direct_processing_size(size)
+            processor.set_fft_processing_size(size)
+            processor.set_fft_segment_size(size)
+            timings = []
+
+            for _ in range(repeats):
+                ingest()
+                started = time.perf_counter()
+                processor.process()
+                timings.append(time.perf_counter() - started)
+
+            results.append({'tab': name, 'processing_size': size,
+                            'process_ms': {key: value * 1000 for key, value in percentiles(timings).items()}})
+
+    return {'scenario': 'ticks', 'block': block, 'results': results, 'peak_rss_kb': peak_rss_kb()}
+
+
+# Bisects the offered rate per channel between the highest that lost nothing
+# and the lowest that shed data, starting from a run as fast as the producer
+# goes. Returns the runs made and the fastest one that lost nothing, if any.
+def search_sustainable(run, channels: int, steps: int) -> tuple[list[dict], dict | None]:
+    fastest = run(0)
+
+    if fastest['sustainable']:
+        return [fastest], fastest
+
+    runs, best = [fastest], None
+    low, high = 0.0, fastest['offered_samples_per_s'] / channels
+
+    for _ in range(steps):
+        rate = (low + high) / 2
+        scenario = run(rate)
+        runs.append(scenario)
+
+        if scenario['sustainable']:
+            low, best = rate, scenario
+        else:
+            high = rate
+
+    return runs, best
+
+
+def run_isolated(arguments: list[str]) -> dict:
+    # Every scenario gets its own interpreter so peak RSS is not inherited.
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.pipeline', '--scenario', *arguments],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Headless end-to-end throughput, latency and per-tick benchmarks.')
+    parser.add_argument('--channels', type=int, nargs='+', default=CHANNELS)
+    parser.add_argument('--payloads', nargs='+', default=PAYLOADS, choices=PAYLOADS)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='offered samples/s per channel; 0 publishes as fast as possible')
+    parser.add_argument('--search-steps', type=int, default=6,
+                        help='bisection steps of the maximum sustainable rate; 0 runs --rate only')
+    parser.add_argument('--block', type=int, default=1000,
+                        help='samples ingested between ticks in the per-tick scenario')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--scenario', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        if args.scenario[0] == 'pipeline':
+            result = run_pipeline(int(args.scenario[1]), args.scenario[2],
+                                  float(args.scenario[3]), float(args.scenario[4]))
+        else:
+            result = run_ticks(int(args.scenario[1]), int(args.scenario[2]))
+
+        print(json.dumps(result))
+        return
+
+    scenarios = [run_isolated(['ticks', str(args.block), str(args.repeats)])]
+    sustainable: dict[str, dict[str, float]] = {}
+
+    for channels in args.channels:
+        for payload_format in args.payloads:
+            def run(rate: float) -> dict:
+                print('pipeline: {} channel(s), {} payload, rate {:.0f}'.format(
+                    channels, payload_format, rate), file=sys.stderr)
+                return run_isolated(['pipeline', str(channels), payload_format, str(args.duration), str(rate)])
+
+            if args.search_steps <= 0:
+                scenarios.append(run(args.rate))
+                continue
+
+            runs, best = search_sustainable(run, channels, args.search_steps)
+            scenarios.extend(runs)
+            sustainable.setdefault(payload_format, {})[str(channels)] = \
+                0.0 if best is None else best['offered_samples_per_s']
+
+    report = json.dumps({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'max_sustainable_samples_per_s': sustainable,
+        'scenarios': scenarios,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy
+
+MODES = {
+    'window': [],
+    'headless': ['--headless'],
+}
+
+
+def launch(mode: str, config: str) -> dict:
+    environment = dict(os.environ, QT_QPA_PLATFORM='offscreen', XDG_CONFIG_HOME=config)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'desktop_client_hfr_voltage', *MODES[mode],
+         '--profile-startup', 'json', '--exit-after-startup'],
+        env=environment, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    # The profile is printed once the event loop runs; shutting down is not
+    # part of the measurement.
+    for line in process.stdout:
+        if line.startswith('{'):
+            elapsed = time.perf_counter() - started
+            profile = json.loads(line)
+            break
+    else:
+        raise RuntimeError('{} launch exited with status {} before starting up'.format(
+            mode, process.wait()))
+
+    process.stdout.read()
+
+    if process.wait() != 0:
+        raise RuntimeError('{} launch exited with status {}'.format(mode, process.returncode))
+
+    return dict(profile, launch_ms=elapsed * 1000)
+
+
+def run(mode: str, repeats: int) -> dict:
+    # A scratch configuration keeps the operator's settings out of the
+    # measurement; the first launch writes the defaults and is discarded.
+    config = tempfile.mkdtemp(prefix='hfr-bench-')
+    launch(mode, config)
+    profiles = [launch(mode, config) for _ in range(repeats)]
+    phases = profiles[0]['phases_ms']
+    packages = sorted({package for profile in profiles for package in profile['imports_ms']},
+                      key=lambda package: -numpy.median(
+                          [profile['imports_ms'].get(package, 0.0) for profile in profiles]))
+
+    return {
+        'mode': mode,
+        'repeats': repeats,
+        'launch_ms': numpy.median([profile['launch_ms'] for profile in profiles]),
+        'startup_ms': numpy.median([profile['total_ms'] for profile in profiles]),
+        'phases_ms': {phase: numpy.median([profile['phases_ms'][phase] for profile in profiles])
+                      for phase in phases},
+        'imports_ms': {package: numpy.median([profile['imports_ms'].get(package, 0.0)
+                                              for profile in profiles])
+                       for package in packages[:10]},
+        'deferred': profiles[0]['deferred'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time from launch until the window (or the headless daemon) is up.')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--budget', type=float, metavar='MS',
+                        help='exit with status 1 if the median launch of any mode takes longer')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    scenarios = [run(mode, args.repeats) for mode in args.modes]
+    report = json.dumps({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scenarios': scenarios,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+    slow = [scenario for scenario in scenarios
+            if args.budget is not None and scenario['launch_ms'] > args.budget]
+
+    for scenario in slow:
+        print('{}: {:.0f} ms exceeds the {:.0f} ms budget'.format(
+            scenario['mode'], scenario['launch_ms'], args.budget), file=sys.stderr)
+
+    return 1 if slow else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
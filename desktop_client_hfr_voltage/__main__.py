@@ -1,12 +1,150 @@
-from PyQt6.QtWidgets import QApplication
-from .controller import Controller
-from .settings import Settings
+from PyQt6.QtCore import QCoreApplication, QTimer
+from .settings import Settings, SettingsError
+from . import metrics
+import argparse
+import json
+import signal
 import sys
 
-Settings.init()
+# The GUI, the daemon and the processing modules are imported once the mode
+# is known, so the headless daemon never loads pyqtgraph and the window is
+# not held back by modules it does not need yet.
 
-app = QApplication([])
-controller = Controller()
 
-app.aboutToQuit.connect(controller.terminate)
-sys.exit(app.exec())
+def report_threads(report: dict):
+    from .processor import thread_name
+    gui_thread = thread_name()
+
+    for channel, stages in report.items():
+        for stage, thread in sorted(stages.items()):
+            warning = '  <- GUI thread' if thread == gui_thread else ''
+            print('{} {}: {}{}'.format(channel, stage, thread, warning))
+
+
+def mark(profile: metrics.StartupProfile | None, phase: str):
+    if profile is not None:
+        profile.mark(phase)
+
+
+# Reports once the event loop has started, i.e. once the window is up.
+def report_startup(profile: metrics.StartupProfile | None, args):
+    if profile is None:
+        return
+
+    def report():
+        profile.mark('first event loop')
+        profile.stop()
+        print(json.dumps(profile.report()) if args.profile_startup == 'json' else profile.text(),
+              flush=True)
+
+        if args.exit_after_startup:
+            QCoreApplication.quit()
+
+    QTimer.singleShot(0, report)
+
+
+def instrument(headless: bool):
+    from .filters import FilterChain
+    from .history import History
+    from .processor import Processor, StreamBuffer
+    from .running import RunningStatistics
+    from .spectrum import SpectrumEngine
+    from .stream import Source
+    from .trigger import Trigger
+
+    metrics.instrument(Source, StreamBuffer, RunningStatistics, SpectrumEngine, Trigger, History,
+                       FilterChain, Processor)
+
+    if not headless:
+        from .view import Chart
+        metrics.instrument(Chart)
+        metrics.instrument_inherited(Chart, 'paintEvent', 'paint')
+
+
+def run_headless(args, qt_args: list[str], profile: metrics.StartupProfile | None) -> int:
+    from .headless import Daemon
+    mark(profile, 'imports')
+    app = QCoreApplication(sys.argv[:1] + qt_args)
+    mark(profile, 'application')
+    daemon = Daemon()
+    mark(profile, 'daemon')
+    report_startup(profile, args)
+
+    signal.signal(signal.SIGINT, lambda *argv: app.quit())
+    signal.signal(signal.SIGTERM, lambda *argv: app.quit())
+
+    # Python only runs signal handlers between bytecodes, so the event loop
+    # has to hand control back periodically.
+    timer = QTimer()
+    timer.timeout.connect(lambda: None)
+    timer.start(500)
+
+    app.aboutToQuit.connect(daemon.terminate)
+    return app.exec()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='desktop_client_hfr_voltage')
+    parser.add_argument('--thread-check', action='store_true',
+                        help='print the thread each processing stage ran on at exit')
+    parser.add_argument('--replay', nargs='+', metavar='FILE',
+                        help='replay capture (.cap), .npy or CSV files instead of connecting to MQTT')
+    parser.add_argument('--replay-speed', type=float, metavar='N',
+                        help='replay speed: 1 is real time, 0 is as fast as possible')
+    parser.add_argument('--metrics', action='store_true',
+                        help='time every pipeline stage and show a live performance panel')
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help='rewrite FILE with the metrics as JSON every second')
+    parser.add_argument('--metrics-port', type=int, default=0, metavar='PORT',
+                        help='serve the metrics on http://127.0.0.1:PORT (text) and /json')
+    parser.add_argument('--headless', action='store_true',
+                        help='process channels without a window and publish results over MQTT')
+    parser.add_argument('--results-only', action='store_true',
+                        help='show results published by a headless instance instead of raw samples')
+    parser.add_argument('--profile-startup', nargs='?', const='text', choices=['text', 'json'],
+                        help='print how long each startup phase and imported package took')
+    parser.add_argument('--exit-after-startup', action='store_true', help=argparse.SUPPRESS)
+    args, qt_args = parser.parse_known_args()
+
+    profile = metrics.StartupProfile() if args.profile_startup else None
+    Settings.init()
+
+    try:
+        general = Settings.general()
+    except SettingsError as error:
+        print('Invalid settings: %s' % error, file=sys.stderr)
+        return 2
+
+    mark(profile, 'settings')
+
+    if args.metrics or args.metrics_file or args.metrics_port or general.metrics:
+        instrument(args.headless)
+
+    if args.headless:
+        return run_headless(args, qt_args, profile)
+
+    from PyQt6.QtWidgets import QApplication
+    from .controller import Controller
+    mark(profile, 'imports')
+    app = QApplication(sys.argv[:1] + qt_args)
+    mark(profile, 'application')
+    controller = Controller(args.replay, args.replay_speed, args.metrics_file, args.metrics_port,
+                            args.results_only)
+    mark(profile, 'window')
+    report_startup(profile, args)
+
+    app.aboutToQuit.connect(controller.terminate)
+    code = app.exec()
+
+    if args.thread_check:
+        report_threads(controller.processorManager.thread_report())
+
+    if args.replay and args.replay_speed == 0:
+        for channel, rate in controller.stream.throughput().items():
+            print('{} throughput: {:.0f} samples/s'.format(channel, rate))
+
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
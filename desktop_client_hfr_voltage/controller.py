@@ -1,28 +1,127 @@
 from PyQt6 import QtCore
 from .stream import Stream
-from .processor import ProcessorManager
+from .replay import ReplayStream
+from .processor import Processor, ProcessorManager
+from .recorder import Recorder
+from .results import Subscriber
 from .view import StreamWidget, MainWindow
+from .settings import Settings, SettingsWatcher
+from . import metrics
+
+
+def bind(processor: Processor, widget: StreamWidget):
+    processor.updateInstant.connect(widget.set_instant_value)
+    processor.updateMean.connect(widget.set_mean)
+    processor.updateDeviation.connect(widget.set_deviation)
+    processor.updateRms.connect(widget.set_rms)
+    processor.updatePeakToPeak.connect(widget.set_peak_to_peak)
+    processor.updateDirectChartData.connect(widget.set_direct_chart_data)
+    processor.updateFFTChartData.connect(widget.set_fft_chart_data)
+    processor.updateDirectLabel.connect(widget.set_direct_label)
+    processor.updateFFTLabel.connect(widget.set_fft_label)
+    processor.updateQueueDepth.connect(widget.set_queue_depth)
+    processor.updateLost.connect(widget.set_lost)
+    processor.updateWaterfallRows.connect(widget.add_waterfall_rows)
+    processor.updatePeaks.connect(widget.set_peaks)
+
+    widget.processingRateChanged.connect(processor.set_processing_rate)
+    widget.currentTabChanged.connect(processor.set_current_tab)
+    widget.directProcessingSizeChanged.connect(
+        processor.set_direct_processing_size)
+    widget.fftProcessingSizeChanged.connect(
+        processor.set_fft_processing_size)
+    widget.directXConvertedStateChanged.connect(
+        processor.set_direct_x_converted)
+    widget.fftXConvertedStateChanged.connect(processor.set_fft_x_converted)
+    widget.fftSegmentSizeChanged.connect(processor.set_fft_segment_size)
+    widget.fftWindowChanged.connect(processor.set_fft_window)
+    widget.fftAveragingChanged.connect(processor.set_fft_averaging)
+    widget.directViewChanged.connect(processor.set_direct_view)
+    widget.triggerChanged.connect(processor.set_trigger)
+    widget.filterDisplayChanged.connect(processor.set_filter_display)
+    widget.fftViewChanged.connect(processor.set_fft_view)
+    widget.waterfallFftSizeChanged.connect(processor.set_waterfall_fft_size)
+    widget.waterfallHopChanged.connect(processor.set_waterfall_hop)
+    widget.waterfallHistoryChanged.connect(processor.set_waterfall_history)
+
+
+# Results carry statistics and spectra only, so the direct chart stays empty.
+def bind_results(subscriber: Subscriber, widget: StreamWidget):
+    subscriber.updateInstant.connect(widget.set_instant_value)
+    subscriber.updateMean.connect(widget.set_mean)
+    subscriber.updateDeviation.connect(widget.set_deviation)
+    subscriber.updateRms.connect(widget.set_rms)
+    subscriber.updatePeakToPeak.connect(widget.set_peak_to_peak)
+    subscriber.updateFFTChartData.connect(widget.set_fft_chart_data)
+    subscriber.updateFFTLabel.connect(widget.set_fft_label)
+    subscriber.updatePeaks.connect(widget.set_peaks)
+
+    widget.fftXConvertedStateChanged.connect(subscriber.set_fft_x_converted)
 
 
 class Controller(QtCore.QObject):
-    def __init__(self) -> None:
+    def __init__(self, replay_paths: list[str] | None = None, replay_speed: float | None = None,
+                 metrics_file: str | None = None, metrics_port: int = 0,
+                 results_only: bool = False) -> None:
         super().__init__()
-        self.stream = Stream()
+        general = Settings.general()
+        channels = list(Settings.snapshot().channels)
+        self.subscribers: list[Subscriber] = []
+        self.replay_timer: QtCore.QTimer | None = None
+        self.metrics_timer: QtCore.QTimer | None = None
+        self.metrics_server: metrics.Server | None = None
+        self.metrics_file = metrics_file
+
+        self.results_only = False
+
+        if replay_paths or general.source == 'replay':
+            files = ReplayStream.files_from_paths(replay_paths, channels) if replay_paths \
+                else ReplayStream.files_from_settings(channels)
+            self.stream = ReplayStream(files, replay_speed if replay_speed is not None
+                                       else general.replay_speed)
+        else:
+            self.stream = Stream()
+            self.results_only = results_only or general.source == 'results'
+
         self.processorManager = ProcessorManager()
+        self.recorder = Recorder()
         self.view = MainWindow()
+        self.view.set_connection_status('Connecting...')
+        self.watcher = SettingsWatcher()
+        self.watcher.channelChanged.connect(self.on_settings_changed)
+        self.watcher.settingsRejected.connect(self.view.set_settings_status)
 
         self.stream.connected.connect(self.on_connect)
         self.stream.connectionFailed.connect(self.on_connection_fail)
         self.stream.disconnected.connect(self.on_disconnect)
 
-        self.create_stream('C0')
-        self.create_stream('C1')
+        if isinstance(self.stream, Stream):
+            self.stream.firstSample.connect(self.on_first_sample)
+
+        self.view.recordingToggled.connect(self.on_recording_toggled)
+
+        for channel in channels:
+            self.create_stream(channel)
+
+        if isinstance(self.stream, ReplayStream):
+            self.create_replay_controls()
+
+        if metrics.enabled:
+            self.create_metrics_panel(metrics_port)
+
+        self.processorManager.start()
         self.view.show()
 
     def on_connect(self):
         self.view.set_connection_status('Connected.')
-        self.stream.clear()
-        self.resource()
+
+        # Sources outlive reconnections: their connection subscribes them again
+        # and marks what was missed meanwhile as a gap.
+        if not self.stream.sources:
+            self.resource()
+
+        for subscriber in self.subscribers:
+            subscriber.subscribe()
 
     def on_connection_fail(self):
         self.view.set_connection_status(
@@ -30,37 +129,103 @@ class Controller(QtCore.QObject):
 
     def on_disconnect(self):
         self.view.set_connection_status('Disconnected. Reconnecting...')
-        self.stream.reconnect()
+
+    def on_first_sample(self, channel: str, seconds: float):
+        self.view.set_connection_status(
+            'Connected. {} resumed {:.0f} ms after reconnecting.'.format(channel, seconds * 1000))
+
+    def on_settings_changed(self, config, changes: set[str]):
+        widget = next((widget for widget in self.view.stream_widgets
+                       if widget.channel == config.channel), None)
+        processor = next((processor for processor in self.processorManager.processors
+                          if processor.channel == config.channel), None)
+
+        if widget is not None:
+            widget.configure(config, changes)
+
+        if processor is None:
+            return
+
+        QtCore.QMetaObject.invokeMethod(
+            processor, 'configure', QtCore.Qt.ConnectionType.QueuedConnection,
+            QtCore.Q_ARG(object, config), QtCore.Q_ARG(object, changes))
+
+        source = next((source for source in self.stream.sources if source.channel == config.channel), None)
+
+        # Replay sources are built from the recording, not from these fields.
+        if changes & config.SOURCE_FIELDS and isinstance(self.stream, Stream) and source is not None:
+            self.processorManager.attach(processor, self.stream.rebranch(source))
+
+    def on_recording_toggled(self, recording: bool):
+        if recording:
+            self.recorder.start(self.stream.sources)
+        else:
+            self.recorder.stop(self.stream.sources)
+
+    def create_replay_controls(self):
+        self.view.add_replay_controls()
+        self.view.replayPaused.connect(self.stream.pause)
+        self.view.replaySought.connect(self.stream.seek)
+
+        self.replay_timer = QtCore.QTimer(self)
+        self.replay_timer.timeout.connect(
+            lambda: self.view.set_replay_position(self.stream.fraction()))
+        self.replay_timer.start(500)
+
+    def create_metrics_panel(self, port: int):
+        self.reporter = metrics.Reporter(
+            self.processorManager.processors, lambda: self.stream.sources)
+        self.view.add_metrics_panel()
+
+        self.metrics_timer = QtCore.QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(1000)
+
+        if port:
+            self.metrics_server = metrics.Server(self.reporter, port)
+            self.metrics_server.start()
+
+    def update_metrics(self):
+        self.reporter.update()
+        self.view.set_metrics_text(self.reporter.text())
+
+        if self.metrics_file:
+            self.reporter.dump(self.metrics_file)
 
     def create_stream(self, channel):
-        processor = self.processorManager.create(channel)
         widget = StreamWidget(channel, self.view)
 
-        processor.updateInstant.connect(widget.set_instant_value)
-        processor.updateMean.connect(widget.set_mean)
-        processor.updateDeviation.connect(widget.set_deviation)
-        processor.updateDirectChartData.connect(widget.set_direct_chart_data)
-        processor.updateFFTChartData.connect(widget.set_fft_chart_data)
-        processor.updateDirectLabel.connect(widget.set_direct_label)
-        processor.updateFFTLabel.connect(widget.set_fft_label)
-
-        widget.processingRateChanged.connect(processor.set_processing_rate)
-        widget.currentTabChanged.connect(processor.set_current_tab)
-        widget.directProcessingSizeChanged.connect(
-            processor.set_direct_processing_size)
-        widget.fftProcessingSizeChanged.connect(
-            processor.set_fft_processing_size)
-        widget.directXConvertedStateChanged.connect(
-            processor.set_direct_x_converted)
-        widget.fftXConvertedStateChanged.connect(processor.set_fft_x_converted)
+        if self.results_only:
+            subscriber = Subscriber(channel, self.stream.client)
+            self.subscribers.append(subscriber)
+            bind_results(subscriber, widget)
+        else:
+            bind(self.processorManager.create(channel), widget)
 
         self.view.add_stream_widget(widget)
 
     def resource(self):
         for processor in self.processorManager.processors:
-            processor.attach_source(self.stream.branch(processor.channel))
+            source = self.stream.branch(processor.channel)
+            self.recorder.attach(source)
+            self.processorManager.attach(processor, source)
 
     def terminate(self):
+        self.watcher.stop()
+
+        if self.replay_timer is not None:
+            self.replay_timer.stop()
+
+        if self.metrics_timer is not None:
+            self.metrics_timer.stop()
+
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+
+        for subscriber in self.subscribers:
+            subscriber.terminate()
+
+        self.recorder.stop(self.stream.sources)
         self.view.terminate()
         self.processorManager.terminate()
         self.stream.terminate()
@@ -0,0 +1,59 @@
+import numpy
+
+
+def visible_slice(x: numpy.ndarray, low: float, high: float) -> slice:
+    n = len(x)
+
+    if n == 0:
+        return slice(0, 0)
+
+    if x[0] <= x[-1]:
+        start = numpy.searchsorted(x, low, 'left')
+        stop = numpy.searchsorted(x, high, 'right')
+    else:
+        start = n - numpy.searchsorted(x[::-1], high, 'right')
+        stop = n - numpy.searchsorted(x[::-1], low, 'left')
+
+    # One extra point on each side keeps the curve running to the plot edges.
+    return slice(max(int(start) - 1, 0), min(int(stop) + 1, n))
+
+
+def minmax(x: numpy.ndarray, y: numpy.ndarray, view: tuple | None):
+    if view is None or len(x) == 0:
+        return x, y
+
+    low, high, pixels = view
+
+    if pixels <= 0 or high <= low:
+        return x, y
+
+    visible = visible_slice(x, low, high)
+    count = visible.stop - visible.start
+
+    # A margin of half a view on each side keeps panning smooth until the next tick.
+    margin = (high - low) / 2
+    around = visible_slice(x, low - margin, high + margin)
+    x, y = x[around], y[around]
+
+    if count <= 2 * pixels:
+        return x, y
+
+    size = count // pixels
+    m = len(y) // size * size
+    blocks = y[:m].reshape(-1, size)
+    low_index = blocks.argmin(axis=1)
+    high_index = blocks.argmax(axis=1)
+    base = numpy.arange(len(blocks)) * size
+
+    # Each bin yields its minimum and maximum in time order, so peaks survive.
+    index = numpy.column_stack((
+        base + numpy.minimum(low_index, high_index),
+        base + numpy.maximum(low_index, high_index),
+    )).ravel()
+
+    if m < len(y):
+        rest = y[m:]
+        index = numpy.concatenate((index, m + numpy.sort(
+            [rest.argmin(), rest.argmax()])))
+
+    return x[index], y[index]
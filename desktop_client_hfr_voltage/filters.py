@@ -0,0 +1,258 @@
+from abc import ABC, abstractmethod
+from .metrics import timed
+from .resampling import MAX_FACTOR, RESAMPLE_LINEAR, RESAMPLE_POLYPHASE, RESAMPLING, Interpolator, \
+    Polyphase, ratio
+import numpy
+
+DISPLAY_FILTERED = 'filtered'
+DISPLAY_RAW = 'raw'
+DISPLAYS = [DISPLAY_FILTERED, DISPLAY_RAW]
+
+# Arguments of every stage, the optional ones with their defaults:
+# lowpass/highpass:<cutoff>[:<order>], bandpass/bandstop:<low>:<high>[:<order>],
+# notch:<frequency>[:<Q>], fir:<cutoff>[:<taps>], decimate:<factor>,
+# resample:<rate>[:<method>].
+STAGES = {
+    'lowpass': (1, [4]),
+    'highpass': (1, [4]),
+    'bandpass': (2, [4]),
+    'bandstop': (2, [4]),
+    'notch': (1, [30]),
+    'fir': (1, [101]),
+    'decimate': (1, []),
+    'resample': (1, [RESAMPLE_LINEAR]),
+}
+
+
+# Stages are separated by spaces, e.g. "notch:50 lowpass:200 decimate:10".
+def parse_filters(value) -> list[tuple[str, tuple]]:
+    # QSettings reads unquoted commas as a list.
+    if isinstance(value, list):
+        value = ' '.join(value)
+
+    stages = []
+
+    for token in str(value).replace(',', ' ').split():
+        kind, *arguments = token.split(':')
+
+        if kind not in STAGES:
+            raise ValueError('unknown filter %r, expected one of %s' % (kind, ', '.join(STAGES)))
+
+        required, optional = STAGES[kind]
+
+        if not required <= len(arguments) <= required + len(optional):
+            raise ValueError('%s takes %d to %d arguments, got %r' % (
+                kind, required, required + len(optional), token))
+
+        # The resampling method is a name, everything else a number.
+        arguments = [argument if kind == 'resample' and index == 1 else float(argument)
+                     for index, argument in enumerate(arguments)]
+        arguments += optional[len(arguments) - required:]
+
+        if kind == 'resample' and arguments[1] not in RESAMPLING:
+            raise ValueError('unknown resampling %r, expected one of %s' % (
+                arguments[1], ', '.join(RESAMPLING)))
+        stages.append((kind, tuple(arguments)))
+
+    return stages
+
+
+# Frequencies are in Hz at the given sampling rate, or in cycles/sample when
+# it is 0; after a decimation they refer to the decimated rate, after a
+# resampling to the rate of its grid.
+def check_filters(stages: list[tuple[str, tuple]], rate: float = 0):
+    nyquist = rate / 2 if rate > 0 else 0.5
+
+    for index, (kind, arguments) in enumerate(stages):
+        if kind == 'resample':
+            # Any stage before it would take the irregular samples as evenly spaced.
+            if index > 0:
+                raise ValueError('resample must be the first stage')
+
+            if arguments[0] < 0:
+                raise ValueError('resample rate must not be negative')
+
+            if arguments[1] == RESAMPLE_POLYPHASE:
+                if rate <= 0:
+                    raise ValueError('polyphase resampling needs the nominal rate as filter_rate')
+
+                if arguments[0] > 0 and max(ratio(arguments[0], rate)) > MAX_FACTOR:
+                    raise ValueError('resample rate is too far from the nominal rate of %g' % rate)
+
+            if arguments[0] > 0:
+                nyquist = arguments[0] / 2
+
+            continue
+
+        if kind == 'decimate':
+            if arguments[0] < 2 or arguments[0] != int(arguments[0]):
+                raise ValueError('decimate factor must be an integer of at least 2')
+
+            nyquist /= arguments[0]
+            continue
+
+        frequencies = arguments[:STAGES[kind][0]]
+
+        if not all(0 < frequency < nyquist for frequency in frequencies):
+            raise ValueError('%s frequencies must be between 0 and %g' % (kind, nyquist))
+
+        if len(frequencies) == 2 and frequencies[0] >= frequencies[1]:
+            raise ValueError('%s low frequency must be below the high one' % kind)
+
+        if arguments[-1] <= 0 or (kind != 'notch' and arguments[-1] != int(arguments[-1])):
+            raise ValueError('%s %s must be positive' % (kind, {'notch': 'Q', 'fir': 'taps'}.get(kind, 'order')))
+
+
+# A linear filter applied to a stream block by block: the state left by one
+# block is the initial state of the next, so the output does not depend on
+# how the stream was cut. Gap (NaN) samples stay gaps and restart the filter
+# from the first sample after them instead of poisoning its state.
+class Stage(ABC):
+    def __init__(self):
+        self.state = None
+
+    def process(self, values: numpy.ndarray, times: numpy.ndarray):
+        if len(values) == 0:
+            return values, times
+
+        finite = ~numpy.isnan(values)
+
+        if finite.all():
+            return self.run(values), times
+
+        output = numpy.full(len(values), numpy.nan)
+        edges = numpy.flatnonzero(numpy.diff(finite)) + 1
+
+        for start, stop in zip(numpy.r_[0, edges], numpy.r_[edges, len(values)]):
+            if finite[start]:
+                output[start:stop] = self.run(values[start:stop])
+            else:
+                self.state = None
+
+        return output, times
+
+    @abstractmethod
+    def run(self, values: numpy.ndarray) -> numpy.ndarray:
+        pass
+
+
+class Sos(Stage):
+    def __init__(self, sos: numpy.ndarray):
+        super().__init__()
+        self.sos = sos
+
+    def run(self, values):
+        from scipy.signal import sosfilt, sosfilt_zi
+
+        # Starting from the steady state of the first sample avoids the step
+        # response a zero state would add.
+        if self.state is None:
+            self.state = sosfilt_zi(self.sos) * values[0]
+
+        output, self.state = sosfilt(self.sos, values, zi=self.state)
+        return output
+
+
+# A linear-phase FIR delays every frequency by (taps - 1) / 2 samples, so its
+# output is stamped with the times of the input samples that far back.
+class Fir(Stage):
+    def __init__(self, taps: numpy.ndarray, period: float = 0):
+        super().__init__()
+        self.taps = taps
+        self.period = period
+        self.delay = (len(taps) - 1) / 2
+        self.carried = int(numpy.ceil(self.delay))
+        self.stamps: numpy.ndarray | None = None
+
+    def process(self, values: numpy.ndarray, times: numpy.ndarray):
+        values, _ = super().process(values, times)
+        return values, self.delayed(times)
+
+    def delayed(self, times: numpy.ndarray) -> numpy.ndarray:
+        if len(times) == 0:
+            return times
+
+        # Before the first sample, times go back at the nominal period, or at
+        # the first block's spacing when the rate is not known.
+        if self.stamps is None:
+            period = self.period or ((times[-1] - times[0]) / (len(times) - 1) if len(times) > 1 else 0.0)
+            self.stamps = times[0] - numpy.arange(self.carried, 0, -1) * period
+
+        stamps = numpy.concatenate((self.stamps, times))
+        # An even number of taps delays by a half sample more: between two stamps.
+        low = self.carried - int(numpy.ceil(self.delay))
+        high = self.carried - int(self.delay)
+        delayed = (stamps[low:low + len(times)] + stamps[high:high + len(times)]) / 2
+        self.stamps = stamps[len(stamps) - self.carried:]
+        return delayed
+
+    def run(self, values):
+        from scipy.signal import lfilter, lfilter_zi
+
+        if self.state is None:
+            self.state = lfilter_zi(self.taps, 1.0) * values[0]
+
+        output, self.state = lfilter(self.taps, 1.0, values, zi=self.state)
+        return output
+
+
+# Low-pass filters below the new Nyquist frequency, like scipy.signal.decimate,
+# then keeps every factor-th sample, counting across blocks.
+class Decimator:
+    def __init__(self, factor: int):
+        from scipy.signal import cheby1
+
+        self.factor = factor
+        self.antialias = Sos(cheby1(8, 0.05, 0.8 / factor, output='sos'))
+        self.phase = 0
+
+    def process(self, values: numpy.ndarray, times: numpy.ndarray):
+        values, times = self.antialias.process(values, times)
+        kept = slice(self.phase, None, self.factor)
+        self.phase = (self.phase - len(values)) % self.factor
+        return values[kept], times[kept]
+
+
+class FilterChain:
+    def __init__(self, stages: list[tuple[str, tuple]], rate: float = 0):
+        from scipy import signal
+
+        self.stages = []
+        nyquist = rate / 2 if rate > 0 else 0.5
+        period = 1 / rate if rate > 0 else 0.0
+
+        for kind, arguments in stages:
+            if kind == 'resample':
+                if arguments[1] == RESAMPLE_POLYPHASE:
+                    self.stages.append(Polyphase(rate, arguments[0]))
+                else:
+                    self.stages.append(Interpolator(arguments[1], arguments[0] or rate))
+
+                if arguments[0] > 0:
+                    nyquist = arguments[0] / 2
+                    period = 1 / arguments[0]
+            elif kind == 'decimate':
+                self.stages.append(Decimator(int(arguments[0])))
+                nyquist /= arguments[0]
+                period *= arguments[0]
+            elif kind in ('lowpass', 'highpass'):
+                self.stages.append(Sos(signal.butter(
+                    int(arguments[1]), arguments[0] / nyquist, kind, output='sos')))
+            elif kind in ('bandpass', 'bandstop'):
+                self.stages.append(Sos(signal.butter(
+                    int(arguments[2]), [arguments[0] / nyquist, arguments[1] / nyquist], kind,
+                    output='sos')))
+            elif kind == 'notch':
+                self.stages.append(Sos(signal.tf2sos(*signal.iirnotch(arguments[0] / nyquist, arguments[1]))))
+            elif kind == 'fir':
+                self.stages.append(Fir(signal.firwin(int(arguments[1]), arguments[0] / nyquist), period))
+
+    @timed('filter')
+    def process(self, values, timestamps):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        timestamps = numpy.asarray(timestamps, dtype=numpy.float64)
+
+        for stage in self.stages:
+            values, timestamps = stage.process(values, timestamps)
+
+        return values, timestamps
@@ -0,0 +1,79 @@
+from PyQt6 import QtCore
+from .stream import Stream
+from .processor import ProcessorManager
+from .results import Publisher
+from .settings import Settings, SettingsWatcher
+import copy
+
+
+class Daemon(QtCore.QObject):
+    def __init__(self) -> None:
+        super().__init__()
+        self.stream = Stream()
+        self.processorManager = ProcessorManager()
+        self.publisher = Publisher(self.stream.client)
+
+        self.stream.connected.connect(self.on_connect)
+        self.stream.connectionFailed.connect(self.on_connection_fail)
+        self.stream.disconnected.connect(self.on_disconnect)
+        self.stream.firstSample.connect(self.on_first_sample)
+
+        for channel in Settings.channels():
+            processor = self.processorManager.create(channel)
+            processor.publisher = self.publisher
+            # Only results are published, so no zoomable history is kept.
+            processor.history = None
+            processor.processing_rate = Settings.channel(channel).results_rate
+
+        self.watcher = SettingsWatcher()
+        self.watcher.channelChanged.connect(self.on_settings_changed)
+        self.watcher.settingsRejected.connect(lambda message: print(message, flush=True))
+        self.processorManager.start()
+
+    def on_connect(self):
+        print('Connected.', flush=True)
+
+        if self.stream.sources:
+            return
+
+        for processor in self.processorManager.processors:
+            self.processorManager.attach(processor, self.stream.branch(processor.channel))
+
+    def on_settings_changed(self, config, changes: set[str]):
+        processor = next((processor for processor in self.processorManager.processors
+                          if processor.channel == config.channel), None)
+
+        if processor is None:
+            return
+
+        # The daemon ticks at results_rate; processing_rate is the GUI's.
+        changes = changes - {'processing_rate'}
+
+        if 'results_rate' in changes:
+            changes.add('processing_rate')
+            config = copy.copy(config)
+            config.processing_rate = config.results_rate
+
+        QtCore.QMetaObject.invokeMethod(
+            processor, 'configure', QtCore.Qt.ConnectionType.QueuedConnection,
+            QtCore.Q_ARG(object, config), QtCore.Q_ARG(object, changes))
+
+        source = next((source for source in self.stream.sources if source.channel == config.channel), None)
+
+        if changes & config.SOURCE_FIELDS and source is not None:
+            self.processorManager.attach(processor, self.stream.rebranch(source))
+
+    def on_connection_fail(self):
+        print('Connection failed. Check credentials and host status.', flush=True)
+
+    def on_disconnect(self):
+        print('Disconnected. Reconnecting...', flush=True)
+
+    def on_first_sample(self, channel: str, seconds: float):
+        print('{}: first sample {:.0f} ms after reconnecting.'.format(channel, seconds * 1000), flush=True)
+
+    def terminate(self):
+        self.watcher.stop()
+        # The daemon must not overwrite the settings operators tune in the GUI.
+        self.processorManager.terminate(save=False)
+        self.stream.terminate()
@@ -0,0 +1,132 @@
+from .metrics import timed
+import numpy
+
+
+LOW, HIGH, SUM, COUNT, TIME = range(5)
+
+
+# Minimum, maximum, sum, finite sample count and start time of every bucket
+# of 2^k samples, kept as the rows of a ring of `size` buckets. Gap (NaN)
+# samples only add to the bucket's width, so a bucket of gaps counts none.
+class Level:
+    def __init__(self, order: int, size: int):
+        self.order = order
+        self.size = size
+        self.buckets = numpy.zeros((5, size))
+        # Buckets completed so far; bucket j covers samples j * 2^order .. (j + 1) * 2^order - 1.
+        self.done = 0
+        self._pending = None
+
+    def oldest(self) -> int:
+        return max(0, self.done - self.size)
+
+    # Takes the children completed on the level below, returns the buckets
+    # completed here, which are in turn the children of the level above.
+    def add(self, children: numpy.ndarray) -> numpy.ndarray | None:
+        if self._pending is not None:
+            children = numpy.concatenate((self._pending, children), axis=1)
+
+        n = children.shape[1]
+        even = n // 2 * 2
+        self._pending = children[:, even:].copy() if even < n else None
+
+        if even == 0:
+            return None
+
+        left, right = children[:, 0:even:2], children[:, 1:even:2]
+        parents = left + right
+        numpy.minimum(left[LOW], right[LOW], out=parents[LOW])
+        numpy.maximum(left[HIGH], right[HIGH], out=parents[HIGH])
+        parents[TIME] = left[TIME]
+
+        # Only the newest `size` buckets survive a long batch.
+        kept = parents[:, -self.size:]
+        position = (self.done + parents.shape[1] - kept.shape[1]) % self.size
+        head = min(kept.shape[1], self.size - position)
+        self.buckets[:, position:position + head] = kept[:, :head]
+        self.buckets[:, :kept.shape[1] - head] = kept[:, head:]
+
+        self.done += parents.shape[1]
+        return parents
+
+    def read(self, start: int, stop: int):
+        begin = start % self.size
+        end = begin + stop - start
+
+        # Only a range across the end of the ring is copied.
+        if end <= self.size:
+            buckets = self.buckets[:, begin:end]
+        else:
+            buckets = numpy.concatenate((self.buckets[:, begin:], self.buckets[:, :end - self.size]), axis=1)
+
+        empty = buckets[COUNT] == 0
+
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            mean = buckets[SUM] / buckets[COUNT]
+
+        return (buckets[TIME],
+                numpy.where(empty, numpy.nan, buckets[LOW]),
+                numpy.where(empty, numpy.nan, buckets[HIGH]),
+                mean)
+
+
+# Multi-resolution history of a stream: level k aggregates 2^k samples per
+# bucket, and every level holds the same number of buckets, so memory is
+# bounded per level while coarser levels reach further back. Levels are built
+# from the one below as samples arrive, which costs O(n) per batch in total.
+class History:
+    def __init__(self, levels: int, size: int):
+        self.levels = [Level(order, size) for order in range(1, levels + 1)]
+        self._total = 0
+
+    @timed('history')
+    def extend(self, values, timestamps):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        timestamps = numpy.asarray(timestamps, dtype=numpy.float64)
+        self._total += len(values)
+
+        finite = ~numpy.isnan(values)
+        children = numpy.empty((5, len(values)))
+        numpy.copyto(children[LOW], numpy.where(finite, values, numpy.inf))
+        numpy.copyto(children[HIGH], numpy.where(finite, values, -numpy.inf))
+        numpy.copyto(children[SUM], numpy.where(finite, values, 0.0))
+        children[COUNT] = finite
+        children[TIME] = timestamps
+
+        for level in self.levels:
+            children = level.add(children)
+
+            if children is None:
+                break
+
+    def total(self) -> int:
+        return self._total
+
+    def level_for(self, start: int, stop: int, pixels: int) -> Level:
+        samples = max(stop - start, 1) / max(pixels, 1)
+        index = min(int(numpy.log2(max(samples, 2))), len(self.levels)) - 1
+
+        # A finer level that has already dropped the start of the range
+        # cannot answer it; a coarser one still holds it.
+        while index < len(self.levels) - 1 and \
+                self.levels[index].oldest() << self.levels[index].order > max(start, 0):
+            index += 1
+
+        return self.levels[index]
+
+    # Buckets overlapping samples start .. stop - 1, at the resolution closest
+    # to `pixels` buckets over the range. Returns the level's order (buckets
+    # are 2^order samples wide), the first sample of every bucket, its start
+    # time, minimum, maximum and mean; None if no bucket is complete there.
+    def query(self, start: int, stop: int, pixels: int):
+        if not self.levels:
+            return None
+
+        level = self.level_for(start, stop, pixels)
+        first = max(start >> level.order, level.oldest())
+        last = min(-(-stop >> level.order), level.done)
+
+        if last <= first:
+            return None
+
+        return (level.order, numpy.arange(first, last) << level.order, *level.read(first, last))
@@ -0,0 +1,262 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import builtins
+import collections
+import functools
+import json
+import math
+import sys
+import threading
+import time
+import numpy
+
+RESOLUTION = 1e-6
+BUCKETS_PER_OCTAVE = 4
+BUCKETS = 108
+
+enabled = False
+histograms: dict[str, 'Histogram'] = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = numpy.zeros(BUCKETS, dtype=numpy.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        bucket = 0 if seconds <= RESOLUTION else \
+            min(int(BUCKETS_PER_OCTAVE * math.log2(seconds / RESOLUTION)), BUCKETS - 1)
+
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        if self.count == 0:
+            return 0.0
+
+        bucket = int(numpy.searchsorted(numpy.cumsum(self.counts), fraction * self.count))
+        return min(RESOLUTION * 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE), self.max)
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+def histogram(key: str) -> Histogram:
+    result = histograms.get(key)
+
+    if result is None:
+        with _lock:
+            result = histograms.setdefault(key, Histogram())
+
+    return result
+
+
+def timed(stage: str):
+    def decorate(function):
+        function.stage = stage
+        return function
+
+    return decorate
+
+
+def _wrap(function, stage: str):
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = function(self, *args, **kwargs)
+        channel = getattr(self, 'channel', None)
+        histogram(stage if channel is None else stage + ' ' + channel).record(
+            time.perf_counter() - started)
+        return result
+
+    return wrapper
+
+
+# Methods marked with @timed run unwrapped unless instrument() is called, so
+# disabled instrumentation costs nothing on the hot path.
+def instrument(*classes):
+    global enabled
+    enabled = True
+
+    for cls in classes:
+        for name, function in list(vars(cls).items()):
+            stage = getattr(function, 'stage', None)
+
+            if stage is not None and not hasattr(function, '__wrapped__'):
+                setattr(cls, name, _wrap(function, stage))
+
+
+def instrument_inherited(cls, name: str, stage: str):
+    setattr(cls, name, _wrap(getattr(cls, name), stage))
+
+
+def snapshot() -> dict:
+    return {key: histograms[key].summary() for key in sorted(histograms)}
+
+
+class Reporter:
+    def __init__(self, processors: list, sources):
+        self.processors = processors
+        self.sources = sources
+        self._last = time.monotonic()
+        self._previous: dict[str, tuple] = {}
+        self.channels: dict[str, dict] = {}
+
+    def update(self) -> dict:
+        now = time.monotonic()
+        elapsed = max(now - self._last, 1e-9)
+        self._last = now
+        sources = {source.channel: source for source in self.sources()}
+
+        for processor in self.processors:
+            received = processor.raw.total()
+            ticks = histogram('process ' + processor.channel).count
+            last_received, last_ticks = self._previous.get(processor.channel, (received, ticks))
+            self._previous[processor.channel] = (received, ticks)
+            source = sources.get(processor.channel)
+
+            self.channels[processor.channel] = {
+                'received_per_s': (received - last_received) / elapsed,
+                'lost': processor.lost(),
+                'queue_depth': processor.queue_depth(),
+                'processing_rate': (ticks - last_ticks) / elapsed,
+                'requested_rate': processor.processing_rate,
+                'counters': {} if source is None else source.counters(),
+            }
+
+        return self.report()
+
+    def report(self) -> dict:
+        return {'channels': self.channels, 'stages': snapshot()}
+
+    def text(self) -> str:
+        lines = ['{:<8} {:>12} {:>8} {:>8} {:>14}'.format(
+            'channel', 'received/s', 'lost', 'queue', 'rate/requested')]
+
+        for channel, values in self.channels.items():
+            lines.append('{:<8} {:>12.0f} {:>8} {:>8} {:>9.1f}/{:<4}'.format(
+                channel, values['received_per_s'], values['lost'], values['queue_depth'],
+                values['processing_rate'], values['requested_rate']))
+
+        lines.append('')
+        lines.append('{:<20} {:>8} {:>9} {:>9} {:>9} {:>9}'.format(
+            'stage', 'count', 'mean ms', 'p50 ms', 'p99 ms', 'max ms'))
+
+        for stage, values in snapshot().items():
+            lines.append('{:<20} {:>8} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+                stage, values['count'], values['mean_ms'], values['p50_ms'],
+                values['p99_ms'], values['max_ms']))
+
+        return '\n'.join(lines)
+
+    def dump(self, path: str):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+class Server(threading.Thread):
+    def __init__(self, reporter: Reporter, port: int):
+        super().__init__(name='Metrics server', daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = (json.dumps(reporter.report(), indent=2) if self.path == '/json'
+                        else reporter.text()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json' if self.path == '/json'
+                                 else 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Splits startup into named phases and attributes the time spent importing to
+# top-level packages, excluding the packages they import in turn.
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: dict[str, float] = {}
+        self.imports: dict[str, float] = collections.defaultdict(float)
+        self._import = builtins.__import__
+        self._children = [0.0]
+        self._thread = threading.current_thread()
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Only the startup thread is profiled; workers import concurrently.
+        if (level == 0 and name in sys.modules) or threading.current_thread() is not self._thread:
+            return self._import(name, globals, locals, fromlist, level)
+
+        self._children.append(0.0)
+        started = time.perf_counter()
+
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            self._children[-1] += elapsed
+            package = ((globals or {}).get('__package__') or name) if level else name
+            self.imports[package.partition('.')[0]] += elapsed - children
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def stop(self):
+        builtins.__import__ = self._import
+
+    def report(self) -> dict:
+        return {
+            'total_ms': (self._last - self.started) * 1000,
+            'phases_ms': {phase: value * 1000 for phase, value in self.phases.items()},
+            'imports_ms': {package: value * 1000 for package, value in
+                           sorted(self.imports.items(), key=lambda item: -item[1])},
+            'deferred': [package for package in ('scipy', 'pyqtgraph') if package not in sys.modules],
+        }
+
+    def text(self, limit: int = 10) -> str:
+        report = self.report()
+        lines = ['{:<28} {:>9}'.format('phase', 'ms')]
+
+        for phase, value in report['phases_ms'].items():
+            lines.append('{:<28} {:>9.1f}'.format(phase, value))
+
+        lines.append('{:<28} {:>9.1f}'.format('total', report['total_ms']))
+        lines.append('')
+        lines.append('{:<28} {:>9}'.format('imports (self time)', 'ms'))
+
+        for package, value in list(report['imports_ms'].items())[:limit]:
+            lines.append('{:<28} {:>9.1f}'.format(package, value))
+
+        if report['deferred']:
+            lines.append('')
+            lines.append('not loaded: ' + ', '.join(report['deferred']))
+
+        return '\n'.join(lines)
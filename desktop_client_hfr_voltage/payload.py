@@ -0,0 +1,108 @@
+import struct
+import numpy
+
+FORMAT_TEXT = 'text'
+FORMAT_BINARY = 'binary'
+
+VERSION = 1
+
+# version, dtype code, padding, sequence number, first sample timestamp, sample period
+HEADER = struct.Struct('<BBxxIdd')
+
+DTYPES = {
+    0: numpy.dtype('<f4'),
+    1: numpy.dtype('<f8'),
+    2: numpy.dtype('<i2'),
+}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+
+class PayloadError(ValueError):
+    pass
+
+
+class Block:
+    def __init__(self, values: numpy.ndarray, sequence=None, timestamp=None, period=None, timestamps=None,
+                 gap: bool = False):
+        self.values = values
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.period = period
+        self.timestamps = timestamps
+        self.gap = gap
+
+    def __len__(self):
+        return len(self.values)
+
+    def times(self) -> numpy.ndarray:
+        if self.timestamps is not None:
+            return self.timestamps
+
+        if self.period is None or len(self.values) == 1:
+            return numpy.full(len(self.values), self.timestamp, dtype=numpy.float64)
+
+        return self.timestamp + numpy.arange(len(self.values)) * self.period
+
+    def last_time(self) -> float:
+        if self.timestamps is not None:
+            return float(self.timestamps[-1])
+
+        if self.period is None:
+            return self.timestamp
+
+        return self.timestamp + (len(self.values) - 1) * self.period
+
+
+# NaN samples standing in for data lost between two timestamps.
+def gap_block(count: int, after: float, before: float) -> Block:
+    return Block(numpy.full(count, numpy.nan),
+                 timestamps=numpy.linspace(after, before, count + 2)[1:-1], gap=True)
+
+
+def decode_text(payload: bytes, factor: float) -> Block:
+    try:
+        return Block(numpy.array([float(payload) * factor]))
+    except ValueError:
+        pass
+
+    # An optional sequence number precedes the value: "<sequence> <value>" or "<sequence>,<value>".
+    sequence, _, value = payload.replace(b',', b' ').strip().partition(b' ')
+    return Block(numpy.array([float(value) * factor]), int(sequence))
+
+
+def decode_binary(payload: bytes, factor: float) -> Block:
+    if len(payload) < HEADER.size:
+        raise PayloadError('Payload is shorter than header')
+
+    version, code, sequence, timestamp, period = HEADER.unpack_from(payload)
+
+    if version != VERSION:
+        raise PayloadError('Unsupported payload version %d' % version)
+    if code not in DTYPES:
+        raise PayloadError('Unsupported payload dtype code %d' % code)
+
+    dtype = DTYPES[code]
+
+    if (len(payload) - HEADER.size) % dtype.itemsize != 0:
+        raise PayloadError('Payload body is not a whole number of samples')
+
+    values = numpy.frombuffer(payload, dtype, offset=HEADER.size)
+    # Zero timestamp or period means the producer does not know them.
+    return Block(values * factor, sequence, timestamp or None, period or None)
+
+
+def encode_binary(values, sequence: int, timestamp: float, period: float, dtype='<f4') -> bytes:
+    dtype = numpy.dtype(dtype).newbyteorder('<')
+
+    if dtype not in DTYPE_CODES:
+        raise PayloadError('Unsupported payload dtype %s' % dtype)
+
+    header = HEADER.pack(VERSION, DTYPE_CODES[dtype],
+                         sequence & 0xFFFFFFFF, timestamp, period)
+    return header + numpy.asarray(values, dtype).tobytes()
+
+
+DECODERS = {
+    FORMAT_TEXT: decode_text,
+    FORMAT_BINARY: decode_binary,
+}
@@ -1,143 +1,460 @@
 from PyQt6 import QtCore
-from scipy import fft
-from .settings import Settings
-from collections import deque
+from .settings import ChannelConfig, Settings
 from .stream import Source
+from .payload import Block
+from .decimation import minmax
+from .filters import DISPLAY_FILTERED, FilterChain
+from .history import History
+from .metrics import timed
+from .running import RunningStatistics
+from .spectrum import PeakTracker, SpectrumEngine, Spectrogram
+from .trigger import Trigger
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import numpy
+import threading
 import time
 
 
-class RingBuffer:
-    def __init__(self, maxsize: int, iterable: list):
-        self._data = list(iterable)
-        self._maxsize = maxsize
-        self._size = 0
-        self._sum = 0
-        self._last = 0
+def thread_name() -> str:
+    return QtCore.QThread.currentThread().objectName() or threading.current_thread().name
 
-    def append(self, value):
-        self._sum += value
 
-        if self._size < self._maxsize:
-            self._data.append(value)
-            self._size += 1
-        else:
-            self._sum -= self._data[self._last]
-            self._data[self._last] = value
-            self._last = self._last + 1 if self._last < self._maxsize - 1 else 0
+class StreamBuffer:
+    def __init__(self, size: int, rate_window: int = 4096):
+        self._data = numpy.zeros(size)
+        self._times = numpy.zeros(size)
+        self._size = size
+        self._cursor = 0
+        self._filled = 0
+        self._total = 0
+        self._rate_window = rate_window
+
+    def append(self, value, timestamp: float | None = None):
+        self.extend([value], [time.time() if timestamp is None else timestamp])
+
+    @timed('buffer')
+    def extend(self, values, timestamps):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        timestamps = numpy.asarray(timestamps, dtype=numpy.float64)
+        self._total += len(values)
+
+        if len(values) > self._size:
+            values = values[-self._size:]
+            timestamps = timestamps[-self._size:]
+
+        n = len(values)
+
+        if n == 0:
+            return
+
+        self._write(self._data, values)
+        self._write(self._times, timestamps)
+        self._cursor = (self._cursor + n) % self._size
+        self._filled = min(self._filled + n, self._size)
+
+    def _write(self, array, values):
+        n = len(values)
+        head = min(n, self._size - self._cursor)
+        array[self._cursor:self._cursor + head] = values[:head]
+        array[:n - head] = values[head:]
+
+    def _latest(self, array, n: int):
+        n = min(n, self._size)
+        start = self._cursor - n
+
+        if start >= 0:
+            return array[start:self._cursor]
+
+        return numpy.concatenate((array[start:], array[:self._cursor]))
+
+    def _segment(self, array, start: int, stop: int):
+        begin = (self._cursor - (self._total - start)) % self._size
+        end = begin + stop - start
+
+        if end <= self._size:
+            return array[begin:end]
+
+        return numpy.concatenate((array[begin:], array[:end - self._size]))
 
     def data(self):
         return self._data
 
+    def oldest(self):
+        return self._total - self._filled
+
+    def segment(self, start: int, stop: int):
+        return self._segment(self._data, start, stop)
+
     def size(self):
         return self._size
 
-    def mean(self):
-        if self._size == 0:
-            return 0
+    def filled(self):
+        return self._filled
 
-        return self._sum / self._size
+    def total(self):
+        return self._total
 
+    def last(self):
+        return self._data[self._cursor - 1]
 
-class StreamBuffer:
-    def __init__(self, size: int):
-        self._data = deque([0] * size, size)
-        self._delays = RingBuffer(size, [])
-        self._last_income_time = time.time()
+    def latest(self, n: int):
+        return self._latest(self._data, n)
 
-    def append(self, value):
-        self._data.pop()
-        self._data.appendleft(value)
+    def latest_times(self, n: int):
+        return self._latest(self._times, n)
 
-        income_time = time.time()
-        self._delays.append(income_time - self._last_income_time)
-        self._last_income_time = income_time
+    def period(self):
+        n = min(self._filled, self._rate_window)
 
-    def data(self):
-        return self._data
+        if n < 2:
+            return 0
+
+        # Least-squares slope of timestamps over sample index.
+        t = self.latest_times(n)
+        t = t - t[0]
+        i = numpy.arange(n) - (n - 1) / 2
+        return float(i @ (t - t.mean())) / (n * (n * n - 1) / 12)
 
     def sampling_rate(self):
-        if self._delays.mean() == 0:
-            return 0
+        period = self.period()
 
-        return 1 / self._delays.mean()
+        if period <= 0:
+            return 0
 
-    def delay(self):
-        return self._delays.mean()
+        return 1 / period
 
 
 class Processor(QtCore.QObject):
     updateInstant = QtCore.pyqtSignal(float)
     updateMean = QtCore.pyqtSignal(float)
     updateDeviation = QtCore.pyqtSignal(float)
+    updateRms = QtCore.pyqtSignal(float)
+    updatePeakToPeak = QtCore.pyqtSignal(float)
     updateDirectChartData = QtCore.pyqtSignal(object, object)
     updateFFTChartData = QtCore.pyqtSignal(object, object)
     updateProcessingInterval = QtCore.pyqtSignal(int)
     updateDirectLabel = QtCore.pyqtSignal(str)
     updateFFTLabel = QtCore.pyqtSignal(str)
+    updateQueueDepth = QtCore.pyqtSignal(int)
+    updateLost = QtCore.pyqtSignal(int)
+    updateWaterfallRows = QtCore.pyqtSignal(object, float)
+    updatePeaks = QtCore.pyqtSignal(object)
 
-    def __init__(self, channel: str) -> None:
+    def __init__(self, channel: str, pool: 'ProcessPool | None' = None) -> None:
         super().__init__()
-        self.storage = StreamBuffer(
-            Settings.get_range('processing_size_range').stop)
-
-        self.processing_rate = int(
-            Settings.get_for_channel(channel, 'processing_rate'))
-        self.direct_processing_size = int(
-            Settings.get_for_channel(channel, 'direct_processing_size'))
-        self.fft_processing_size = int(
-            Settings.get_for_channel(channel, 'fft_processing_size'))
+        self.pool = pool
+        self.stage_threads: dict[str, str] = {}
+        self.raw = StreamBuffer(Settings.general().processing_size_range.stop)
+        # Samples received, not counting the gap samples standing for lost ones.
+        self.received = 0
+
+        config = Settings.channel(channel)
+        self.filters = config.filters
+        self.filter_rate = config.filter_rate
+        self.filter_display = config.filter_display
+        self.chain = self.create_chain()
+        self.filtered = self.refilter()
+        # The stream everything below is computed from: the filtered one if
+        # filters are configured and shown, the raw one otherwise.
+        self.storage = self.displayed()
+        self.processing_rate = config.processing_rate
+        self.instant_rate = config.instant_rate
+        self.direct_processing_size = config.direct_processing_size
+        self.fft_processing_size = config.fft_processing_size
         self.channel = channel
+        self.source: Source | None = None
         self.current_tab = 0
-        self.fft_x_converted = Settings.get_for_channel(
-            channel, 'fft_x_converted') == 'true'
-        self.direct_x_converted = Settings.get_for_channel(
-            channel, 'direct_x_converted') == 'true'
-
-        self.instant_timer = QtCore.QTimer()
-        self.processing_timer = QtCore.QTimer()
-
+        self.fft_x_converted = config.fft_x_converted
+        self.direct_x_converted = config.direct_x_converted
+        self.fft_window = config.fft_window
+        self.fft_segment_size = config.fft_segment_size
+        self.fft_averaging = config.fft_averaging
+        self.spectrum = self.create_spectrum()
+        self.peaks = PeakTracker(config.peak_count, config.peak_interpolation)
+        self.waterfall_fft_size = config.waterfall_fft_size
+        self.waterfall_hop = config.waterfall_hop
+        self.waterfall_history = config.waterfall_history
+        # Built when the waterfall tab is first shown.
+        self.waterfall: Spectrogram | None = None
+        self.trigger_options = config.trigger()
+        self.trigger = self.create_trigger()
+        # Set by the headless daemon; replaces the per-tab chart updates.
+        self.publisher = None
+        self.history_levels = config.history_levels
+        self.history_size = config.history_size
+        self.history = self.create_history()
+        self.direct_view = None
+        self.fft_view = None
+        self.statistics = RunningStatistics(
+            self.direct_processing_size, self.storage.size())
+
+        self.instant_timer: QtCore.QTimer | None = None
+        self.processing_timer: QtCore.QTimer | None = None
+
+    # Timers take the affinity of the thread that creates them, so they are
+    # built here, after the processor has been moved to its worker thread.
+    def start(self):
+        self.instant_timer = QtCore.QTimer(self)
         self.instant_timer.timeout.connect(self.update_instant)
+        self.instant_timer.start(int(1000 / self.instant_rate))
+
+        self.processing_timer = QtCore.QTimer(self)
         self.processing_timer.timeout.connect(self.process)
         self.updateProcessingInterval.connect(
             self.processing_timer.setInterval)
-
-        self.instant_timer.start(
-            int(1000 / int(Settings.get_for_channel(channel, 'instant_rate'))))
         self.processing_timer.start(int(1000 / self.processing_rate))
 
-    def on_value(self, value):
-        self.storage.append(value)
+    @QtCore.pyqtSlot()
+    def stop(self):
+        if self.instant_timer is not None:
+            self.instant_timer.stop()
+
+        if self.processing_timer is not None:
+            self.processing_timer.stop()
+
+    def mark(self, stage: str, thread: str | None = None):
+        self.stage_threads[stage] = thread or thread_name()
+
+    def on_blocks(self, blocks: list[Block]):
+        self.mark('ingest')
+
+        if len(blocks) == 1:
+            values, times = blocks[0].values, blocks[0].times()
+        elif blocks:
+            values = numpy.concatenate([block.values for block in blocks])
+            times = numpy.concatenate([block.times() for block in blocks])
+
+        if blocks:
+            self.raw.extend(values, times)
+            self.received += sum(len(block) for block in blocks if not block.gap)
+
+            if self.chain is not None:
+                filtered = self.chain.process(values, times)
+                self.filtered.extend(*filtered)
+
+                if self.storage is self.filtered:
+                    values, times = filtered
+
+            if self.history is not None:
+                self.history.extend(values, times)
+
+        self.statistics.update(self.storage)
+
+    def drain(self):
+        if self.source is not None:
+            self.on_blocks(self.source.queue.drain())
+
+    def queue_depth(self) -> int:
+        return 0 if self.source is None else self.source.queue.depth()
+
+    def lost(self) -> int:
+        return 0 if self.source is None else self.source.lost()
 
     def update_instant(self):
-        self.updateInstant.emit(self.storage.data()[0])
+        self.mark('instant')
+        self.drain()
+        self.updateInstant.emit(self.storage.last())
 
+    @timed('process')
     def process(self):
+        self.updateQueueDepth.emit(self.queue_depth())
+        self.updateLost.emit(self.lost())
+        self.drain()
+
+        if self.publisher is not None:
+            self.mark('publish')
+            self.spectrum.update(self.storage)
+            self.publisher.publish(self)
+            return
+
+        # Once opened, the waterfall keeps filling while other tabs are shown,
+        # so intermittent modes are not missed.
+        if self.waterfall is not None:
+            self.update_waterfall()
+
         if self.current_tab == 0:  # U
-            r = self.direct_processing_size
-            x2 = numpy.array(range(1, r + 1))
-            x1 = x2 * self.storage.delay()
-            y = numpy.array(self.storage.data())[:r]
+            self.mark('direct')
+            r = min(self.direct_processing_size, self.storage.filled())
+
+            if r == 0:
+                return
+
+            low, high = self.statistics.extremes(self.storage)
+
+            self.updateMean.emit(self.statistics.mean())
+            self.updateDeviation.emit(self.statistics.deviation())
+            self.updateRms.emit(self.statistics.rms())
+            self.updatePeakToPeak.emit(high - low)
+
+            if self.trigger is not None:
+                self.update_triggered()
+                return
+
+            if self.history is not None and self.update_history(r):
+                return
+
+            y = self.storage.latest(r)
+
+            if self.direct_x_converted:
+                t = self.storage.latest_times(r)
+                x = t[-1] - t
+            else:
+                x = numpy.arange(r, 0, -1)
 
-            self.updateMean.emit(y.mean())
-            self.updateDeviation.emit(y.std())
             self.updateDirectLabel.emit(
                 'Timeline, seconds ago' if self.direct_x_converted else 'Timeline, ticks ago')
-            self.updateDirectChartData.emit(
-                x1 if self.direct_x_converted else x2, y)
+            x, y = minmax(x, y, self.direct_view)
+            # The buffer keeps being written to, so the chart gets a copy.
+            self.updateDirectChartData.emit(x, y.copy())
 
         elif self.current_tab == 1:  # FFT
-            r = self.fft_processing_size - 1
-            x1 = numpy.array(range(-(r // 2), r // 2 + 1)) / (r - 1)
-            x2 = x1 * self.storage.sampling_rate()
+            self.mark('fft')
+            self.spectrum.update(self.storage)
+            self.mark('spectrum', 'process pool' if self.spectrum.executor else None)
+
+            if not self.spectrum.ready():
+                return
 
-            array = numpy.array(self.storage.data())[:r]
-            y = numpy.abs(fft.fft(array - array.mean(), norm='forward'))
-            y = numpy.concatenate((y[(r // 2):], y[1:(r // 2 + 1)]))
+            scale = self.storage.sampling_rate() if self.fft_x_converted else 1
+            x = self.spectrum.frequencies(scale)
+            amplitude = self.spectrum.amplitude()
 
             self.updateFFTLabel.emit(
                 'Frequency, Hz' if self.fft_x_converted else 'Frequency')
-            self.updateFFTChartData.emit(x2 if self.fft_x_converted else x1, y)
+            self.updateFFTChartData.emit(*minmax(x, amplitude, self.fft_view))
+
+            if self.peaks.count:
+                peaks = self.track_peaks(amplitude)
+                # Frequency and drift follow the axis units; amplitude and Q do not.
+                self.updatePeaks.emit(peaks * [scale, 1, 1, scale])
+
+    def update_triggered(self):
+        self.trigger.update(self.storage)
+
+        if not self.trigger.ready():
+            return
+
+        x = self.trigger.offsets()
+
+        if self.direct_x_converted:
+            x = x * self.storage.period()
+
+        self.updateDirectLabel.emit(
+            'Time from trigger, seconds' if self.direct_x_converted else 'Time from trigger, ticks')
+        self.updateDirectChartData.emit(*minmax(x, self.trigger.frame(), self.direct_view))
+
+    # Views reaching further back than the latest r samples are drawn from the
+    # history level whose buckets are about a pixel wide, as minimum and maximum
+    # pairs, so the cost depends on the chart's width and not on the time span.
+    def update_history(self, r: int) -> bool:
+        if self.direct_view is None:
+            return False
+
+        low, high, pixels = self.direct_view
+        latest = float(self.storage.latest_times(1)[-1])
+        period = self.storage.period() if self.direct_x_converted else 1
+        extent = latest - float(self.storage.latest_times(r)[0]) if self.direct_x_converted else r
+
+        if period <= 0 or high <= extent or numpy.isinf(high):
+            return False
+
+        total = self.history.total()
+        rows = self.history.query(total - int(numpy.ceil(high / period)),
+                                  total - int(max(low, 0) / period), pixels)
+
+        if rows is None:
+            return False
+
+        order, first, times, minimum, maximum, _ = rows
+        half = (1 << order) / 2
+
+        if self.direct_x_converted:
+            x = latest - times - half * period
+        else:
+            x = total - first - half
+
+        self.updateDirectLabel.emit(
+            'Timeline, seconds ago' if self.direct_x_converted else 'Timeline, ticks ago')
+        self.updateDirectChartData.emit(
+            numpy.repeat(x, 2), numpy.column_stack((minimum, maximum)).ravel())
+        return True
+
+    def update_waterfall(self):
+        rows = self.waterfall.update(self.storage)
+
+        if rows is not None:
+            self.mark('waterfall')
+            self.updateWaterfallRows.emit(rows, self.waterfall.bin_width(
+                self.storage.sampling_rate() if self.fft_x_converted else 1))
+
+    def track_peaks(self, amplitude: numpy.ndarray | None = None) -> numpy.ndarray:
+        return self.peaks.update(
+            self.spectrum.amplitude() if amplitude is None else amplitude,
+            self.spectrum.frequencies()[1], float(self.storage.latest_times(1)[-1]))
+
+    def create_spectrum(self) -> SpectrumEngine:
+        executor = None if self.pool is None else self.pool.executor_for(
+            self.fft_segment_size)
+        return SpectrumEngine(self.fft_segment_size, self.fft_processing_size,
+                              self.fft_window, self.fft_averaging, executor)
+
+    def create_trigger(self) -> Trigger | None:
+        if not self.trigger_options['enabled']:
+            return None
+
+        return Trigger(*(self.trigger_options[key] for key in
+                         ('level', 'slope', 'pre', 'post', 'holdoff', 'averages')))
+
+    def create_history(self) -> History | None:
+        # The headless daemon publishes results only and draws no history.
+        if self.history_levels == 0 or self.publisher is not None:
+            return None
+
+        history = History(self.history_levels, self.history_size)
+        # Seeded with the buffer, which is all there is after a rebuild.
+        filled = self.storage.filled()
+        history.extend(self.storage.latest(filled), self.storage.latest_times(filled))
+        return history
+
+    def create_chain(self) -> FilterChain | None:
+        return FilterChain(self.filters, self.filter_rate) if self.filters else None
+
+    # Runs a new chain over the raw samples still in the buffer, so changing
+    # the filters does not wait for the buffer to fill again.
+    def refilter(self) -> StreamBuffer | None:
+        if self.chain is None:
+            return None
+
+        filtered = StreamBuffer(self.raw.size())
+        filled = self.raw.filled()
+
+        if filled:
+            filtered.extend(*self.chain.process(self.raw.latest(filled), self.raw.latest_times(filled)))
+
+        return filtered
+
+    def displayed(self) -> StreamBuffer:
+        if self.filtered is not None and self.filter_display == DISPLAY_FILTERED:
+            return self.filtered
+
+        return self.raw
+
+    # Everything that keeps state about the samples starts over on the newly
+    # displayed stream.
+    def select_storage(self):
+        self.storage = self.displayed()
+        self.statistics = RunningStatistics(self.direct_processing_size, self.storage.size())
+        self.statistics.update(self.storage)
+        self.spectrum = self.create_spectrum()
+        self.peaks.reset()
+        self.trigger = self.create_trigger()
+        self.history = self.create_history()
+        self.rebuild_waterfall()
+
+    def create_waterfall(self) -> Spectrogram:
+        return Spectrogram(self.waterfall_fft_size, self.waterfall_hop,
+                           self.waterfall_history, self.fft_window)
 
     def set_processing_rate(self, rate: int):
         self.processing_rate = rate
@@ -146,25 +463,134 @@ class Processor(QtCore.QObject):
     def set_current_tab(self, tab: int):
         self.current_tab = tab
 
+        if tab == 2 and self.waterfall is None:
+            self.waterfall = self.create_waterfall()
+
     def set_direct_x_converted(self, converted: bool):
         self.direct_x_converted = converted
 
     def set_fft_x_converted(self, converted: bool):
         self.fft_x_converted = converted
 
+    def set_direct_view(self, view: tuple):
+        self.direct_view = view
+
+    def set_fft_view(self, view: tuple):
+        self.fft_view = view
+
     def set_direct_processing_size(self, size: int):
         self.direct_processing_size = size
+        self.statistics.rebuild(self.storage, size)
 
     def set_fft_processing_size(self, size: int):
         self.fft_processing_size = size
+        self.spectrum = self.create_spectrum()
+
+    def set_fft_window(self, window: str):
+        self.fft_window = window
+        self.spectrum = self.create_spectrum()
+        self.rebuild_waterfall()
+
+    def set_fft_segment_size(self, size: int):
+        self.fft_segment_size = size
+        self.spectrum = self.create_spectrum()
+
+    def set_fft_averaging(self, averaging: str):
+        self.fft_averaging = averaging
+        self.spectrum = self.create_spectrum()
+
+    def set_filter_display(self, display: str):
+        self.filter_display = display
+        self.select_storage()
+
+    def set_trigger(self, options: dict):
+        self.trigger_options = dict(options)
+        self.trigger = self.create_trigger()
+
+    def set_waterfall_fft_size(self, size: int):
+        self.waterfall_fft_size = size
+        self.rebuild_waterfall()
+
+    def set_waterfall_hop(self, hop: int):
+        self.waterfall_hop = hop
+        self.rebuild_waterfall()
+
+    def set_waterfall_history(self, history: int):
+        self.waterfall_history = history
+
+        if self.waterfall is not None:
+            self.waterfall.history = history
+
+    def rebuild_waterfall(self):
+        if self.waterfall is not None:
+            self.waterfall = self.create_waterfall()
+
+    # Applies settings edited while running. Only the parts whose fields
+    # changed are rebuilt; the buffer and its samples are kept.
+    @QtCore.pyqtSlot(object, object)
+    def configure(self, config: ChannelConfig, changes: set[str]):
+        if 'processing_rate' in changes:
+            self.set_processing_rate(config.processing_rate)
+
+        if 'instant_rate' in changes:
+            self.instant_rate = config.instant_rate
+
+            if self.instant_timer is not None:
+                self.instant_timer.setInterval(int(1000 / self.instant_rate))
+
+        if 'direct_x_converted' in changes:
+            self.direct_x_converted = config.direct_x_converted
+
+        if 'fft_x_converted' in changes:
+            self.fft_x_converted = config.fft_x_converted
+
+        if 'direct_processing_size' in changes:
+            self.set_direct_processing_size(config.direct_processing_size)
+
+        if changes & {'fft_processing_size', 'fft_segment_size', 'fft_window', 'fft_averaging'}:
+            self.fft_processing_size = config.fft_processing_size
+            self.fft_segment_size = config.fft_segment_size
+            self.fft_window = config.fft_window
+            self.fft_averaging = config.fft_averaging
+            self.spectrum = self.create_spectrum()
+
+        if changes & {'peak_count', 'peak_interpolation'}:
+            self.peaks = PeakTracker(config.peak_count, config.peak_interpolation)
+
+        if any(key.startswith('trigger_') for key in changes):
+            self.set_trigger(config.trigger())
 
+        if changes & {'history_levels', 'history_size'}:
+            self.history_levels = config.history_levels
+            self.history_size = config.history_size
+            self.history = self.create_history()
+
+        if changes & {'filters', 'filter_rate', 'filter_display'}:
+            self.filters = config.filters
+            self.filter_rate = config.filter_rate
+            self.filter_display = config.filter_display
+
+            if changes & {'filters', 'filter_rate'}:
+                self.chain = self.create_chain()
+                self.filtered = self.refilter()
+
+            self.select_storage()
+
+        if changes & {'waterfall_fft_size', 'waterfall_hop', 'waterfall_history', 'fft_window'}:
+            self.waterfall_fft_size = config.waterfall_fft_size
+            self.waterfall_hop = config.waterfall_hop
+            self.waterfall_history = config.waterfall_history
+            self.rebuild_waterfall()
+
+    @QtCore.pyqtSlot(object)
     def attach_source(self, source: Source):
-        source.tick.connect(self.on_value)
+        if self.source is not None:
+            self.source.dataAvailable.disconnect(self.drain)
 
-    def terminate(self):
-        self.instant_timer.stop()
-        self.processing_timer.stop()
+        self.source = source
+        self.source.dataAvailable.connect(self.drain)
 
+    def terminate(self):
         Settings.set_for_channel(
             self.channel, 'processing_rate', self.processing_rate)
         Settings.set_for_channel(
@@ -175,27 +601,88 @@ class Processor(QtCore.QObject):
             self.channel, 'direct_x_converted', self.direct_x_converted)
         Settings.set_for_channel(
             self.channel, 'fft_x_converted', self.fft_x_converted)
+        Settings.set_for_channel(self.channel, 'fft_window', self.fft_window)
+        Settings.set_for_channel(
+            self.channel, 'fft_segment_size', self.fft_segment_size)
+        Settings.set_for_channel(
+            self.channel, 'fft_averaging', self.fft_averaging)
+        Settings.set_for_channel(
+            self.channel, 'waterfall_fft_size', self.waterfall_fft_size)
+        Settings.set_for_channel(
+            self.channel, 'waterfall_hop', self.waterfall_hop)
+        Settings.set_for_channel(
+            self.channel, 'waterfall_history', self.waterfall_history)
+        Settings.set_for_channel(self.channel, 'filter_display', self.filter_display)
+
+        for key, value in self.trigger_options.items():
+            Settings.set_for_channel(self.channel, 'trigger_' + key, value)
+
+
+class ProcessPool:
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def executor_for(self, segment_size: int) -> ProcessPoolExecutor | None:
+        if self.threshold <= 0 or segment_size < self.threshold:
+            return None
+
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs Qt threads is unsafe.
+                self._executor = ProcessPoolExecutor(
+                    mp_context=multiprocessing.get_context('spawn'))
+
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
 
 
 class ProcessorManager:
     def __init__(self):
         self.threads: list[QtCore.QThread] = []
         self.processors: list[Processor] = []
+        self.pool = ProcessPool(Settings.general().process_pool_threshold)
 
     def create(self, channel: str) -> Processor:
+        processor = Processor(channel, self.pool)
+        self.processors.append(processor)
         thread = QtCore.QThread()
-        processor = Processor(channel)
-
         self.threads.append(thread)
-        self.processors.append(processor)
 
+        thread.setObjectName('Processor ' + channel)
         processor.moveToThread(thread)
-        thread.start()
+        thread.started.connect(processor.start)
         return processor
 
-    def terminate(self):
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    # The processor's timers read its source on the worker thread, so the
+    # source is handed over there rather than set from the calling thread.
+    def attach(self, processor: Processor, source: Source):
+        QtCore.QMetaObject.invokeMethod(
+            processor, 'attach_source', QtCore.Qt.ConnectionType.QueuedConnection,
+            QtCore.Q_ARG(object, source))
+
+    def thread_report(self) -> dict[str, dict[str, str]]:
+        return {processor.channel: dict(processor.stage_threads)
+                for processor in self.processors}
+
+    def terminate(self, save: bool = True):
         for processor in self.processors:
-            processor.terminate()
+            QtCore.QMetaObject.invokeMethod(
+                processor, 'stop', QtCore.Qt.ConnectionType.BlockingQueuedConnection)
+
+            if save:
+                processor.terminate()
 
         for thread in self.threads:
-            thread.terminate()
+            thread.quit()
+            thread.wait()
+
+        self.pool.shutdown()
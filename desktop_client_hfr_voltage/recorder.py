@@ -0,0 +1,199 @@
+from .settings import Settings
+from .payload import Block
+import datetime
+import os
+import queue
+import struct
+import threading
+import time
+import numpy
+
+MAGIC = b'HFRCAP\x00\x01'
+VERSION = 1
+
+# magic, version, padding, factor, start time, record count, value dtype, channel, topic
+HEADER = struct.Struct('<8sH6xddQ8s32s176s')
+COUNT_OFFSET = 32
+
+RECORD = numpy.dtype([('time', '<f8'), ('value', '<f8')])
+CHUNK_RECORDS = 1 << 16
+
+
+class CaptureFile:
+    def __init__(self, path: str, channel: str, topic: str, factor: float):
+        self.path = path
+        self.count = 0
+        self.capacity = 0
+        self.start_time = time.time()
+        self._map = None
+        self._file = open(path, 'w+b')
+        self._file.write(HEADER.pack(
+            MAGIC, VERSION, factor, self.start_time, 0, RECORD['value'].str.encode(),
+            channel.encode()[:32], topic.encode()[:176]))
+        self._grow(CHUNK_RECORDS)
+
+    def _grow(self, records: int):
+        if self._map is not None:
+            self._map.flush()
+
+        self.capacity += records
+        self._file.truncate(HEADER.size + self.capacity * RECORD.itemsize)
+        self._map = numpy.memmap(self._file, RECORD, 'r+', HEADER.size, (self.capacity,))
+
+    def write(self, values: numpy.ndarray, times: numpy.ndarray):
+        n = len(values)
+
+        if self.count + n > self.capacity:
+            self._grow(max(CHUNK_RECORDS, n))
+
+        self._map['time'][self.count:self.count + n] = times
+        self._map['value'][self.count:self.count + n] = values
+        self.count += n
+
+    def flush(self):
+        self._map.flush()
+        self._file.seek(COUNT_OFFSET)
+        self._file.write(struct.pack('<Q', self.count))
+        self._file.flush()
+
+    def size(self) -> int:
+        return HEADER.size + self.count * RECORD.itemsize
+
+    def close(self):
+        self.flush()
+        self._map = None
+        self._file.truncate(self.size())
+        self._file.close()
+
+
+def open_capture(path: str) -> tuple[dict, numpy.ndarray]:
+    with open(path, 'rb') as file:
+        magic, version, factor, start_time, count, dtype, channel, topic = \
+            HEADER.unpack(file.read(HEADER.size))
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a capture file' % path)
+
+    header = {
+        'factor': factor,
+        'start_time': start_time,
+        'count': count,
+        'dtype': dtype.rstrip(b'\x00').decode(),
+        'channel': channel.rstrip(b'\x00').decode(),
+        'topic': topic.rstrip(b'\x00').decode(),
+    }
+
+    if count == 0:
+        return header, numpy.zeros(0, RECORD)
+
+    return header, numpy.memmap(path, RECORD, 'r', HEADER.size, (count,))
+
+
+class ChannelRecorder(threading.Thread):
+    FLUSH_INTERVAL = 1
+
+    def __init__(self, directory: str, channel: str, topic: str, factor: float,
+                 max_bytes: int, max_seconds: float, queue_size: int):
+        super().__init__(name='Recorder ' + channel, daemon=True)
+        self.directory = directory
+        self.channel = channel
+        self.topic = topic
+        self.factor = factor
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.queue: queue.Queue[Block | None] = queue.Queue(queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.files: list[str] = []
+        self._capture: CaptureFile | None = None
+
+    def put(self, block: Block):
+        try:
+            self.queue.put_nowait(block)
+        except queue.Full:
+            self.dropped += len(block)
+
+    def _open(self):
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, '{}_{}_{:04d}.cap'.format(
+            self.channel, stamp, len(self.files)))
+        self._capture = CaptureFile(path, self.channel, self.topic, self.factor)
+        self.files.append(path)
+
+    def _rollover_due(self) -> bool:
+        return self._capture.size() >= self.max_bytes or \
+            time.time() - self._capture.start_time >= self.max_seconds
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._open()
+        flushed = time.monotonic()
+
+        while True:
+            try:
+                block = self.queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                pass
+            else:
+                # None is queued by stop().
+                if block is None:
+                    break
+
+                self._capture.write(block.values, block.times())
+                self.written += len(block)
+
+                if self._rollover_due():
+                    self._capture.close()
+                    self._open()
+
+            if time.monotonic() - flushed >= self.FLUSH_INTERVAL:
+                self._capture.flush()
+                flushed = time.monotonic()
+
+        self._capture.close()
+
+    def stop(self):
+        self.queue.put(None)
+        self.join()
+
+
+class Recorder:
+    def __init__(self):
+        self.recorders: dict[str, ChannelRecorder] = {}
+        self.recording = False
+
+    def is_recording(self) -> bool:
+        return self.recording
+
+    def start(self, sources: list):
+        if self.recording:
+            return
+
+        self.recording = True
+
+        for source in sources:
+            self.attach(source)
+
+    # Sources created while recording, e.g. on the first connection, are
+    # recorded from then on.
+    def attach(self, source):
+        if self.recording and source.channel not in self.recorders:
+            general = Settings.general()
+            recorder = ChannelRecorder(general.capture_directory, source.channel, source.topic, source.factor,
+                                       general.capture_max_megabytes * (1 << 20),
+                                       general.capture_max_minutes * 60, general.capture_queue_size)
+            self.recorders[source.channel] = recorder
+            recorder.start()
+
+        source.recorder = self.recorders.get(source.channel)
+
+    def stop(self, sources: list):
+        self.recording = False
+
+        for source in sources:
+            source.recorder = None
+
+        for recorder in self.recorders.values():
+            recorder.stop()
+
+        self.recorders = {}
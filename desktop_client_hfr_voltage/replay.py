@@ -0,0 +1,261 @@
+from PyQt6 import QtCore
+from .settings import Settings
+from .payload import Block
+from .recorder import open_capture
+from .stream import StagingQueue
+import os
+import threading
+import time
+import numpy
+
+
+def load_recording(paths: list[str], factor: float, rate: float) -> tuple[numpy.ndarray, numpy.ndarray]:
+    values, times = [], []
+
+    for path in paths:
+        if path.endswith('.cap'):
+            # Capture files already hold scaled samples and their timestamps.
+            _, records = open_capture(path)
+            values.append(numpy.asarray(records['value']))
+            times.append(numpy.asarray(records['time']))
+            continue
+
+        if path.endswith('.npy'):
+            data = numpy.load(path)
+        else:
+            data = numpy.loadtxt(path, delimiter=',', ndmin=1)
+
+        # One column holds samples; two columns hold timestamps and samples.
+        if data.ndim == 1:
+            start = times[-1][-1] + 1 / rate if times else time.time()
+            values.append(data * factor)
+            times.append(start + numpy.arange(len(data)) / rate)
+        else:
+            values.append(data[:, 1] * factor)
+            times.append(data[:, 0].astype(numpy.float64))
+
+    if not values:
+        return numpy.zeros(0), numpy.zeros(0)
+
+    return numpy.concatenate(values), numpy.concatenate(times)
+
+
+class ReplaySource(QtCore.QObject):
+    dataAvailable = QtCore.pyqtSignal()
+
+    TICK = 0.01
+    CHUNK = 4096
+    BACKLOG = 1 << 16
+
+    def __init__(self, channel: str, values: numpy.ndarray, times: numpy.ndarray, speed: float, loop: bool) -> None:
+        super().__init__()
+        self.channel = channel
+        config = Settings.channel(channel)
+        self.factor = config.factor
+        self.topic = config.topic
+        self.queue = StagingQueue()
+        self.recorder = None
+
+        self.values = values
+        self.times = times
+        self.speed = speed
+        self.loop = loop
+        self.position = 0
+        self.delivered = 0
+        self.first_delivery = None
+        self.last_delivery = None
+
+        self._offset = 0.0
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._stopped = False
+        self._anchor = None
+        self._thread = threading.Thread(
+            target=self.run, name='Replay ' + channel, daemon=True)
+
+    def start(self):
+        self._running.set()
+        self._thread.start()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        with self._lock:
+            self._anchor = None
+
+        self._running.set()
+
+    def seek(self, fraction: float):
+        with self._lock:
+            position = min(int(fraction * len(self.values)), max(len(self.values) - 1, 0))
+
+            # Shift timestamps so they stay monotonic across the jump.
+            if self.position > 0 and len(self.times) > 1:
+                last = self.times[self.position - 1] + self._offset
+                self._offset = last - self.times[position] + (self.times[1] - self.times[0])
+
+            self.position = position
+            self._anchor = None
+
+    def fraction(self) -> float:
+        return self.position / len(self.values) if len(self.values) else 0.0
+
+    def lost(self) -> int:
+        return self.queue.shed
+
+    def counters(self) -> dict[str, int]:
+        return {'shed': self.queue.shed}
+
+    def throughput(self) -> float:
+        if self.first_delivery is None or self.last_delivery == self.first_delivery:
+            return 0.0
+
+        return self.delivered / (self.last_delivery - self.first_delivery)
+
+    def _next_stop(self) -> int:
+        if self.speed <= 0:
+            return min(self.position + self.CHUNK, len(self.values))
+
+        now = time.monotonic()
+
+        if self._anchor is None:
+            self._anchor = (now, self.times[self.position])
+
+        wall, stream = self._anchor
+        target = stream + (now - wall) * self.speed
+        return int(numpy.searchsorted(self.times, target, 'right'))
+
+    def run(self):
+        while not self._stopped:
+            self._running.wait()
+
+            if self._stopped:
+                break
+
+            if self.position >= len(self.values):
+                if self.loop and len(self.values):
+                    self.seek(0)
+                    continue
+
+                time.sleep(self.TICK)
+                continue
+
+            # As-fast-as-possible mode waits for the processor instead of queueing without bound.
+            if self.speed <= 0 and self.queue.depth() > self.BACKLOG:
+                time.sleep(0.001)
+                continue
+
+            with self._lock:
+                start = self.position
+                stop = max(self._next_stop(), start)
+                self.position = stop
+                offset = self._offset
+
+            if stop > start:
+                block = Block(self.values[start:stop], timestamps=self.times[start:stop] + offset)
+
+                if self.recorder is not None:
+                    self.recorder.put(block)
+
+                if self.queue.put(block):
+                    self.dataAvailable.emit()
+
+                self.delivered += stop - start
+                self.last_delivery = time.monotonic()
+
+                if self.first_delivery is None:
+                    self.first_delivery = self.last_delivery
+
+            if self.speed > 0:
+                time.sleep(self.TICK)
+
+    def stop(self):
+        self._stopped = True
+        self._running.set()
+
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+class ReplayStream(QtCore.QObject):
+    connected = QtCore.pyqtSignal()
+    disconnected = QtCore.pyqtSignal()
+    connectionFailed = QtCore.pyqtSignal()
+
+    def __init__(self, files: dict[str, list[str]], speed: float):
+        super().__init__()
+        self.sources: list[ReplaySource] = []
+        self.speed = speed
+        self.loop = Settings.general().replay_loop
+        self.recordings: dict[str, tuple] = {}
+
+        try:
+            for channel, paths in files.items():
+                config = Settings.channel(channel)
+                self.recordings[channel] = load_recording(paths, config.factor, config.replay_rate)
+        except (OSError, ValueError):
+            QtCore.QTimer.singleShot(0, self.connectionFailed.emit)
+            return
+
+        QtCore.QTimer.singleShot(0, self.connected.emit)
+
+    @staticmethod
+    def files_from_settings(channels: list[str]) -> dict[str, list[str]]:
+        files = {}
+
+        for channel in channels:
+            path = Settings.channel(channel).replay_file
+
+            if path:
+                files[channel] = [os.path.expanduser(str(path))]
+
+        return files
+
+    @staticmethod
+    def files_from_paths(paths: list[str], channels: list[str]) -> dict[str, list[str]]:
+        files: dict[str, list[str]] = {}
+        others = iter(channels)
+
+        # Capture files name their channel; other files are assigned in channel order.
+        for path in paths:
+            channel = open_capture(path)[0]['channel'] if path.endswith('.cap') else next(others, None)
+
+            if channel is not None:
+                files.setdefault(channel, []).append(path)
+
+        return files
+
+    def branch(self, channel: str) -> ReplaySource:
+        values, times = self.recordings.get(channel, (numpy.zeros(0), numpy.zeros(0)))
+        source = ReplaySource(channel, values, times, self.speed, self.loop)
+        self.sources.append(source)
+        source.start()
+        return source
+
+    def clear(self):
+        for source in self.sources:
+            source.stop()
+
+        self.sources = []
+
+    def pause(self, paused: bool):
+        for source in self.sources:
+            if paused:
+                source.pause()
+            else:
+                source.resume()
+
+    def seek(self, fraction: float):
+        for source in self.sources:
+            source.seek(fraction)
+
+    def fraction(self) -> float:
+        return max((source.fraction() for source in self.sources), default=0.0)
+
+    def throughput(self) -> dict[str, float]:
+        return {source.channel: source.throughput() for source in self.sources}
+
+    def terminate(self):
+        for source in self.sources:
+            source.stop()
@@ -0,0 +1,181 @@
+from fractions import Fraction
+import numpy
+
+RESAMPLE_LINEAR = 'linear'
+RESAMPLE_CUBIC = 'cubic'
+RESAMPLE_POLYPHASE = 'polyphase'
+RESAMPLING = [RESAMPLE_LINEAR, RESAMPLE_CUBIC, RESAMPLE_POLYPHASE]
+
+# Largest up or down factor of a polyphase resampler.
+MAX_FACTOR = 1000
+
+
+# Up and down factors taking the nominal rate to the grid rate.
+def ratio(rate: float, nominal: float) -> tuple[int, int]:
+    fraction = Fraction(rate / nominal).limit_denominator(MAX_FACTOR)
+    return fraction.numerator, fraction.denominator
+
+
+# Interpolates a stream with irregular timestamps (network jitter, bursts of
+# messages stamped on arrival) at the times of a uniform grid. Grid samples
+# are emitted once the samples around them have arrived, and only the few
+# samples still needed are carried to the next block, so a block costs O(n).
+# Without a rate, the grid period is the mean period of the first samples.
+class Interpolator:
+    ESTIMATE = 256
+    # Silences longer than this many grid periods restart the grid after
+    # them instead of filling them with interpolated samples.
+    SILENCE = 1 << 16
+
+    def __init__(self, method: str = RESAMPLE_LINEAR, rate: float = 0):
+        self.method = method
+        self.period = 1 / rate if rate > 0 else 0.0
+        self.origin: float | None = None
+        self.next = 0
+        self.values = numpy.empty(0)
+        self.times = numpy.empty(0)
+
+    def process(self, values: numpy.ndarray, times: numpy.ndarray):
+        # A clock stepping back must not reorder the samples.
+        previous = self.times[-1:] if len(self.times) else times[:1]
+        times = numpy.maximum.accumulate(numpy.concatenate((previous, times)))[1:]
+        self.values = numpy.concatenate((self.values, values))
+        self.times = numpy.concatenate((self.times, times))
+
+        if self.origin is None and not self.start():
+            return numpy.empty(0), numpy.empty(0)
+
+        outputs = []
+        values, times = self.values, self.times
+        start = 0
+
+        for cut in numpy.flatnonzero(numpy.diff(times) > self.SILENCE * self.period) + 1:
+            outputs.append(self.emit(values[start:cut], times[start:cut]))
+            # A gap sample marks the break in the grid.
+            outputs.append((numpy.array([numpy.nan]), times[cut - 1:cut] + self.period))
+            self.origin, self.next = float(times[cut]), 0
+            start = cut
+
+        outputs.append(self.emit(values[start:], times[start:]))
+        return (numpy.concatenate([output[0] for output in outputs]),
+                numpy.concatenate([output[1] for output in outputs]))
+
+    def start(self) -> bool:
+        if not self.period:
+            if len(self.times) < self.ESTIMATE:
+                return False
+
+            self.period = (self.times[-1] - self.times[0]) / (len(self.times) - 1)
+
+            if self.period <= 0:
+                self.period = 0.0
+                self.values, self.times = self.values[-self.ESTIMATE:], self.times[-self.ESTIMATE:]
+                return False
+
+        self.origin = float(self.times[0])
+        return True
+
+    # Emits the grid samples strictly before the last sample (the one before
+    # it for cubic, which needs a neighbour on either side of an interval)
+    # and keeps the samples the next grid sample will need.
+    def emit(self, values: numpy.ndarray, times: numpy.ndarray):
+        cubic = self.method == RESAMPLE_CUBIC
+        context = 2 if cubic else 1
+
+        if len(times) <= context:
+            return numpy.empty(0), numpy.empty(0)
+
+        stop = max(int(numpy.ceil((times[-context] - self.origin) / self.period)), self.next)
+        grid = self.origin + numpy.arange(self.next, stop) * self.period
+
+        if cubic:
+            output = self.cubic(values, times, grid)
+        else:
+            output = numpy.interp(grid, times, values)
+
+        self.next = stop
+        first = numpy.searchsorted(times, self.origin + stop * self.period, 'right') - context
+        self.values, self.times = values[max(first, 0):], times[max(first, 0):]
+        return output, grid
+
+    # Cubic Hermite with three-point derivative slopes, so the interpolation
+    # stays third-order accurate on unevenly spaced samples as well.
+    def cubic(self, values: numpy.ndarray, times: numpy.ndarray, grid: numpy.ndarray):
+        if len(grid) == 0:
+            return grid
+
+        widths = numpy.diff(times)
+        differences = numpy.zeros(len(widths))
+        numpy.divide(numpy.diff(values), widths, out=differences, where=widths > 0)
+        slopes = numpy.empty(len(values))
+        spans = widths[:-1] + widths[1:]
+        slopes[1:-1] = numpy.divide(widths[1:] * differences[:-1] + widths[:-1] * differences[1:],
+                                    spans, out=numpy.zeros(len(spans)), where=spans > 0)
+        slopes[0] = differences[0]
+        slopes[-1] = differences[-1]
+
+        index = numpy.searchsorted(times, grid, 'right') - 1
+        width = widths[index]
+        s = (grid - times[index]) / numpy.where(width > 0, width, 1)
+        s2, s3 = s * s, s * s * s
+        return ((2 * s3 - 3 * s2 + 1) * values[index] + (s3 - 2 * s2 + s) * width * slopes[index] +
+                (-2 * s3 + 3 * s2) * values[index + 1] + (s3 - s2) * width * slopes[index + 1])
+
+
+# Treats the samples as taken at the nominal rate, whatever their arrival
+# times, and converts them to the grid rate with a polyphase FIR filter like
+# scipy.signal.resample_poly, continued across blocks. Grid times count from
+# the first sample at the grid rate.
+class Polyphase:
+    def __init__(self, nominal: float, rate: float = 0):
+        from scipy.signal import firwin
+
+        self.up, self.down = ratio(rate, nominal) if rate > 0 else (1, 1)
+        self.step = self.down / (self.up * nominal)
+        factor = max(self.up, self.down)
+        self.half = 10 * factor if factor > 1 else 0
+        taps = firwin(2 * self.half + 1, 1 / factor, window=('kaiser', 5.0)) * self.up \
+            if factor > 1 else numpy.ones(1)
+        self.width = -(-len(taps) // self.up)
+        padded = numpy.zeros(self.width * self.up)
+        padded[:len(taps)] = taps
+        # Row p holds the taps of phase p, in the order of the input samples.
+        self.phases = padded.reshape(self.width, self.up).T[:, ::-1].copy()
+        self.origin: float | None = None
+        self.next = 0
+        self.received = 0
+        # Absolute index of the first carried input sample.
+        self.first = 0
+        self.inputs = numpy.empty(0)
+
+    def process(self, values: numpy.ndarray, times: numpy.ndarray):
+        if len(values) == 0:
+            return numpy.empty(0), numpy.empty(0)
+
+        if self.origin is None:
+            # Repeating the first sample avoids the filter's step response.
+            self.origin = float(times[0])
+            self.inputs = numpy.full(self.width - 1, values[0])
+            self.first = 1 - self.width
+
+        self.inputs = numpy.concatenate((self.inputs, values))
+        self.received += len(values)
+        stop = max((self.received * self.up - 1 - self.half) // self.down + 1, self.next)
+        positions = numpy.arange(self.next, stop) * self.down + self.half
+        base = positions // self.up
+
+        index = base - self.width + 1 - self.first
+        phases = self.phases[positions % self.up]
+        output = numpy.zeros(len(positions))
+
+        # One pass per tap keeps memory at one value per output sample.
+        for tap in range(self.width):
+            output += phases[:, tap] * self.inputs[index + tap]
+
+        times = self.origin + numpy.arange(self.next, stop) * self.step
+
+        self.next = stop
+        keep = (stop * self.down + self.half) // self.up - self.width + 1
+        self.inputs = self.inputs[keep - self.first:]
+        self.first = keep
+        return output, times
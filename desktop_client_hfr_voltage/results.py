@@ -0,0 +1,260 @@
+from PyQt6 import QtCore
+from .settings import Settings
+from .payload import PayloadError
+import struct
+import numpy
+
+VERSION = 1
+KIND_STATISTICS = 0
+KIND_SPECTRUM = 1
+KIND_PEAKS = 2
+KINDS = {KIND_STATISTICS: 'statistics', KIND_SPECTRUM: 'spectrum', KIND_PEAKS: 'peaks'}
+
+# version, kind, reserved, sequence, timestamp
+HEADER = struct.Struct('<BBxxId')
+# instant, mean, deviation, rms, peak to peak, sampling rate, samples received
+STATISTICS = struct.Struct('<ddddddQ')
+# first frequency and frequency step in cycles/sample, sampling rate;
+# followed by float32 amplitudes
+SPECTRUM = struct.Struct('<ddd')
+# sampling rate; followed by float64 rows of frequency in cycles/sample,
+# amplitude, Q and drift in cycles/sample per second
+PEAKS = struct.Struct('<d')
+PEAK_COLUMNS = 4
+
+
+def topic(channel: str, kind: int) -> str:
+    return '{}/{}/{}'.format(Settings.general().results_topic, channel, KINDS[kind])
+
+
+class Statistics:
+    def __init__(self, instant: float, mean: float, deviation: float, rms: float,
+                 peak_to_peak: float, sampling_rate: float, total: int):
+        self.instant = instant
+        self.mean = mean
+        self.deviation = deviation
+        self.rms = rms
+        self.peak_to_peak = peak_to_peak
+        self.sampling_rate = sampling_rate
+        self.total = total
+
+
+class Spectrum:
+    def __init__(self, amplitude: numpy.ndarray, start: float, step: float, sampling_rate: float):
+        self.amplitude = amplitude
+        self.start = start
+        self.step = step
+        self.sampling_rate = sampling_rate
+
+    def frequencies(self, converted: bool = False) -> numpy.ndarray:
+        frequencies = self.start + numpy.arange(len(self.amplitude)) * self.step
+
+        if converted and self.sampling_rate > 0:
+            frequencies *= self.sampling_rate
+
+        return frequencies
+
+
+class Peaks:
+    def __init__(self, rows: numpy.ndarray, sampling_rate: float):
+        self.rows = rows
+        self.sampling_rate = sampling_rate
+
+    def converted(self, converted: bool = False) -> numpy.ndarray:
+        if converted and self.sampling_rate > 0:
+            return self.rows * [self.sampling_rate, 1, 1, self.sampling_rate]
+
+        return self.rows
+
+
+def _header(payload: bytes, kind: int) -> tuple[int, float]:
+    if len(payload) < HEADER.size:
+        raise PayloadError('result payload shorter than its header')
+
+    version, found, sequence, timestamp = HEADER.unpack_from(payload)
+
+    if version != VERSION or found != kind:
+        raise PayloadError('unexpected result version %d or kind %d' % (version, found))
+
+    return sequence, timestamp
+
+
+def encode_statistics(statistics: Statistics, sequence: int, timestamp: float) -> bytes:
+    return HEADER.pack(VERSION, KIND_STATISTICS, sequence & 0xFFFFFFFF, timestamp) + STATISTICS.pack(
+        statistics.instant, statistics.mean, statistics.deviation, statistics.rms,
+        statistics.peak_to_peak, statistics.sampling_rate, statistics.total)
+
+
+def decode_statistics(payload: bytes) -> Statistics:
+    _header(payload, KIND_STATISTICS)
+
+    if len(payload) != HEADER.size + STATISTICS.size:
+        raise PayloadError('statistics payload has %d bytes' % len(payload))
+
+    return Statistics(*STATISTICS.unpack_from(payload, HEADER.size))
+
+
+def encode_spectrum(spectrum: Spectrum, sequence: int, timestamp: float) -> bytes:
+    return HEADER.pack(VERSION, KIND_SPECTRUM, sequence & 0xFFFFFFFF, timestamp) + SPECTRUM.pack(
+        spectrum.start, spectrum.step, spectrum.sampling_rate) + \
+        numpy.asarray(spectrum.amplitude, dtype='<f4').tobytes()
+
+
+def decode_spectrum(payload: bytes) -> Spectrum:
+    _header(payload, KIND_SPECTRUM)
+    offset = HEADER.size + SPECTRUM.size
+
+    if len(payload) < offset or (len(payload) - offset) % 4:
+        raise PayloadError('spectrum payload has %d bytes' % len(payload))
+
+    start, step, sampling_rate = SPECTRUM.unpack_from(payload, HEADER.size)
+    amplitude = numpy.frombuffer(payload, dtype='<f4', offset=offset).astype(numpy.float64)
+    return Spectrum(amplitude, start, step, sampling_rate)
+
+
+def encode_peaks(peaks: Peaks, sequence: int, timestamp: float) -> bytes:
+    return HEADER.pack(VERSION, KIND_PEAKS, sequence & 0xFFFFFFFF, timestamp) + \
+        PEAKS.pack(peaks.sampling_rate) + numpy.asarray(peaks.rows, dtype='<f8').tobytes()
+
+
+def decode_peaks(payload: bytes) -> Peaks:
+    _header(payload, KIND_PEAKS)
+    offset = HEADER.size + PEAKS.size
+
+    if len(payload) < offset or (len(payload) - offset) % (8 * PEAK_COLUMNS):
+        raise PayloadError('peaks payload has %d bytes' % len(payload))
+
+    sampling_rate, = PEAKS.unpack_from(payload, HEADER.size)
+    rows = numpy.frombuffer(payload, dtype='<f8', offset=offset).reshape(-1, PEAK_COLUMNS)
+    return Peaks(rows, sampling_rate)
+
+
+def decimate(amplitude: numpy.ndarray, bins: int) -> tuple[numpy.ndarray, int]:
+    width = -(-len(amplitude) // bins) if bins > 0 else 1
+
+    if width <= 1:
+        return amplitude, 1
+
+    # Keeping the maximum of every group of bins preserves narrow peaks.
+    padded = numpy.full(width * -(-len(amplitude) // width), -numpy.inf)
+    padded[:len(amplitude)] = amplitude
+    return padded.reshape(-1, width).max(axis=1), width
+
+
+class Publisher:
+    def __init__(self, client):
+        self.client = client
+        self.bins = Settings.general().results_spectrum_bins
+        self.sequences: dict[str, int] = {}
+
+    # Called on the processor's worker thread; paho's publish() is thread-safe.
+    def publish(self, processor):
+        storage = processor.storage
+
+        if storage.filled() == 0:
+            return
+
+        sequence = self.sequences.get(processor.channel, 0)
+        self.sequences[processor.channel] = sequence + 1
+        timestamp = float(storage.latest_times(1)[-1])
+        sampling_rate = storage.sampling_rate()
+        low, high = processor.statistics.extremes(storage)
+
+        statistics = Statistics(
+            float(storage.last()), processor.statistics.mean(), processor.statistics.deviation(),
+            processor.statistics.rms(), high - low, sampling_rate, storage.total())
+        self.client.publish(topic(processor.channel, KIND_STATISTICS),
+                            encode_statistics(statistics, sequence, timestamp))
+
+        if not processor.spectrum.ready():
+            return
+
+        frequencies = processor.spectrum.frequencies()
+        amplitude, width = decimate(processor.spectrum.amplitude(), self.bins)
+        step = frequencies[1] - frequencies[0] if len(frequencies) > 1 else 0.0
+        spectrum = Spectrum(amplitude, frequencies[0] + (width - 1) / 2 * step,
+                            width * step, sampling_rate)
+        self.client.publish(topic(processor.channel, KIND_SPECTRUM),
+                            encode_spectrum(spectrum, sequence, timestamp))
+
+        if processor.peaks.count:
+            self.client.publish(topic(processor.channel, KIND_PEAKS), encode_peaks(
+                Peaks(processor.track_peaks(), sampling_rate), sequence, timestamp))
+
+
+class Subscriber(QtCore.QObject):
+    updateInstant = QtCore.pyqtSignal(float)
+    updateMean = QtCore.pyqtSignal(float)
+    updateDeviation = QtCore.pyqtSignal(float)
+    updateRms = QtCore.pyqtSignal(float)
+    updatePeakToPeak = QtCore.pyqtSignal(float)
+    updateFFTChartData = QtCore.pyqtSignal(object, object)
+    updateFFTLabel = QtCore.pyqtSignal(str)
+    updatePeaks = QtCore.pyqtSignal(object)
+
+    def __init__(self, channel: str, client) -> None:
+        super().__init__()
+        self.channel = channel
+        self.client = client
+        self.topics = [topic(channel, kind) for kind in KINDS]
+        self.fft_x_converted = Settings.channel(channel).fft_x_converted
+        self.spectrum: Spectrum | None = None
+        self.peaks: Peaks | None = None
+        self.received = 0
+        self.dropped = 0
+
+        self.client.message_callback_add(self.topics[0], self.on_statistics)
+        self.client.message_callback_add(self.topics[1], self.on_spectrum)
+        self.client.message_callback_add(self.topics[2], self.on_peaks)
+
+    def subscribe(self):
+        self.client.subscribe([(result_topic, 0) for result_topic in self.topics])
+
+    def on_statistics(self, _id, _data, message):
+        try:
+            statistics = decode_statistics(message.payload)
+        except ValueError:
+            self.dropped += 1
+            return
+
+        self.received = statistics.total
+        self.updateInstant.emit(statistics.instant)
+        self.updateMean.emit(statistics.mean)
+        self.updateDeviation.emit(statistics.deviation)
+        self.updateRms.emit(statistics.rms)
+        self.updatePeakToPeak.emit(statistics.peak_to_peak)
+
+    def on_spectrum(self, _id, _data, message):
+        try:
+            self.spectrum = decode_spectrum(message.payload)
+        except ValueError:
+            self.dropped += 1
+            return
+
+        self.emit_spectrum()
+
+    def on_peaks(self, _id, _data, message):
+        try:
+            self.peaks = decode_peaks(message.payload)
+        except ValueError:
+            self.dropped += 1
+            return
+
+        self.updatePeaks.emit(self.peaks.converted(self.fft_x_converted))
+
+    def emit_spectrum(self):
+        if self.spectrum is None:
+            return
+
+        self.updateFFTLabel.emit(
+            'Frequency, Hz' if self.fft_x_converted else 'Frequency')
+        self.updateFFTChartData.emit(
+            self.spectrum.frequencies(self.fft_x_converted), self.spectrum.amplitude)
+
+    def set_fft_x_converted(self, converted: bool):
+        self.fft_x_converted = converted
+        self.emit_spectrum()
+
+    def terminate(self):
+        for result_topic in self.topics:
+            self.client.message_callback_remove(result_topic)
@@ -0,0 +1,143 @@
+from .metrics import timed
+import math
+import numpy
+
+
+# Sums and squared sums of the finite values, and the number of gap (NaN)
+# samples; the mask is only built when the plain sum shows a NaN.
+def finite_sums(values: numpy.ndarray) -> tuple[float, float, int]:
+    total = values.sum()
+
+    if total == total:
+        return float(total), float((values * values).sum()), 0
+
+    finite = values[~numpy.isnan(values)]
+    return float(finite.sum()), float((finite * finite).sum()), len(values) - len(finite)
+
+
+class RunningStatistics:
+    CHUNK_SIZE = 256
+
+    def __init__(self, window: int, capacity: int):
+        self.window = window
+        self._chunks = capacity // self.CHUNK_SIZE + 2
+        self._chunk_min = numpy.zeros(self._chunks)
+        self._chunk_max = numpy.zeros(self._chunks)
+        self._total = 0
+        self._shift = 0.0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._gaps = 0
+        self._since_rebuild = 0
+
+    @timed('statistics')
+    def update(self, storage):
+        start, stop = self._total, storage.total()
+        self._total = stop
+
+        if stop == start:
+            return
+
+        self._update_chunks(storage, start, stop)
+
+        leaving_start = max(start - self.window, 0)
+        leaving_stop = max(stop - self.window, 0)
+        self._since_rebuild += stop - start
+
+        # Re-summing once per window length keeps rounding error bounded
+        # while staying O(1) per sample on average.
+        if self._since_rebuild >= self.window or leaving_start < storage.oldest() \
+                or start < storage.oldest():
+            self.rebuild(storage)
+            return
+
+        entering_sum, entering_sq, entering_gaps = finite_sums(storage.segment(start, stop) - self._shift)
+        leaving_sum, leaving_sq, leaving_gaps = finite_sums(
+            storage.segment(leaving_start, leaving_stop) - self._shift)
+        self._sum += entering_sum - leaving_sum
+        self._sum_sq += entering_sq - leaving_sq
+        self._gaps += entering_gaps - leaving_gaps
+
+    def _update_chunks(self, storage, start: int, stop: int):
+        size = self.CHUNK_SIZE
+        first = max(start // size, -(-storage.oldest() // size))
+        last = stop // size
+
+        if last <= first:
+            return
+
+        chunks = storage.segment(first * size, last * size).reshape(-1, size)
+        index = numpy.arange(first, last) % self._chunks
+        # fmin/fmax skip gap samples; a chunk that is all gap stays NaN.
+        self._chunk_min[index] = numpy.fmin.reduce(chunks, axis=1)
+        self._chunk_max[index] = numpy.fmax.reduce(chunks, axis=1)
+
+    def rebuild(self, storage, window: int | None = None):
+        if window is not None:
+            self.window = window
+
+        self._total = storage.total()
+        self._since_rebuild = 0
+        values = storage.latest(min(self.window, self._total))
+        finite = values[~numpy.isnan(values)]
+        self._gaps = len(values) - len(finite)
+
+        if len(finite) == 0:
+            self._shift = self._sum = self._sum_sq = 0.0
+            return
+
+        self._shift = float(finite.mean())
+        finite = finite - self._shift
+        self._sum = float(finite.sum())
+        self._sum_sq = float((finite * finite).sum())
+
+    def count(self):
+        return min(self.window, self._total) - self._gaps
+
+    def gaps(self):
+        return self._gaps
+
+    def mean(self):
+        count = self.count()
+        return self._shift + self._sum / count if count else 0.0
+
+    def deviation(self):
+        count = self.count()
+
+        if count == 0:
+            return 0.0
+
+        offset = self._sum / count
+        return math.sqrt(max(self._sum_sq / count - offset * offset, 0.0))
+
+    def rms(self):
+        return math.hypot(self.mean(), self.deviation())
+
+    # Minimum and maximum of the window from the summaries of its whole chunks
+    # and the samples of the two partial chunks at its edges. The cost grows
+    # with window / CHUNK_SIZE, unlike the O(1) mean, deviation and RMS.
+    def extremes(self, storage):
+        if self.count() <= 0:
+            return 0.0, 0.0
+
+        size = self.CHUNK_SIZE
+        stop = self._total
+        start = stop - min(self.window, self._total)
+        first = -(-start // size)
+        last = stop // size
+
+        if last <= first:
+            values = storage.segment(start, stop)
+            return float(numpy.fmin.reduce(values)), float(numpy.fmax.reduce(values))
+
+        index = numpy.arange(first, last) % self._chunks
+        edges = numpy.concatenate((storage.segment(start, first * size),
+                                   storage.segment(last * size, stop)))
+        low = numpy.fmin.reduce(self._chunk_min[index])
+        high = numpy.fmax.reduce(self._chunk_max[index])
+
+        if len(edges):
+            low = numpy.fmin(low, numpy.fmin.reduce(edges))
+            high = numpy.fmax(high, numpy.fmax.reduce(edges))
+
+        return float(low), float(high)
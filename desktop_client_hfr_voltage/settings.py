@@ -1,4 +1,271 @@
 from PyQt6 import QtCore
+from .filters import DISPLAYS, check_filters, parse_filters
+from .payload import DECODERS
+from .spectrum import AVERAGING, PEAK_INTERPOLATIONS, WINDOWS
+from .trigger import SLOPES
+import os
+import re
+import socket
+
+WATERFALL_SCALES = ['log', 'linear']
+TRIGGER_PRE_RANGE = range(0, 30000, 50)
+TRIGGER_POST_RANGE = range(50, 30000, 50)
+TRIGGER_HOLDOFF_RANGE = range(0, 60000, 50)
+TRIGGER_AVERAGES_RANGE = range(1, 100)
+HISTORY_LEVELS_RANGE = range(0, 40)
+SOURCES = ['mqtt', 'replay', 'results']
+
+
+class SettingsError(ValueError):
+    pass
+
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+
+    if str(value).lower() not in ('true', 'false'):
+        raise ValueError('expected true or false, got %r' % value)
+
+    return str(value).lower() == 'true'
+
+
+def parse_range(value) -> range:
+    tokens = str(value).split(':')
+
+    if len(tokens) not in (2, 3):
+        raise ValueError('expected start:stop[:step], got %r' % value)
+
+    return range(int(tokens[0]), int(tokens[1]), int(tokens[2]) if len(tokens) == 3 else 1)
+
+
+def parse_view_range(value) -> tuple[float, float]:
+    tokens = str(value).split(':')
+
+    if len(tokens) != 2:
+        raise ValueError('expected low:high, got %r' % value)
+
+    return float(tokens[0]), float(tokens[1])
+
+
+def parse_choice(choices: list[str]):
+    def parse(value) -> str:
+        if str(value) not in choices:
+            raise ValueError('expected one of %s, got %r' % (', '.join(choices), value))
+
+        return str(value)
+
+    return parse
+
+
+class Config:
+    def _read(self, key: str, parse, default=None):
+        value = Settings.get(key, default)
+
+        if value is None:
+            raise SettingsError('%s is missing' % key)
+
+        # Kept so that Settings.set can update a single field in place.
+        self.__dict__.setdefault('_parsers', {})[key] = parse
+        return self._parse(key, value)
+
+    def _parse(self, key: str, value):
+        try:
+            return self._parsers[key](value)
+        except (TypeError, ValueError) as error:
+            raise SettingsError('%s: %s' % (key, error)) from None
+
+    def _attribute(self, key: str) -> str:
+        return key.lower().replace('/', '_')
+
+    def _update(self, key: str, value) -> bool:
+        if key not in self._parsers:
+            return False
+
+        setattr(self, self._attribute(key), self._parse(key, value))
+        return True
+
+    def _within(self, key: str, value: int, allowed: range):
+        # Range stops are inclusive, as in the spin boxes built from them.
+        if not allowed.start <= value <= allowed.stop:
+            raise SettingsError('%s: %d is outside %d:%d' % (key, value, allowed.start, allowed.stop))
+
+    def changes(self, other: 'Config') -> set[str]:
+        return {key for key, value in vars(self).items()
+                if not key.startswith('_') and vars(other).get(key) != value}
+
+
+class GeneralConfig(Config):
+    def __init__(self):
+        self.window_title = self._read('window_title', str, 'Application')
+        self.window_width = self._read('window_width', int, 1000)
+        self.window_height = self._read('window_height', int, 700)
+        self.processing_rate_range = self._read('processing_rate_range', parse_range, '1:20:1')
+        self.processing_size_range = self._read('processing_size_range', parse_range, '1000:60000:500')
+        self.waterfall_size_range = self._read('waterfall_size_range', parse_range, '64:16384:64')
+        self.waterfall_history_range = self._read('waterfall_history_range', parse_range, '50:5000:50')
+        self.process_pool_threshold = self._read('process_pool_threshold', int, 0)
+        self.columns = self._read('columns', lambda value: max(1, int(value)), 1)
+        self.capture_directory = self._read(
+            'capture_directory', lambda value: os.path.expanduser(str(value)), '~/hfr-captures')
+        self.capture_max_megabytes = self._read('capture_max_megabytes', int, 512)
+        self.capture_max_minutes = self._read('capture_max_minutes', int, 60)
+        self.capture_queue_size = self._read('capture_queue_size', int, 4096)
+        self.source = self._read('source', parse_choice(SOURCES), 'mqtt')
+        self.replay_speed = self._read('replay_speed', float, 1)
+        self.replay_loop = self._read('replay_loop', parse_bool, 'false')
+        self.metrics = self._read('metrics', parse_bool, 'false')
+        self.results_topic = self._read('results_topic', lambda value: str(value).rstrip('/'), 'hfr/results')
+        self.results_spectrum_bins = self._read('results_spectrum_bins', int, 512)
+        self.mqtt_host = self._read('MQTT/host', str, 'localhost')
+        self.mqtt_username = self._read('MQTT/username', str, '')
+        self.mqtt_password = self._read('MQTT/password', str, '')
+        self.mqtt_connections = self._read('MQTT/connections', int, 1)
+        self.mqtt_wildcard = self._read('MQTT/wildcard', parse_bool, 'true')
+        self.mqtt_persistent_session = self._read('MQTT/persistent_session', parse_bool, 'false')
+        self.mqtt_qos = self._read('MQTT/qos', int, 0)
+        self.mqtt_client_id = self._read('MQTT/client_id', str, 'hfr-voltage-' + socket.gethostname())
+        self.mqtt_reconnect_min = self._read('MQTT/reconnect_min', float, 0.5)
+        self.mqtt_reconnect_max = self._read('MQTT/reconnect_max', float, 30)
+
+        if self.mqtt_connections <= 0:
+            raise SettingsError('MQTT/connections must be positive')
+
+        if self.mqtt_qos not in (0, 1):
+            raise SettingsError('MQTT/qos: expected 0 or 1, got %d' % self.mqtt_qos)
+
+        if not 0 < self.mqtt_reconnect_min <= self.mqtt_reconnect_max:
+            raise SettingsError('MQTT/reconnect_min must be positive and at most MQTT/reconnect_max')
+
+
+class ChannelConfig(Config):
+    # Fields that change what the Source subscribes to or how it decodes.
+    SOURCE_FIELDS = {'topic', 'factor', 'payload_format', 'sequence_check', 'reorder_window', 'queue_limit'}
+    # Fields read only when the stream is built: connections are pooled per broker.
+    RESTART_FIELDS = {'broker'}
+
+    def __init__(self, channel: str, general: GeneralConfig):
+        self.channel = channel
+        self.title = self._field('title', str, channel)
+        self.topic = self._field('topic', str)
+        self.broker = self._field('broker', str, general.mqtt_host)
+        self.payload_format = self._field('payload_format', parse_choice(list(DECODERS)), 'text')
+        self.factor = self._field('factor', float, 1)
+        self.instant_rate = self._field('instant_rate', int, 1)
+        self.processing_rate = self._field('processing_rate', int, 1)
+        self.results_rate = self._field('results_rate', int, self.processing_rate)
+        self.direct_processing_size = self._field('direct_processing_size', int, 1000)
+        self.fft_processing_size = self._field('fft_processing_size', int, 1000)
+        self.fft_segment_size = self._field('fft_segment_size', int, self.fft_processing_size)
+        self.fft_window = self._field('fft_window', parse_choice(WINDOWS), 'hann')
+        self.fft_averaging = self._field('fft_averaging', parse_choice(AVERAGING), 'linear')
+        self.direct_x_converted = self._field('direct_x_converted', parse_bool, 'false')
+        self.fft_x_converted = self._field('fft_x_converted', parse_bool, 'false')
+        self.fft_y_log_mode = self._field('fft_y_log_mode', parse_bool, 'true')
+        self.direct_x_view_range = self._field('direct_x_view_range', parse_view_range, '0:1000')
+        self.direct_y_view_range = self._field('direct_y_view_range', parse_view_range, '0:1000')
+        self.fft_x_view_range = self._field('fft_x_view_range', parse_view_range, '0:0.52')
+        self.fft_y_view_range = self._field('fft_y_view_range', parse_view_range, '0:1000')
+        self.waterfall_fft_size = self._field('waterfall_fft_size', int, 1024)
+        self.waterfall_hop = self._field('waterfall_hop', int, self.waterfall_fft_size // 2)
+        self.waterfall_history = self._field('waterfall_history', int, 300)
+        self.waterfall_scale = self._field('waterfall_scale', parse_choice(WATERFALL_SCALES), 'log')
+        self.peak_count = self._field('peak_count', int, 5)
+        self.peak_interpolation = self._field(
+            'peak_interpolation', parse_choice(PEAK_INTERPOLATIONS), 'gaussian')
+        self.trigger_enabled = self._field('trigger_enabled', parse_bool, 'false')
+        self.trigger_level = self._field('trigger_level', float, 0)
+        self.trigger_slope = self._field('trigger_slope', parse_choice(SLOPES), 'rising')
+        self.trigger_pre = self._field('trigger_pre', int, 200)
+        self.trigger_post = self._field('trigger_post', int, 800)
+        self.trigger_holdoff = self._field('trigger_holdoff', int, 0)
+        self.trigger_averages = self._field('trigger_averages', int, 1)
+        self.history_levels = self._field('history_levels', int, 16)
+        self.history_size = self._field('history_size', int, 8192)
+        self.filters = self._field('filters', parse_filters, '')
+        self.filter_rate = self._field('filter_rate', float, 0)
+        self.filter_display = self._field('filter_display', parse_choice(DISPLAYS), 'filtered')
+        self.sequence_check = self._field('sequence_check', parse_bool, 'false')
+        self.reorder_window = self._field('reorder_window', int, 0)
+        self.queue_limit = self._field('queue_limit', int, general.processing_size_range.stop)
+        self.replay_file = self._field('replay_file', str, '')
+        self.replay_rate = self._field('replay_rate', float, 1000)
+
+        # Only replayed channels read their file; a stale path elsewhere is harmless.
+        if self.replay_file and general.source == 'replay' and \
+                not os.access(os.path.expanduser(self.replay_file), os.R_OK):
+            raise SettingsError('%s/replay_file: cannot read %s' % (channel, self.replay_file))
+
+        for key in ('direct_processing_size', 'fft_processing_size', 'fft_segment_size'):
+            self._within(channel + '/' + key, getattr(self, key), general.processing_size_range)
+
+        self._within(channel + '/processing_rate', self.processing_rate, general.processing_rate_range)
+
+        for key in ('instant_rate', 'results_rate', 'waterfall_history'):
+            if getattr(self, key) <= 0:
+                raise SettingsError('%s/%s must be positive' % (channel, key))
+
+        self._within(channel + '/waterfall_fft_size', self.waterfall_fft_size, general.waterfall_size_range)
+        self._within(channel + '/waterfall_hop', self.waterfall_hop, general.waterfall_size_range)
+
+        # Waterfall spectra are cut out of the sample buffer as well.
+        if self.waterfall_fft_size > general.processing_size_range.stop:
+            raise SettingsError('%s/waterfall_fft_size: %d exceeds %d samples' % (
+                channel, self.waterfall_fft_size, general.processing_size_range.stop))
+
+        if self.waterfall_hop > self.waterfall_fft_size:
+            raise SettingsError('%s/waterfall_hop must not exceed waterfall_fft_size' % channel)
+
+        if self.peak_count < 0:
+            raise SettingsError('%s/peak_count must not be negative' % channel)
+
+        self._within(channel + '/history_levels', self.history_levels, HISTORY_LEVELS_RANGE)
+
+        if self.history_size <= 0:
+            raise SettingsError('%s/history_size must be positive' % channel)
+
+        if self.filter_rate < 0:
+            raise SettingsError('%s/filter_rate must not be negative' % channel)
+
+        try:
+            check_filters(self.filters, self.filter_rate)
+        except ValueError as error:
+            raise SettingsError('%s/filters: %s' % (channel, error)) from None
+
+        self._within(channel + '/trigger_pre', self.trigger_pre, TRIGGER_PRE_RANGE)
+        self._within(channel + '/trigger_post', self.trigger_post, TRIGGER_POST_RANGE)
+        self._within(channel + '/trigger_holdoff', self.trigger_holdoff, TRIGGER_HOLDOFF_RANGE)
+        self._within(channel + '/trigger_averages', self.trigger_averages, TRIGGER_AVERAGES_RANGE)
+
+        # Frames are cut out of the sample buffer, so they cannot be longer.
+        if self.trigger_pre + self.trigger_post > general.processing_size_range.stop:
+            raise SettingsError('%s: trigger_pre + trigger_post exceeds %d samples' % (
+                channel, general.processing_size_range.stop))
+
+    def _field(self, key: str, parse, default=None):
+        return self._read(self.channel + '/' + key, parse, default)
+
+    def _attribute(self, key: str) -> str:
+        return key[len(self.channel) + 1:]
+
+    def trigger(self) -> dict:
+        return {key[len('trigger_'):]: value for key, value in vars(self).items()
+                if key.startswith('trigger_')}
+
+
+class Snapshot:
+    def __init__(self):
+        self.general = GeneralConfig()
+        self.channels = {channel: ChannelConfig(channel, self.general)
+                         for channel in Settings.channels()}
+
+    # Keys of channels that are not in the snapshot yet, and keys no config
+    # reads, are left to the next reload.
+    def update(self, key: str, value):
+        channel = self.channels.get(key.partition('/')[0])
+
+        if channel is None or not channel._update(key, value):
+            self.general._update(key, value)
 
 
 class Settings:
@@ -6,6 +273,7 @@ class Settings:
         pass
 
     settings = QtCore.QSettings("desktop/client", "hfr/voltage")
+    _snapshot: Snapshot | None = None
 
     @staticmethod
     def init():
@@ -14,19 +282,41 @@ class Settings:
 
     @staticmethod
     def set_default():
+        Settings._snapshot = None
         Settings.set('reset', 0)
         Settings.set('window_title', 'Application')
         Settings.set('window_width', 1000)
         Settings.set('window_height', 700)
         Settings.set('processing_rate_range', '1:20:1')
         Settings.set('processing_size_range', '1000:60000:500')
+        Settings.set('waterfall_size_range', '64:16384:64')
+        Settings.set('waterfall_history_range', '50:5000:50')
+        Settings.set('process_pool_threshold', 0)
+        Settings.set('columns', 1)
+        Settings.set('capture_directory', '~/hfr-captures')
+        Settings.set('capture_max_megabytes', 512)
+        Settings.set('capture_max_minutes', 60)
+        Settings.set('capture_queue_size', 4096)
+        Settings.set('source', 'mqtt')
+        Settings.set('replay_speed', 1)
+        Settings.set('replay_loop', 'false')
+        Settings.set('metrics', 'false')
+        Settings.set('results_topic', 'hfr/results')
+        Settings.set('results_spectrum_bins', 512)
 
         Settings.set('MQTT/host', 'localhost')
         Settings.set('MQTT/username', 'username')
         Settings.set('MQTT/password', 'password')
+        Settings.set('MQTT/connections', 1)
+        Settings.set('MQTT/wildcard', 'true')
+        Settings.set('MQTT/persistent_session', 'false')
+        Settings.set('MQTT/qos', 0)
+        Settings.set('MQTT/reconnect_min', 0.5)
+        Settings.set('MQTT/reconnect_max', 30)
 
         Settings.set('C0/title', 'C0')
         Settings.set('C0/topic', '/test/c0')
+        Settings.set('C0/payload_format', 'text')
         Settings.set('C0/direct_x_converted', 'false')
         Settings.set('C0/fft_x_converted', 'false')
         Settings.set('C0/factor', 1)
@@ -34,53 +324,162 @@ class Settings:
         Settings.set('C0/processing_rate', 1)
         Settings.set('C0/direct_processing_size', 1000)
         Settings.set('C0/fft_processing_size', 1000)
+        Settings.set('C0/fft_segment_size', 1000)
+        Settings.set('C0/fft_window', 'hann')
+        Settings.set('C0/fft_averaging', 'linear')
         Settings.set('C0/fft_y_log_mode', True)
         Settings.set('C0/direct_x_view_range', '0:1000')
         Settings.set('C0/direct_y_view_range', '0:1000')
         Settings.set('C0/fft_x_view_range', '0:0.52')
         Settings.set('C0/fft_y_view_range', '0:1000')
+        Settings.set('C0/waterfall_fft_size', 1024)
+        Settings.set('C0/waterfall_hop', 512)
+        Settings.set('C0/waterfall_history', 300)
+        Settings.set('C0/waterfall_scale', 'log')
+        Settings.set('C0/peak_count', 5)
+        Settings.set('C0/peak_interpolation', 'gaussian')
 
         Settings.set('C1/title', 'C1')
         Settings.set('C1/topic', '/test/c1')
-        Settings.set('C0/direct_x_converted', 'false')
-        Settings.set('C0/fft_x_converted', 'false')
+        Settings.set('C1/payload_format', 'text')
+        Settings.set('C1/direct_x_converted', 'false')
+        Settings.set('C1/fft_x_converted', 'false')
         Settings.set('C1/factor', 1)
         Settings.set('C1/instant_rate', 1)
         Settings.set('C1/processing_rate', 1)
         Settings.set('C1/direct_processing_size', 1000)
         Settings.set('C1/fft_processing_size', 1000)
+        Settings.set('C1/fft_segment_size', 1000)
+        Settings.set('C1/fft_window', 'hann')
+        Settings.set('C1/fft_averaging', 'linear')
         Settings.set('C1/fft_y_log_mode', True)
         Settings.set('C1/direct_x_view_range', '0:1000')
         Settings.set('C1/direct_y_view_range', '0:1000')
         Settings.set('C1/fft_x_view_range', '0:0.52')
         Settings.set('C1/fft_y_view_range', '0:1000')
+        Settings.set('C1/waterfall_fft_size', 1024)
+        Settings.set('C1/waterfall_hop', 512)
+        Settings.set('C1/waterfall_history', 300)
+        Settings.set('C1/waterfall_scale', 'log')
+        Settings.set('C1/peak_count', 5)
+        Settings.set('C1/peak_interpolation', 'gaussian')
 
     @staticmethod
     def set(key: str, value):
+        # The value is parsed before it is written, and only the field it
+        # sets is updated, so the snapshot stays valid.
+        if Settings._snapshot is not None:
+            Settings._snapshot.update(key, value)
+
         Settings.settings.setValue(key, value)
 
+    # Settings are parsed and validated once; components read the typed
+    # snapshot instead of parsing QSettings strings themselves.
+    @staticmethod
+    def snapshot() -> Snapshot:
+        if Settings._snapshot is None:
+            Settings._snapshot = Snapshot()
+
+        return Settings._snapshot
+
+    @staticmethod
+    def general() -> GeneralConfig:
+        return Settings.snapshot().general
+
+    @staticmethod
+    def channel(channel: str) -> ChannelConfig:
+        snapshot = Settings.snapshot()
+
+        if channel not in snapshot.channels:
+            snapshot.channels[channel] = ChannelConfig(channel, snapshot.general)
+
+        return snapshot.channels[channel]
+
+    @staticmethod
+    def reload() -> Snapshot:
+        Settings.settings.sync()
+        snapshot = Snapshot()
+        Settings._snapshot = snapshot
+        return snapshot
+
     @staticmethod
     def set_for_channel(channel: str, key: str, value):
         Settings.set(channel + '/' + key, value)
 
     @staticmethod
-    def get(key: str):
-        return Settings.settings.value(key)
+    def get(key: str, default=None):
+        return Settings.settings.value(key, default)
 
     @staticmethod
-    def get_for_channel(channel: str, key: str):
-        return Settings.get(channel + '/' + key)
+    def get_for_channel(channel: str, key: str, default=None):
+        return Settings.get(channel + '/' + key, default)
 
     @staticmethod
-    def get_range(key: str) -> range:
-        tokens = str(Settings.get(key)).split(':')
-        return range(
-            int(tokens[0]),
-            int(tokens[1]),
-            int(tokens[2]) if len(tokens) == 3 else 1
-        )
+    def channels() -> list[str]:
+        groups = [group for group in Settings.settings.childGroups()
+                  if Settings.get_for_channel(group, 'topic') is not None]
+        return sorted(groups, key=lambda group: [
+            int(token) if token.isdigit() else token for token in re.split(r'(\d+)', group)])
 
-    @staticmethod
-    def get_view_range(key: str) -> list:
-        tokens = str(Settings.get(key)).split(':')
-        return [float(tokens[0]), float(tokens[1])]
+
+class SettingsWatcher(QtCore.QObject):
+    channelChanged = QtCore.pyqtSignal(object, object)
+    settingsRejected = QtCore.pyqtSignal(str)
+
+    DELAY = 200
+
+    def __init__(self):
+        super().__init__()
+        self.snapshot = Settings.snapshot()
+        self.path = Settings.settings.fileName()
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.timer = QtCore.QTimer(self)
+
+        # Editors write in several steps, so changes are applied once the file settles.
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.reload)
+        self.watcher.fileChanged.connect(lambda: self.timer.start(self.DELAY))
+        self.watch()
+
+    def watch(self):
+        # Editors that save by replacing the file drop it from the watch list.
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+
+    def reload(self):
+        self.watch()
+
+        try:
+            snapshot = Settings.reload()
+        except SettingsError as error:
+            self.settingsRejected.emit('Settings not applied: %s' % error)
+            return
+
+        # Processors and widgets are built per channel on start.
+        for channel in sorted(snapshot.channels.keys() - self.snapshot.channels.keys()):
+            self.settingsRejected.emit('Channel %s added: restart required' % channel)
+
+        for channel in sorted(self.snapshot.channels.keys() - snapshot.channels.keys()):
+            self.settingsRejected.emit('Channel %s removed: restart required' % channel)
+
+        for channel, config in snapshot.channels.items():
+            previous = self.snapshot.channels.get(channel)
+
+            if previous is None:
+                continue
+
+            changes = config.changes(previous)
+
+            for key in sorted(changes & config.RESTART_FIELDS):
+                self.settingsRejected.emit('%s/%s not applied: restart required' % (channel, key))
+
+            if changes - config.RESTART_FIELDS:
+                self.channelChanged.emit(config, changes - config.RESTART_FIELDS)
+
+        self.snapshot = snapshot
+
+    def stop(self):
+        self.timer.stop()
+
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
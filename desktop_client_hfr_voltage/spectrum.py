@@ -0,0 +1,327 @@
+from numpy.lib.stride_tricks import sliding_window_view
+from concurrent.futures import Executor
+from .metrics import timed
+import functools
+import numpy
+
+WINDOWS = ['hann', 'hamming', 'blackman', 'blackmanharris', 'flattop', 'boxcar']
+
+AVERAGING_NONE = 'none'
+AVERAGING_LINEAR = 'linear'
+AVERAGING_EXPONENTIAL = 'exponential'
+AVERAGING = [AVERAGING_LINEAR, AVERAGING_EXPONENTIAL, AVERAGING_NONE]
+
+PEAK_INTERPOLATIONS = ['gaussian', 'parabolic']
+
+
+# SciPy takes longer to import than the rest of the application, so it is
+# imported on the first spectrum rather than at startup.
+@functools.lru_cache(maxsize=32)
+def get_fast_length(size: int) -> int:
+    from scipy import fft
+    return fft.next_fast_len(size, real=True)
+
+
+@functools.lru_cache(maxsize=32)
+def get_window(name: str, size: int) -> numpy.ndarray:
+    from scipy import signal
+    window = signal.get_window(name, size, fftbins=True)
+    window.flags.writeable = False
+    return window
+
+
+@functools.lru_cache(maxsize=32)
+def get_frequencies(nfft: int) -> numpy.ndarray:
+    from scipy import fft
+    frequencies = fft.rfftfreq(nfft)
+    frequencies.flags.writeable = False
+    return frequencies
+
+
+@functools.lru_cache(maxsize=32)
+def get_amplitude_scale(name: str, size: int, nfft: int) -> numpy.ndarray:
+    # One-sided amplitude: a sine of amplitude A peaks at A.
+    scale = numpy.full(nfft // 2 + 1, 2 / get_window(name, size).sum())
+    scale[0] /= 2
+
+    if nfft % 2 == 0:
+        scale[-1] /= 2
+
+    scale.flags.writeable = False
+    return scale
+
+
+# Gap (NaN) samples are bridged by linear interpolation so a lost message
+# does not turn the whole spectrum into NaN.
+def fill_gaps(samples: numpy.ndarray) -> numpy.ndarray:
+    total = samples.sum()
+
+    if total == total:
+        return samples
+
+    gaps = numpy.isnan(samples)
+    valid = numpy.flatnonzero(~gaps)
+    samples = samples.copy()
+
+    if len(valid) == 0:
+        samples[:] = 0
+        return samples
+
+    samples[gaps] = numpy.interp(numpy.flatnonzero(gaps), valid, samples[valid])
+    return samples
+
+
+def segment_power(frames: numpy.ndarray, taper: numpy.ndarray, nfft: int) -> numpy.ndarray:
+    from scipy import fft
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    frames *= taper
+    spectrum = fft.rfft(frames, nfft, axis=1)
+    return spectrum.real ** 2 + spectrum.imag ** 2
+
+
+class SpectrumEngine:
+    def __init__(self, segment_size: int, span: int, window: str = 'hann', averaging: str = AVERAGING_LINEAR,
+                 executor: Executor | None = None):
+        self.segment_size = segment_size
+        self.hop = max(1, segment_size // 2)
+        self.span = max(span, segment_size)
+        self.window = window
+        self.averaging = averaging
+        self.executor = executor
+        self.reset()
+
+    @functools.cached_property
+    def nfft(self) -> int:
+        return get_fast_length(self.segment_size)
+
+    @functools.cached_property
+    def _taper(self) -> numpy.ndarray:
+        return get_window(self.window, self.segment_size)
+
+    @functools.cached_property
+    def _scale(self) -> numpy.ndarray:
+        return get_amplitude_scale(self.window, self.segment_size, self.nfft)
+
+    @functools.cached_property
+    def _frequencies(self) -> numpy.ndarray:
+        return get_frequencies(self.nfft)
+
+    def reset(self):
+        self._next = None
+        self._power = None
+        self._history = None
+        self._history_sum = None
+        self._history_position = 0
+        self._history_filled = 0
+
+    def take(self, storage) -> numpy.ndarray | None:
+        total = storage.total()
+        self._next = max(self._next or 0, total - storage.filled(), total - self.span)
+        available = total - self._next
+
+        if available < self.segment_size:
+            return None
+
+        count = (available - self.segment_size) // self.hop + 1
+        frames = sliding_window_view(fill_gaps(storage.latest(available)), self.segment_size)
+        self._next += count * self.hop
+        return frames[:count * self.hop:self.hop]
+
+    @timed('fft')
+    def transform(self, frames: numpy.ndarray) -> numpy.ndarray:
+        if self.executor is None:
+            return segment_power(frames, self._taper, self.nfft)
+
+        return self.executor.submit(
+            segment_power, numpy.ascontiguousarray(frames), self._taper, self.nfft).result()
+
+    def update(self, storage) -> bool:
+        frames = self.take(storage)
+
+        if frames is None:
+            return False
+
+        self.fold(self.transform(frames))
+        return True
+
+    def fold(self, power: numpy.ndarray):
+        if self.averaging == AVERAGING_EXPONENTIAL:
+            if self._power is None:
+                self._power = power[0]
+                power = power[1:]
+
+            alpha = min(1, self.hop / self.span)
+            decay = (1 - alpha) ** numpy.arange(len(power) - 1, -1, -1)
+            self._power = (1 - alpha) ** len(power) * self._power + \
+                alpha * (decay @ power)
+
+        elif self.averaging == AVERAGING_LINEAR:
+            self._fold_linear(power)
+
+        else:
+            self._power = power[-1]
+
+    def _fold_linear(self, power: numpy.ndarray):
+        if self._history is None:
+            # Segments whose transform reaches before the span are left out.
+            depth = max((self.span - self.nfft) // self.hop + 1, 1)
+            self._history = numpy.zeros((depth, power.shape[1]))
+            self._history_sum = numpy.zeros(power.shape[1])
+
+        depth = len(self._history)
+        power = power[-depth:]
+
+        for row in power:
+            self._history_sum += row - self._history[self._history_position]
+            self._history[self._history_position] = row
+            self._history_position = (self._history_position + 1) % depth
+
+            # Running sum is re-based once per lap so rounding cannot accumulate.
+            if self._history_position == 0:
+                self._history_sum = self._history.sum(axis=0)
+
+        self._history_filled = min(self._history_filled + len(power), depth)
+        self._power = self._history_sum / self._history_filled
+
+    def ready(self) -> bool:
+        return self._power is not None
+
+    def frequencies(self, sampling_rate: float = 1) -> numpy.ndarray:
+        return self._frequencies * sampling_rate
+
+    def amplitude(self) -> numpy.ndarray:
+        return numpy.sqrt(numpy.maximum(self._power, 0)) * self._scale
+
+
+def _vertex(left: numpy.ndarray, centre: numpy.ndarray, right: numpy.ndarray) -> tuple:
+    # Flat tops have no curvature; they are taken at the bin itself.
+    curvature = left - 2 * centre + right
+    curvature = numpy.where(curvature < 0, curvature, -numpy.inf)
+    offset = 0.5 * (left - right) / curvature
+    return offset, centre - 0.25 * (left - right) * offset, curvature
+
+
+# Returns interpolated positions (in bins), amplitudes and half-power widths
+# (in bins) of the count highest local maxima, highest first. A parabola is
+# fitted through each maximum and its neighbours; 'gaussian' fits it to the
+# log amplitude, which matches the main lobe of the usual windows more closely.
+def find_peaks(amplitude: numpy.ndarray, count: int,
+               interpolation: str = 'gaussian') -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    inner = amplitude[1:-1]
+    maxima = numpy.flatnonzero((inner > amplitude[:-2]) & (inner >= amplitude[2:])) + 1
+
+    if len(maxima) > count:
+        maxima = maxima[numpy.argpartition(amplitude[maxima], -count)[-count:]]
+
+    maxima = maxima[numpy.argsort(amplitude[maxima])[::-1]]
+    left, centre, right = amplitude[maxima - 1], amplitude[maxima], amplitude[maxima + 1]
+    offset, height, curvature = _vertex(left, centre, right)
+    # The amplitude drops to 1/sqrt(2) of the top at the half-power points.
+    width = 2 * numpy.sqrt(-2 * (1 - numpy.sqrt(0.5)) * height / curvature)
+
+    if interpolation == 'gaussian':
+        # Peaks next to an exact zero keep the parabolic fit.
+        positive = numpy.minimum(left, right) > 0
+        logs = numpy.log(numpy.where(positive, numpy.stack((left, centre, right)), 1))
+        log_offset, log_height, log_curvature = _vertex(*logs)
+        offset = numpy.where(positive, log_offset, offset)
+        height = numpy.where(positive, numpy.exp(log_height), height)
+        width = numpy.where(positive, 2 * numpy.sqrt(-numpy.log(2) / log_curvature), width)
+
+    return maxima + offset, height, width
+
+
+# Follows the strongest peaks from one spectrum to the next. Rows are
+# frequency, amplitude, Q and frequency drift per second, in the units of the
+# step passed in; a peak continues the track whose frequency was nearest, if
+# it was within two bins.
+class PeakTracker:
+    TOLERANCE = 2
+    SMOOTHING = 0.3
+
+    def __init__(self, count: int, interpolation: str = 'gaussian'):
+        self.count = count
+        self.interpolation = interpolation
+        self.reset()
+
+    def reset(self):
+        self._frequencies = numpy.empty(0)
+        self._drifts = numpy.empty(0)
+        self._time = None
+        self._rows = numpy.empty((0, 4))
+
+    def update(self, amplitude: numpy.ndarray, step: float, timestamp: float) -> numpy.ndarray:
+        # Without new samples the spectrum has not changed either.
+        if timestamp == self._time:
+            return self._rows
+
+        position, height, width = find_peaks(amplitude, self.count, self.interpolation)
+        frequencies = position * step
+        drifts = numpy.zeros(len(frequencies))
+
+        with numpy.errstate(divide='ignore'):
+            q = position / width
+
+        if len(self._frequencies) and self._time is not None and timestamp > self._time:
+            order = numpy.argsort(self._frequencies)
+            previous = self._frequencies[order]
+            # Neighbours on either side, the same one at the ends and for a single track.
+            right = numpy.minimum(numpy.searchsorted(previous, frequencies), len(previous) - 1)
+            left = numpy.maximum(right - 1, 0)
+            nearest = numpy.where(
+                frequencies - previous[left] < previous[right] - frequencies, left, right)
+            distance = frequencies - previous[nearest]
+            drifts = numpy.where(
+                numpy.abs(distance) <= self.TOLERANCE * step,
+                self.SMOOTHING * distance / (timestamp - self._time) +
+                (1 - self.SMOOTHING) * self._drifts[order][nearest], 0)
+
+        self._frequencies, self._drifts, self._time = frequencies, drifts, timestamp
+        self._rows = numpy.column_stack((frequencies, height, q, drifts))
+        return self._rows
+
+
+class Spectrogram:
+    def __init__(self, segment_size: int, hop: int, history: int, window: str = 'hann'):
+        self.segment_size = segment_size
+        self.hop = max(1, hop)
+        self.history = history
+        self.nfft = get_fast_length(segment_size)
+        self.window = window
+
+        self._taper = get_window(window, segment_size)
+        self._scale = get_amplitude_scale(window, segment_size, self.nfft).astype(numpy.float32)
+        self._next = None
+
+    # Returns one amplitude row per hop of samples ingested since the last call.
+    @timed('waterfall')
+    def update(self, storage) -> numpy.ndarray | None:
+        total = storage.total()
+
+        if self._next is None:
+            self._next = total - self.segment_size
+
+        self._next = max(self._next, total - storage.filled())
+        available = total - self._next
+
+        if available < self.segment_size:
+            return None
+
+        count = (available - self.segment_size) // self.hop + 1
+
+        # Rows that would scroll straight out of the history are skipped.
+        if count > self.history:
+            self._next += (count - self.history) * self.hop
+            count = self.history
+
+        samples = fill_gaps(storage.segment(
+            self._next, self._next + (count - 1) * self.hop + self.segment_size))
+        frames = sliding_window_view(samples, self.segment_size)[::self.hop]
+        self._next += count * self.hop
+
+        power = segment_power(frames, self._taper, self.nfft)
+        return numpy.sqrt(power, dtype=numpy.float32) * self._scale
+
+    def bin_width(self, sampling_rate: float = 1) -> float:
+        return sampling_rate / self.nfft
+
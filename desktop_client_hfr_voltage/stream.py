@@ -1,58 +1,605 @@
 from PyQt6 import QtCore
 from .settings import Settings
+from . import payload
+from .metrics import histogram, timed
 import paho.mqtt.client as mqtt
+import collections
+import random
+import threading
+import time
+
+
+class StagingQueue:
+    def __init__(self, limit: int | None = None):
+        self._lock = threading.Lock()
+        self._blocks: list[payload.Block] = []
+        self._depth = 0
+        self.limit = limit
+        self.shed = 0
+
+    def put(self, block: payload.Block) -> bool:
+        with self._lock:
+            was_empty = not self._blocks
+            self._blocks.append(block)
+            self._depth += len(block)
+
+            if self.limit is not None and self._depth > self.limit:
+                self._shed()
+
+        return was_empty
+
+    # The processor has fallen behind: the oldest samples beyond the limit are
+    # skipped and replaced by a single gap sample, so the splice is never
+    # mistaken for continuous data while a short burst costs only its overflow.
+    # A gap sample already at the head is merged into the new one.
+    def _shed(self):
+        excess = self._depth - self.limit
+        after = before = None
+
+        while excess > 0 and self._blocks:
+            block = self._blocks[0]
+            count = min(len(block), excess)
+
+            if count:
+                times = block.times()
+                after = times[0] if after is None else after
+                before = times[count - 1]
+
+            if not block.gap:
+                self.shed += count
+
+            if count == len(block):
+                self._blocks.pop(0)
+            else:
+                self._blocks[0] = payload.Block(block.values[count:], timestamps=times[count:], gap=block.gap)
+
+            self._depth -= count
+            excess -= count
+
+        if after is None:
+            return
+
+        self._blocks.insert(0, payload.gap_block(1, after, before))
+        self._depth += 1
+
+    def drain(self) -> list[payload.Block]:
+        with self._lock:
+            blocks = self._blocks
+            self._blocks = []
+            self._depth = 0
+
+        return blocks
+
+    def depth(self) -> int:
+        return self._depth
+
+
+class SequenceTracker:
+    MODULO = 1 << 32
+    RESTART = 1 << 20
+    HISTORY = 1024
+
+    def __init__(self, window: int, gap_limit: int):
+        self.window = window
+        self.gap_limit = gap_limit
+        self.expected: int | None = None
+        self.pending: dict[int, payload.Block] = {}
+        self.released: collections.deque[int] = collections.deque(maxlen=self.HISTORY)
+        self.last_time: float | None = None
+        self.last_length = 1
+
+        self.gaps = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+        self.restarts = 0
+
+    def accept(self, block: payload.Block) -> list[payload.Block]:
+        if block.sequence is None:
+            return [block]
+
+        if self.expected is None:
+            self.expected = block.sequence
+
+        ahead = (block.sequence - self.expected) % self.MODULO
+
+        # Behind the expected number: already released, or its slot was
+        # given up and filled with a gap.
+        if ahead >= self.MODULO // 2:
+            if self.MODULO - ahead > self.RESTART:
+                return self.restart(block)
+
+            if block.sequence in self.released:
+                self.duplicates += 1
+            else:
+                self.late += 1
+
+            return []
+
+        if ahead > self.RESTART:
+            return self.restart(block)
+
+        if block.sequence in self.pending:
+            self.duplicates += 1
+            return []
+
+        if ahead == 0 and self.pending:
+            self.reordered += 1
+
+        self.pending[block.sequence] = block
+        return self.release()
+
+    def restart(self, block: payload.Block) -> list[payload.Block]:
+        # The producer restarted its numbering; pending blocks belong to the old run.
+        self.restarts += 1
+        self.expected = block.sequence
+        self.pending = {block.sequence: block}
+        self.released.clear()
+        return self.release()
+
+    def release(self) -> list[payload.Block]:
+        blocks = []
+
+        while self.pending:
+            if self.expected in self.pending:
+                block = self.pending.pop(self.expected)
+                self.released.append(self.expected)
+                self.expected = (self.expected + 1) % self.MODULO
+                self.last_time = float(block.times()[-1])
+                self.last_length = len(block)
+                blocks.append(block)
+            elif len(self.pending) > self.window:
+                following = min(self.pending, key=lambda sequence: (sequence - self.expected) % self.MODULO)
+                blocks.append(self.gap((following - self.expected) % self.MODULO, self.pending[following]))
+                self.expected = following
+            else:
+                break
+
+        return blocks
+
+    def gap(self, messages: int, following: payload.Block) -> payload.Block:
+        first = float(following.times()[0])
+        last = first if self.last_time is None else self.last_time
+
+        if following.period:
+            count = round((first - last) / following.period) - 1
+        else:
+            count = messages * self.last_length
+
+        count = max(count, 1)
+        self.gaps += 1
+        self.missing += count
+
+        return payload.gap_block(min(count, self.gap_limit), last, first)
+
+    def counters(self) -> dict[str, int]:
+        return {
+            'gaps': self.gaps,
+            'missing': self.missing,
+            'duplicates': self.duplicates,
+            'reordered': self.reordered,
+            'late': self.late,
+            'restarts': self.restarts,
+        }
 
 
 class Source(QtCore.QObject):
-    tick = QtCore.pyqtSignal(float)
+    dataAvailable = QtCore.pyqtSignal()
+    # Seconds from reconnecting to the first message of the new session.
+    resumed = QtCore.pyqtSignal(float)
 
-    def __init__(self, channel: str, client: mqtt.Client) -> None:
+    def __init__(self, channel: str) -> None:
         super().__init__()
         self.channel = channel
-        self.client = client
 
-        self.factor = float(Settings.get_for_channel(channel, 'factor'))
-        self.topic = Settings.get_for_channel(self.channel, 'topic')
+        config = Settings.channel(channel)
+        self.factor = config.factor
+        self.topic = config.topic
+        self.format = config.payload_format
+        self.decode = payload.DECODERS[self.format]
+        # Samples beyond the processor's buffer would be overwritten before
+        # being shown, so that is where load shedding starts by default.
+        self.queue = StagingQueue(config.queue_limit)
+        self.tracker = None
+        self.recorder = None
+        self.dropped = 0
+        self.gap_limit = Settings.general().processing_size_range.stop
+        self.last_time: float | None = None
+        self.period: float | None = None
+        self.resumed_at: float | None = None
+        self.reconnects = 0
+        self.first_sample: float | None = None
+        self.missing = 0
 
-        self.client.message_callback_add(self.topic, self.on_message)
-        self.client.subscribe(self.topic)
+        if config.sequence_check:
+            self.tracker = SequenceTracker(config.reorder_window, self.gap_limit)
 
+    # Called on the network thread once the connection is back, before any
+    # message of the new session.
+    def resume(self):
+        self.reconnects += 1
+        self.resumed_at = time.perf_counter()
+
+    @timed('ingest')
     def on_message(self, _id, _data, message):
-        self.tick.emit(float(message.payload) * self.factor)
+        try:
+            block = self.decode(message.payload, self.factor)
+        except ValueError:
+            self.dropped += 1
+            return
+
+        if block.timestamp is None:
+            block.timestamp = time.time()
+
+        resumed = self.resumed_at is not None
+
+        if resumed:
+            self.first_sample = time.perf_counter() - self.resumed_at
+            self.resumed_at = None
+            histogram('first sample ' + self.channel).record(self.first_sample)
+            self.resumed.emit(self.first_sample)
+
+        if self.recorder is not None:
+            self.recorder.put(block)
+
+        # Sequence numbers, where sent, locate the gap themselves.
+        if self.tracker is None:
+            gap = self.gap(block) if resumed else None
+
+            if gap is not None and self.queue.put(gap):
+                self.dataAvailable.emit()
+
+            self.follow(block, resumed)
+
+            if self.queue.put(block):
+                self.dataAvailable.emit()
+            return
+
+        for released in self.tracker.accept(block):
+            if self.queue.put(released):
+                self.dataAvailable.emit()
+
+    def follow(self, block: payload.Block, resumed: bool):
+        period = block.period
+
+        if period is None and self.last_time is not None:
+            period = (block.timestamp - self.last_time) / len(block)
+
+        # The time across a reconnection says nothing about the rate.
+        if period and not resumed:
+            self.period = period if self.period is None else self.period + (period - self.period) / 16
+
+        self.last_time = block.last_time()
+
+    # Samples missed while disconnected, from the time between the last sample
+    # before and the first after at the rate seen before; a single gap sample
+    # when the rate is not known yet.
+    def gap(self, block: payload.Block) -> payload.Block | None:
+        if self.last_time is None or not len(block):
+            return None
+
+        first = float(block.times()[0])
+        period = block.period or self.period
+        count = round((first - self.last_time) / period) - 1 if period else 1
+
+        if count <= 0:
+            return None
+
+        self.missing += count
+        return payload.gap_block(min(count, self.gap_limit), self.last_time, first)
+
+    def lost(self) -> int:
+        missing = self.missing if self.tracker is None else self.tracker.missing
+        return self.dropped + self.queue.shed + missing
+
+    def counters(self) -> dict[str, int]:
+        counters = {'dropped': self.dropped, 'shed': self.queue.shed}
+
+        if self.tracker is not None:
+            counters.update(self.tracker.counters())
+        elif self.missing:
+            counters['missing'] = self.missing
+
+        if self.reconnects:
+            counters['reconnects'] = self.reconnects
+
+        if self.first_sample is not None:
+            counters['first_sample_ms'] = round(self.first_sample * 1000)
+
+        return counters
+
+
+def is_pattern(topic: str) -> bool:
+    return '+' in topic or '#' in topic
+
+
+# The subscriptions covering `topics`: one wildcard over their common levels
+# when there is one that matches none of the `excluded` topics, otherwise the
+# topics themselves.
+def subscription_filters(topics: list[str], wildcard: bool = True, excluded=()) -> list[str]:
+    topics = sorted(set(topics))
+
+    if not wildcard or len(topics) < 2 or any(is_pattern(topic) for topic in topics):
+        return topics
+
+    levels = [topic.split('/') for topic in topics]
+    common = []
+
+    for parts in zip(*levels):
+        if len(set(parts)) > 1:
+            break
+
+        common.append(parts[0])
+
+    # A leading '/' makes an empty first level, which alone would match
+    # everything on the broker.
+    if not any(common):
+        return topics
+
+    pattern = '/'.join(common) + '/#'
+
+    # Other connections to the same broker carry the excluded topics; they
+    # must not be delivered here as well.
+    if any(mqtt.topic_matches_sub(pattern, topic) for topic in excluded):
+        return topics
+
+    return [pattern]
+
+
+# Delays between connection attempts: doubling from `minimum` up to
+# `maximum`, each drawn from its upper half so that many clients cut off by
+# one broker restart do not all come back at the same moment.
+class Backoff:
+    def __init__(self, minimum: float, maximum: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.attempts = 0
+
+    def next(self) -> float:
+        delay = min(self.maximum, self.minimum * 2 ** self.attempts)
+        self.attempts = min(self.attempts + 1, 64)
+        return delay * random.uniform(0.5, 1)
+
+    def reset(self):
+        self.attempts = 0
+
+
+# One client connection and the channels it carries. Messages are handed to
+# their source by a topic lookup instead of paho matching every message
+# against one callback per channel. The routes are replaced, never changed
+# in place, because the network thread reads them while the GUI thread edits.
+class Connection:
+    def __init__(self, host: str, client: mqtt.Client, wildcard: bool, qos: int = 0,
+                 persistent: bool = False, backoff: Backoff | None = None):
+        self.host = host
+        self.client = client
+        self.wildcard = wildcard
+        self.qos = qos
+        self.persistent = persistent
+        self.backoff = backoff or Backoff(0.5, 30)
+        self.routes: dict[str, Source] = {}
+        self.patterns: dict[str, Source] = {}
+        self.filters: set[str] = set()
+        self.session_present = False
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+        # Set by the stream; called on the network thread.
+        self.notify = lambda up: None
+        self.failed = lambda: None
+
+        self.client.on_message = self.on_message
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = lambda *argv: self.notify(False)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='MQTT ' + self.host, daemon=True)
+        self.thread.start()
+
+    # paho's own reconnection is off, so this thread alone decides when to try
+    # again: loop_forever() returns when the connection is lost.
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.client.connect(self.host)
+            except OSError:
+                self.failed()
+            else:
+                self.client.loop_forever()
+
+            self.stopped.wait(self.backoff.next())
+
+    def stop(self):
+        self.stopped.set()
+        self.client.disconnect()
+
+        if self.thread is not None:
+            self.thread.join(1)
+
+    def on_connect(self, client, userdata, flags, rc, *argv):
+        if rc != 0:
+            self.failed()
+            return
+
+        self.backoff.reset()
+        self.session_present = self.persistent and bool(flags.get('session present'))
+
+        for source in self.sources():
+            source.resume()
+
+        self.notify(True)
+
+    def on_message(self, client, userdata, message):
+        source = self.routes.get(message.topic)
+
+        if source is None:
+            source = next((source for pattern, source in self.patterns.items()
+                           if mqtt.topic_matches_sub(pattern, message.topic)), None)
+
+        if source is not None:
+            source.on_message(client, userdata, message)
+
+    def add(self, source: Source):
+        if is_pattern(source.topic):
+            self.patterns = {**self.patterns, source.topic: source}
+        else:
+            self.routes = {**self.routes, source.topic: source}
+
+    def remove(self, source: Source):
+        self.patterns = {topic: other for topic, other in self.patterns.items() if other is not source}
+        self.routes = {topic: other for topic, other in self.routes.items() if other is not source}
+
+    def topics(self) -> list[str]:
+        return [*self.routes, *self.patterns]
+
+    def sources(self) -> list[Source]:
+        return [*self.routes.values(), *self.patterns.values()]
+
+    # Brings the broker's subscriptions in line with the routes, with at most
+    # one SUBSCRIBE and one UNSUBSCRIBE packet. New filters are subscribed
+    # before stale ones are dropped, so a moved topic is never uncovered.
+    def sync(self, excluded=()):
+        filters = set(subscription_filters(self.topics(), self.wildcard, excluded))
+        added = sorted(filters - self.filters)
+        stale = sorted(self.filters - filters)
+
+        if added:
+            self.client.subscribe([(topic, self.qos) for topic in added])
+
+        if stale:
+            self.client.unsubscribe(stale)
+
+        self.filters = filters
 
 
 class Stream(QtCore.QObject):
     connected = QtCore.pyqtSignal()
     disconnected = QtCore.pyqtSignal()
     connectionFailed = QtCore.pyqtSignal()
+    firstSample = QtCore.pyqtSignal(str, float)
+    # Emitted on paho's network threads; handled on the stream's thread.
+    connectionChanged = QtCore.pyqtSignal(int, bool)
 
-    def __init__(self):
+    def __init__(self, create_client=mqtt.Client):
         super().__init__()
-        self.client = mqtt.Client()
+        general = Settings.general()
         self.sources: list[Source] = []
+        self.connections: list[Connection] = []
+        self.assignments: dict[str, Connection] = {}
+        self.up: set[int] = set()
+        self.sync_pending = False
+
+        # Channels are spread round-robin over General/MQTT connections per
+        # broker, each connection with its own network thread.
+        hosts = {general.mqtt_host: []}
+
+        for channel in Settings.channels():
+            hosts.setdefault(Settings.channel(channel).broker, []).append(channel)
+
+        for host, channels in hosts.items():
+            pool = [self.create_connection(host, create_client, len(self.connections) + index)
+                    for index in range(max(1, min(general.mqtt_connections, len(channels))))]
+
+            for index, channel in enumerate(channels):
+                self.assignments[channel] = pool[index % len(pool)]
+
+            self.connections.extend(pool)
+
+        # Results are published and subscribed on the main broker's first connection.
+        self.client = self.connections[0].client
+        self.connectionChanged.connect(self.on_connection_changed)
+
+        # The broker is reached on the network threads, so the window does
+        # not wait for it.
+        for connection in self.connections:
+            connection.start()
 
-        self.client.username_pw_set(Settings.get(
-            'MQTT/username'), Settings.get('MQTT/password'))
-        self.client.on_connect = lambda *argv: self.connected.emit()
-        self.client.on_connect_fail = lambda *argv: self.connectionFailed.emit()
-        self.client.on_disconnect = lambda *argv: self.disconnected.emit()
+    def create_connection(self, host: str, create_client, index: int) -> Connection:
+        general = Settings.general()
+        persistent = general.mqtt_persistent_session
+        # A persistent session is found again by its client id, so the id must
+        # not change between runs.
+        client = create_client(client_id='%s-%d' % (general.mqtt_client_id, index) if persistent else '',
+                               clean_session=not persistent, reconnect_on_failure=False)
+        client.username_pw_set(general.mqtt_username, general.mqtt_password)
 
-        self.client.loop_start()
-        self.client.connect(Settings.get('MQTT/host'))
+        connection = Connection(host, client, general.mqtt_wildcard, general.mqtt_qos, persistent,
+                                Backoff(general.mqtt_reconnect_min, general.mqtt_reconnect_max))
+        connection.notify = lambda up: self.connectionChanged.emit(index, up)
+        connection.failed = self.connectionFailed.emit
+        return connection
+
+    def on_connection_changed(self, index: int, up: bool):
+        connection = self.connections[index]
+
+        if not up:
+            self.up.discard(index)
+            self.disconnected.emit()
+            return
+
+        # Without a stored session the broker has forgotten the subscriptions.
+        if not connection.session_present:
+            connection.filters = set()
+
+        self.sync_connection(connection)
+        self.up.add(index)
+
+        if len(self.up) == len(self.connections):
+            self.connected.emit()
+
+    def connection(self, channel: str) -> Connection:
+        return self.assignments.get(channel, self.connections[0])
+
+    # Sources branched in one pass of the event loop share one SUBSCRIBE.
+    def schedule_sync(self):
+        if not self.sync_pending:
+            self.sync_pending = True
+            QtCore.QTimer.singleShot(0, self.sync)
+
+    def sync(self):
+        self.sync_pending = False
+
+        for connection in self.connections:
+            self.sync_connection(connection)
+
+    def sync_connection(self, connection: Connection):
+        connection.sync([topic for other in self.connections
+                         if other is not connection and other.host == connection.host
+                         for topic in other.topics()])
 
     def branch(self, channel: str) -> Source:
-        source = Source(channel, self.client)
+        source = Source(channel)
+        source.resumed.connect(lambda seconds: self.firstSample.emit(channel, seconds))
         self.sources.append(source)
+        self.connection(channel).add(source)
+        self.schedule_sync()
         return source
 
     def clear(self):
         for source in self.sources:
-            self.client.message_callback_remove(source.topic)
-            self.sources.remove(source)
+            self.connection(source.channel).remove(source)
+
+        self.sources = []
+
+    # Replaces a channel's source after its settings changed; samples still
+    # queued in the old source were decoded under the old settings and are kept.
+    def rebranch(self, source: Source) -> Source:
+        self.connection(source.channel).remove(source)
+        self.sources.remove(source)
+        replacement = self.branch(source.channel)
 
-    def reconnect(self):
-        self.client.reconnect()
+        replacement.recorder = source.recorder
+        replacement.dropped = source.dropped
+        replacement.missing = source.missing
+        replacement.reconnects = source.reconnects
+        replacement.last_time = source.last_time
+        replacement.period = source.period
+
+        for block in source.queue.drain():
+            replacement.queue.put(block)
+
+        return replacement
 
     def terminate(self):
-        self.client.loop_stop()
-        self.client.disconnect()
+        for connection in self.connections:
+            connection.stop()
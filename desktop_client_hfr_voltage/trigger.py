@@ -0,0 +1,114 @@
+from numpy.lib.stride_tricks import sliding_window_view
+from .metrics import timed
+import numpy
+
+SLOPE_RISING = 'rising'
+SLOPE_FALLING = 'falling'
+SLOPE_BOTH = 'both'
+SLOPES = [SLOPE_RISING, SLOPE_FALLING, SLOPE_BOTH]
+
+
+# Cuts frames of pre + post samples around level crossings out of a
+# StreamBuffer, like an oscilloscope's normal trigger mode. Only samples
+# ingested since the last update are searched, and the last `averages`
+# frames are kept with their running sum, so an update costs the same
+# however long the buffer is.
+class Trigger:
+    def __init__(self, level: float, slope: str = SLOPE_RISING, pre: int = 0, post: int = 1000,
+                 holdoff: int = 0, averages: int = 1):
+        self.level = level
+        self.slope = slope
+        self.pre = max(0, pre)
+        self.post = max(1, post)
+        self.holdoff = max(0, holdoff)
+        self.averages = max(1, averages)
+        self.reset()
+
+    def reset(self):
+        length = self.pre + self.post
+        self._scanned = None
+        self._last = None
+        self._frames = numpy.zeros((self.averages, length))
+        self._sum = numpy.zeros(length)
+        self._position = 0
+        self._count = 0
+        self.triggers = 0
+
+    def crossings(self, samples: numpy.ndarray) -> numpy.ndarray:
+        # Gap (NaN) samples are neither below nor above the level.
+        below = samples < self.level
+        above = samples >= self.level
+
+        if self.slope == SLOPE_RISING:
+            crossed = below[:-1] & above[1:]
+        elif self.slope == SLOPE_FALLING:
+            crossed = above[:-1] & below[1:]
+        else:
+            crossed = (below[:-1] & above[1:]) | (above[:-1] & below[1:])
+
+        return numpy.flatnonzero(crossed) + 1
+
+    def select(self, candidates: numpy.ndarray) -> numpy.ndarray:
+        earliest = -1 if self._last is None else self._last + max(1, self.holdoff)
+        candidates = candidates[numpy.searchsorted(candidates, earliest):]
+
+        if self.holdoff <= 1 or len(candidates) == 0:
+            return candidates
+
+        accepted = [candidates[0]]
+        index = numpy.searchsorted(candidates, accepted[-1] + self.holdoff)
+
+        while index < len(candidates):
+            accepted.append(candidates[index])
+            index = numpy.searchsorted(candidates, accepted[-1] + self.holdoff)
+
+        return numpy.asarray(accepted)
+
+    # Returns whether a new frame was added.
+    @timed('trigger')
+    def update(self, storage) -> bool:
+        total = storage.total()
+        # A trigger at i needs i - 1 for the crossing test and i - pre .. i + post - 1 for its frame.
+        first = storage.oldest() + max(1, self.pre)
+        start = first if self._scanned is None else max(self._scanned, first)
+        stop = total - self.post + 1
+
+        if stop <= start:
+            return False
+
+        self._scanned = stop
+        accepted = self.select(self.crossings(storage.segment(start - 1, stop)) + start - 1)
+
+        if len(accepted) == 0:
+            return False
+
+        self._last = int(accepted[-1])
+        self.triggers += len(accepted)
+
+        # Only the newest frames can still contribute to the average; they are
+        # viewed in the buffer and copied out one frame at a time.
+        accepted = accepted[-self.averages:]
+        window = storage.segment(int(accepted[0]) - self.pre, int(accepted[-1]) + self.post)
+        frames = sliding_window_view(window, self.pre + self.post)[accepted - accepted[0]]
+        frames = frames[~numpy.isnan(frames).any(axis=1)]
+
+        for frame in frames:
+            self._sum += frame - self._frames[self._position]
+            self._frames[self._position] = frame
+            self._position = (self._position + 1) % self.averages
+            self._count = min(self._count + 1, self.averages)
+
+            # Running sum is re-based once per lap so rounding cannot accumulate.
+            if self._position == 0:
+                self._sum = self._frames.sum(axis=0)
+
+        return len(frames) > 0
+
+    def ready(self) -> bool:
+        return self._count > 0
+
+    def frame(self) -> numpy.ndarray:
+        return self._sum / self._count
+
+    def offsets(self) -> numpy.ndarray:
+        return numpy.arange(-self.pre, self.post)
@@ -1,6 +1,12 @@
 from PyQt6 import QtCore, QtWidgets, QtGui
-from pyqtgraph import PlotWidget, mkPen, InfiniteLine
-from .settings import Settings
+from pyqtgraph import PlotWidget, mkPen, InfiniteLine, colormap
+from .settings import (Settings, TRIGGER_AVERAGES_RANGE, TRIGGER_HOLDOFF_RANGE, TRIGGER_POST_RANGE,
+                       TRIGGER_PRE_RANGE, WATERFALL_SCALES)
+from .filters import DISPLAYS
+from .trigger import SLOPES
+from . import spectrum
+from .metrics import timed
+import numpy
 
 FONT_PRIMARY = QtGui.QFont('Arial', 15, 700)
 FONT_SECONDARY = QtGui.QFont('Arial', 12, 400)
@@ -51,8 +57,54 @@ class Selector(QtWidgets.QWidget):
     def get_value(self):
         return self.selector.value()
 
+    # Programmatic updates must not be echoed back as user changes.
+    def set_value(self, value: int):
+        self.selector.blockSignals(True)
+        self.selector.setValue(value)
+        self.selector.blockSignals(False)
+
+    def set_maximum(self, value: int):
+        self.selector.blockSignals(True)
+        self.selector.setMaximum(value)
+        self.selector.blockSignals(False)
+
+
+class ChoiceSelector(QtWidgets.QWidget):
+    def __init__(self, name: str, choices: list, value_default: str, font: QtGui.QFont, parent: QtWidgets.QWidget):
+        super().__init__(parent)
+        self.label = QtWidgets.QLabel(name, self)
+        self.selector = QtWidgets.QComboBox(self)
+        self.draw(choices, value_default, font)
+
+        self.valueChanged = self.selector.currentTextChanged
+
+    def draw(self, choices: list, value_default: str, font: QtGui.QFont):
+        self.label.setFont(font)
+        self.selector.addItems(choices)
+        self.selector.setCurrentText(value_default)
+
+        layout = QtWidgets.QHBoxLayout()
+
+        layout.setAlignment(QtCore.Qt.AlignmentFlag.AlignLeft)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(10)
+        layout.addWidget(self.label)
+        layout.addWidget(self.selector)
+
+        self.setLayout(layout)
+
+    def get_value(self):
+        return self.selector.currentText()
+
+    def set_value(self, value: str):
+        self.selector.blockSignals(True)
+        self.selector.setCurrentText(value)
+        self.selector.blockSignals(False)
+
 
 class Chart(PlotWidget):
+    viewChanged = QtCore.pyqtSignal(object)
+
     def __init__(self,
                  x_invert: bool,
                  y_log_mode_default: bool,
@@ -69,6 +121,8 @@ class Chart(PlotWidget):
                   x_view_range_default, y_view_range_default, enable_markers)
         
         self.curve.scene().sigMouseMoved.connect(self.onMouseMoved)
+        self.getPlotItem().getViewBox().sigRangeChanged.connect(self.onViewChanged)
+        self.getPlotItem().getViewBox().sigResized.connect(self.onViewChanged)
 
     def draw(self, x_invert, y_log_mode_default, x_view_range_default, y_view_range_default, enable_markers):
         self.setCursor(QtCore.Qt.CursorShape.CrossCursor)
@@ -115,9 +169,28 @@ class Chart(PlotWidget):
         self.log_mode = mode
         self.getPlotItem().setLogMode(False, mode)
 
+    def set_x_inverted(self, inverted: bool):
+        self.getPlotItem().getViewBox().invertX(inverted)
+        self.getPlotItem().enableAutoRange(axis='x')
+
+    @timed('set data')
     def set_data(self, x, y):
         self.curve.setData(x, y)
 
+    def get_view(self):
+        x_range = self.get_view_range()[0]
+        pixels = int(self.getPlotItem().getViewBox().width())
+
+        # While the axis follows the data, all of it is in view; reporting the
+        # padded range instead would let the view and the data widen each other.
+        if self.getPlotItem().getViewBox().autoRangeEnabled()[0]:
+            return (-numpy.inf, numpy.inf, pixels)
+
+        return (x_range[0], x_range[1], pixels)
+
+    def onViewChanged(self, *args):
+        self.viewChanged.emit(self.get_view())
+
     def onMouseMoved(self, point):
         p = self.getPlotItem().getViewBox().mapSceneToView(point)
         y = 10 ** p.y() if self.log_mode else p.y()
@@ -134,7 +207,7 @@ class Tab(QtWidgets.QWidget):
         super().__init__(parent)
         self.processing_size_selector = Selector(
             "Processing size",
-            Settings.get_range('processing_size_range'),
+            Settings.general().processing_size_range,
             processing_range_default,
             FONT_SECONDARY,
             self
@@ -144,23 +217,110 @@ class Tab(QtWidgets.QWidget):
     def get_processing_size(self):
         return self.processing_size_selector.get_value()
 
+    def set_x_converted_state(self, converted: bool):
+        self.convert_x_checkbox.blockSignals(True)
+        self.convert_x_checkbox.setChecked(converted)
+        self.convert_x_checkbox.blockSignals(False)
+
+
+class TriggerControls(QtWidgets.QWidget):
+    changed = QtCore.pyqtSignal(object)
+
+    def __init__(self, options: dict, parent: QtWidgets.QWidget) -> None:
+        super().__init__(parent)
+        self.enabled_checkbox = QtWidgets.QCheckBox("Trigger", self)
+        self.level_selector = QtWidgets.QDoubleSpinBox(self)
+        self.slope_selector = ChoiceSelector("Slope", SLOPES, options['slope'], FONT_SECONDARY, self)
+        self.pre_selector = Selector("Pre", TRIGGER_PRE_RANGE, options['pre'], FONT_SECONDARY, self)
+        self.post_selector = Selector("Post", TRIGGER_POST_RANGE, options['post'], FONT_SECONDARY, self)
+        self.holdoff_selector = Selector(
+            "Holdoff", TRIGGER_HOLDOFF_RANGE, options['holdoff'], FONT_SECONDARY, self)
+        self.averages_selector = Selector(
+            "Averages", TRIGGER_AVERAGES_RANGE, options['averages'], FONT_SECONDARY, self)
+        self.draw(options)
+
+        self.enabled_checkbox.stateChanged.connect(self.on_changed)
+        self.level_selector.valueChanged.connect(self.on_changed)
+
+        for selector in (self.slope_selector, self.pre_selector, self.post_selector,
+                         self.holdoff_selector, self.averages_selector):
+            selector.valueChanged.connect(self.on_changed)
+
+    def draw(self, options: dict):
+        self.level_selector.setRange(-1e9, 1e9)
+        self.level_selector.setDecimals(3)
+        self.level_selector.setPrefix("Level: ")
+        self.set_options(options)
+
+        layout = QtWidgets.QVBoxLayout()
+
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.enabled_checkbox)
+        layout.addWidget(self.level_selector)
+        layout.addWidget(self.slope_selector)
+        layout.addWidget(self.pre_selector)
+        layout.addWidget(self.post_selector)
+        layout.addWidget(self.holdoff_selector)
+        layout.addWidget(self.averages_selector)
+        self.setLayout(layout)
+
+    def get_options(self) -> dict:
+        return {
+            'enabled': self.enabled_checkbox.isChecked(),
+            'level': self.level_selector.value(),
+            'slope': self.slope_selector.get_value(),
+            'pre': self.pre_selector.get_value(),
+            'post': self.post_selector.get_value(),
+            'holdoff': self.holdoff_selector.get_value(),
+            'averages': self.averages_selector.get_value(),
+        }
+
+    def set_options(self, options: dict):
+        for widget in (self.enabled_checkbox, self.level_selector):
+            widget.blockSignals(True)
+
+        self.enabled_checkbox.setChecked(options['enabled'])
+        self.level_selector.setValue(options['level'])
+
+        for widget in (self.enabled_checkbox, self.level_selector):
+            widget.blockSignals(False)
+
+        self.slope_selector.set_value(options['slope'])
+        self.pre_selector.set_value(options['pre'])
+        self.post_selector.set_value(options['post'])
+        self.holdoff_selector.set_value(options['holdoff'])
+        self.averages_selector.set_value(options['averages'])
+
+    def on_changed(self, *args):
+        self.changed.emit(self.get_options())
+
 
 class DirectTab(Tab):
     processingSizeChanged = QtCore.pyqtSignal(int)
     xConvertedStateChanged = QtCore.pyqtSignal(bool)
+    triggerChanged = QtCore.pyqtSignal(object)
 
     def __init__(self,
                  processing_range_default: int,
                  x_view_range_default,
                  y_view_range_default,
+                 trigger_default: dict,
+                 filter_display_default: str,
                  parent: QtWidgets.QWidget
                  ) -> None:
         super().__init__(processing_range_default, parent)
-        self.chart = Chart(True, False, x_view_range_default,
+        self.chart = Chart(not trigger_default['enabled'], False, x_view_range_default,
                            y_view_range_default, False, self)
+        self.trigger_controls = TriggerControls(trigger_default, self)
+        self.display_selector = ChoiceSelector(
+            "Show", DISPLAYS, filter_display_default, FONT_SECONDARY, self)
+        self.triggered = trigger_default['enabled']
         self.mean_label = FormatLabel("Mean: %.2fkV", FONT_SECONDARY, self)
         self.deviation_label = FormatLabel(
             "Std. dev: %.2fkV", FONT_SECONDARY, self)
+        self.rms_label = FormatLabel("RMS: %.2fkV", FONT_SECONDARY, self)
+        self.peak_to_peak_label = FormatLabel(
+            "Peak-to-peak: %.2fkV", FONT_SECONDARY, self)
         self.draw()
 
         self.processing_size_selector.valueChanged.connect(
@@ -170,6 +330,8 @@ class DirectTab(Tab):
             lambda: self.xConvertedStateChanged.emit(
                 self.convert_x_checkbox.isChecked())
         )
+        self.trigger_controls.changed.connect(self.on_trigger_changed)
+        self.filterDisplayChanged = self.display_selector.valueChanged
 
     def draw(self):
         self.chart.set_label("left", "U, kV")
@@ -179,8 +341,12 @@ class DirectTab(Tab):
 
         info_layout.addWidget(self.mean_label)
         info_layout.addWidget(self.deviation_label)
+        info_layout.addWidget(self.rms_label)
+        info_layout.addWidget(self.peak_to_peak_label)
         info_layout.addWidget(self.processing_size_selector)
         info_layout.addWidget(self.convert_x_checkbox)
+        info_layout.addWidget(self.display_selector)
+        info_layout.addWidget(self.trigger_controls)
         info_layout.addStretch(1)
         info_layout.setSpacing(10)
 
@@ -205,16 +371,77 @@ class DirectTab(Tab):
     def set_deviation(self, deviation):
         self.deviation_label.format(deviation)
 
+    def set_rms(self, rms):
+        self.rms_label.format(rms)
+
+    def set_peak_to_peak(self, peak_to_peak):
+        self.peak_to_peak_label.format(peak_to_peak)
+
     def set_label(self, label):
         self.chart.set_bottom_label(label)
 
+    # Free-running time runs right to left, time from the trigger left to right.
+    def set_triggered(self, triggered: bool):
+        if triggered != self.triggered:
+            self.triggered = triggered
+            self.chart.set_x_inverted(not triggered)
+
+    def set_trigger_options(self, options: dict):
+        self.trigger_controls.set_options(options)
+        self.set_triggered(options['enabled'])
+
+    def on_trigger_changed(self, options: dict):
+        self.set_triggered(options['enabled'])
+        self.triggerChanged.emit(options)
+
+    # Without filters there is only the raw stream to show.
+    def set_filtered(self, filtered: bool, display: str):
+        self.display_selector.set_value(display)
+        self.display_selector.setVisible(filtered)
+
+
+class PeakTable(QtWidgets.QTableWidget):
+    HEADERS = ['Frequency', 'Amplitude', 'Q', 'Drift/s']
+    FORMATS = ['{:.5g}', '{:.4g}', '{:.3g}', '{:+.2g}']
+
+    def __init__(self, parent: QtWidgets.QWidget) -> None:
+        super().__init__(0, len(self.HEADERS), parent)
+        self.draw()
+
+    def draw(self):
+        self.setHorizontalHeaderLabels(self.HEADERS)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.NoSelection)
+        self.verticalHeader().setVisible(False)
+        self.verticalHeader().setDefaultSectionSize(18)
+        self.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.setMinimumWidth(260)
+
+    # Items are created once per row and only their text changes afterwards.
+    def set_rows(self, rows):
+        if len(rows) != self.rowCount():
+            previous = self.rowCount()
+            self.setRowCount(len(rows))
+
+            for row in range(previous, len(rows)):
+                for column in range(self.columnCount()):
+                    self.setItem(row, column, QtWidgets.QTableWidgetItem())
+
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                self.item(row, column).setText(self.FORMATS[column].format(value))
+
 
 class FftTab(Tab):
     processingSizeChanged = QtCore.pyqtSignal(int)
     xConvertedStateChanged = QtCore.pyqtSignal(bool)
+    segmentSizeChanged = QtCore.pyqtSignal(int)
 
     def __init__(self,
                  processing_range_default: int,
+                 segment_size_default: int,
+                 window_default: str,
+                 averaging_default: str,
                  y_log_mode_default: bool,
                  x_view_range_default,
                  y_view_range_default,
@@ -224,10 +451,26 @@ class FftTab(Tab):
         self.chart = Chart(False, y_log_mode_default,
                            x_view_range_default, y_view_range_default, True, self)
         self.y_log_mode_checkbox = QtWidgets.QCheckBox("Log Y", self)
+        self.segment_size_selector = Selector(
+            "Segment size",
+            Settings.general().processing_size_range,
+            segment_size_default,
+            FONT_SECONDARY,
+            self
+        )
+        self.window_selector = ChoiceSelector(
+            "Window", spectrum.WINDOWS, window_default, FONT_SECONDARY, self)
+        self.averaging_selector = ChoiceSelector(
+            "Averaging", spectrum.AVERAGING, averaging_default, FONT_SECONDARY, self)
+        self.peak_table = PeakTable(self)
         self.draw(y_log_mode_default)
 
+        self.windowChanged = self.window_selector.valueChanged
+        self.averagingChanged = self.averaging_selector.valueChanged
         self.processing_size_selector.valueChanged.connect(
             lambda: self.processingSizeChanged.emit(self.get_processing_size()))
+        self.segment_size_selector.valueChanged.connect(
+            lambda: self.segmentSizeChanged.emit(self.segment_size_selector.get_value()))
         self.y_log_mode_checkbox.stateChanged.connect(
             lambda: self.chart.set_y_log_mode(self.y_log_mode_checkbox.isChecked()))
         self.convert_x_checkbox.stateChanged.connect(
@@ -245,7 +488,10 @@ class FftTab(Tab):
         info_layout.addWidget(self.y_log_mode_checkbox)
         info_layout.addWidget(self.convert_x_checkbox)
         info_layout.addWidget(self.processing_size_selector)
-        info_layout.addStretch(1)
+        info_layout.addWidget(self.segment_size_selector)
+        info_layout.addWidget(self.window_selector)
+        info_layout.addWidget(self.averaging_selector)
+        info_layout.addWidget(self.peak_table, 1)
         info_widget.setLayout(info_layout)
         info_widget.setMinimumWidth(150)
 
@@ -258,6 +504,9 @@ class FftTab(Tab):
     def get_chart_view_range(self):
         return self.chart.get_view_range()
 
+    def set_peaks(self, rows):
+        self.peak_table.set_rows(rows)
+
     def get_y_log_mode(self):
         return self.y_log_mode_checkbox.isChecked()
 
@@ -268,57 +517,263 @@ class FftTab(Tab):
         self.chart.set_bottom_label(label)
 
 
+class WaterfallImage(QtWidgets.QGraphicsObject):
+    # Rows are written into a preallocated ring: new rows are colour-mapped
+    # into an indexed QImage in place and paint() draws the ring in two parts
+    # starting at the cursor, so an update costs O(new rows) whatever the history.
+    def __init__(self, history: int, scale: str):
+        super().__init__()
+        self.colour_scale = scale
+        self.levels: tuple[float, float] | None = None
+        self.color_table = [QtGui.qRgb(*map(int, color)) for color in
+                            colormap.get('viridis').getLookupTable(nPts=256, alpha=False)]
+        self.reset(history, 1)
+
+    def reset(self, history: int, bins: int):
+        self.prepareGeometryChange()
+        self.rows = numpy.zeros((history, bins), dtype=numpy.float32)
+        self.qimage = QtGui.QImage(bins, history, QtGui.QImage.Format.Format_Indexed8)
+        self.qimage.setColorTable(self.color_table)
+        self.qimage.fill(0)
+        bits = self.qimage.bits()
+        bits.setsize(self.qimage.sizeInBytes())
+        self.indices = numpy.frombuffer(bits, dtype=numpy.uint8).reshape(
+            history, self.qimage.bytesPerLine())
+        self.cursor = 0
+        self.filled = 0
+        self.levels = None
+        self.update()
+
+    def scaled(self, values):
+        if self.colour_scale == 'log':
+            return 20 * numpy.log10(numpy.maximum(values, 1e-12))
+
+        return values
+
+    def auto_levels(self, values) -> tuple[float, float]:
+        low, high = numpy.percentile(self.scaled(values), [1, 99.9])
+        return float(low), float(max(high, low + 1e-9))
+
+    def colour(self, values):
+        low, high = self.levels
+        indices = (self.scaled(values) - low) * (255 / (high - low))
+        return numpy.clip(indices, 0, 255).astype(numpy.uint8)
+
+    # Rows held, oldest first.
+    def history(self) -> numpy.ndarray:
+        return numpy.roll(self.rows, -self.cursor, axis=0)[len(self.rows) - self.filled:]
+
+    def add_rows(self, rows):
+        history, bins = self.rows.shape
+
+        if rows.shape[1] != bins:
+            self.reset(history, rows.shape[1])
+            bins = rows.shape[1]
+
+        rows = rows[-history:]
+        index = (self.cursor + numpy.arange(len(rows))) % history
+
+        if self.levels is None:
+            self.levels = self.auto_levels(rows)
+
+        self.rows[index] = rows
+        self.indices[index, :bins] = self.colour(rows)
+        self.cursor = (self.cursor + len(rows)) % history
+        self.filled = min(self.filled + len(rows), history)
+        self.update()
+
+    def set_history(self, history: int):
+        # Keeps the newest rows.
+        rows = self.history()
+        self.reset(history, self.rows.shape[1])
+
+        if len(rows):
+            self.add_rows(rows)
+
+    def set_scale(self, scale: str):
+        self.colour_scale = scale
+        self.refresh_levels()
+
+    def refresh_levels(self):
+        if self.filled == 0:
+            self.levels = None
+            return
+
+        bins = self.rows.shape[1]
+        self.levels = self.auto_levels(self.history())
+        self.indices[:, :bins] = self.colour(self.rows)
+        self.update()
+
+    def boundingRect(self):
+        history, bins = self.rows.shape
+        return QtCore.QRectF(0, 0, bins, history)
+
+    def paint(self, painter, *args):
+        history, bins = self.rows.shape
+        c = self.cursor
+
+        # Oldest row at the bottom, newest at the top.
+        painter.drawImage(QtCore.QRectF(0, 0, bins, history - c), self.qimage,
+                          QtCore.QRectF(0, c, bins, history - c))
+
+        if c:
+            painter.drawImage(QtCore.QRectF(0, history - c, bins, c), self.qimage,
+                              QtCore.QRectF(0, 0, bins, c))
+
+
+class WaterfallTab(QtWidgets.QWidget):
+    fftSizeChanged = QtCore.pyqtSignal(int)
+    hopChanged = QtCore.pyqtSignal(int)
+    historyChanged = QtCore.pyqtSignal(int)
+
+    def __init__(self,
+                 fft_size_default: int,
+                 hop_default: int,
+                 history_default: int,
+                 scale_default: str,
+                 parent: QtWidgets.QWidget
+                 ) -> None:
+        super().__init__(parent)
+        self.plot = PlotWidget(self)
+        self.image = WaterfallImage(history_default, scale_default)
+        self.bin_width = 1.0
+        general = Settings.general()
+        self.fft_size_selector = Selector(
+            "FFT size", general.waterfall_size_range, fft_size_default, FONT_SECONDARY, self)
+        self.hop_selector = Selector(
+            "Hop", general.waterfall_size_range, hop_default, FONT_SECONDARY, self)
+        self.history_selector = Selector(
+            "History", general.waterfall_history_range, history_default, FONT_SECONDARY, self)
+        self.scale_selector = ChoiceSelector(
+            "Scale", WATERFALL_SCALES, scale_default, FONT_SECONDARY, self)
+        self.levels_button = QtWidgets.QPushButton("Auto levels", self)
+        self.hop_selector.set_maximum(fft_size_default)
+        self.draw()
+
+        # The hop cannot exceed the FFT size; a hop clamped by a smaller size
+        # is sent before the size itself.
+        self.fft_size_selector.valueChanged.connect(self.hop_selector.selector.setMaximum)
+        self.fft_size_selector.valueChanged.connect(
+            lambda: self.fftSizeChanged.emit(self.fft_size_selector.get_value()))
+        self.hop_selector.valueChanged.connect(
+            lambda: self.hopChanged.emit(self.hop_selector.get_value()))
+        self.history_selector.valueChanged.connect(
+            lambda: self.historyChanged.emit(self.history_selector.get_value()))
+        self.historyChanged.connect(self.image.set_history)
+        self.scale_selector.valueChanged.connect(self.image.set_scale)
+        self.levels_button.clicked.connect(self.image.refresh_levels)
+
+    def draw(self):
+        self.plot.setBackground((251, 251, 251))
+        self.plot.getPlotItem().addItem(self.image)
+        self.plot.getPlotItem().setLabel('left', 'Spectra, newest at top')
+        self.plot.getPlotItem().setLabel('bottom', 'Frequency')
+
+        info_widget = QtWidgets.QWidget(self)
+        info_layout = QtWidgets.QVBoxLayout(info_widget)
+
+        info_layout.addWidget(self.fft_size_selector)
+        info_layout.addWidget(self.hop_selector)
+        info_layout.addWidget(self.history_selector)
+        info_layout.addWidget(self.scale_selector)
+        info_layout.addWidget(self.levels_button)
+        info_layout.addStretch(1)
+        info_widget.setLayout(info_layout)
+        info_widget.setMinimumWidth(150)
+
+        layout = QtWidgets.QHBoxLayout(self)
+
+        layout.addWidget(self.plot)
+        layout.addWidget(info_widget)
+        self.setLayout(layout)
+
+    def add_rows(self, rows, bin_width: float):
+        if bin_width != self.bin_width:
+            self.bin_width = bin_width
+            self.image.setTransform(QtGui.QTransform.fromScale(bin_width, 1))
+
+        self.image.add_rows(rows)
+
+    def set_x_converted(self, converted: bool):
+        self.plot.getPlotItem().setLabel(
+            'bottom', 'Frequency, Hz' if converted else 'Frequency')
+
+    def get_history(self):
+        return self.history_selector.get_value()
+
+    def get_scale(self):
+        return self.scale_selector.get_value()
+
+
 class StreamWidget(QtWidgets.QWidget):
     processingRateChanged = QtCore.pyqtSignal(int)
     currentTabChanged = QtCore.pyqtSignal(int)
+    fftProcessingSizeChanged = QtCore.pyqtSignal(int)
+    fftXConvertedStateChanged = QtCore.pyqtSignal(bool)
+    fftSegmentSizeChanged = QtCore.pyqtSignal(int)
+    fftWindowChanged = QtCore.pyqtSignal(str)
+    fftAveragingChanged = QtCore.pyqtSignal(str)
+    fftViewChanged = QtCore.pyqtSignal(object)
+    waterfallFftSizeChanged = QtCore.pyqtSignal(int)
+    waterfallHopChanged = QtCore.pyqtSignal(int)
+    waterfallHistoryChanged = QtCore.pyqtSignal(int)
 
     def __init__(self, channel: str, parent: QtWidgets.QWidget) -> None:
         super().__init__(parent)
+        config = Settings.channel(channel)
         self.channel = channel
-        self.channel_label = FormatLabel(
-            Settings.get_for_channel(channel, 'title'), FONT_PRIMARY, self)
+        self.fft_x_converted = config.fft_x_converted
+        self.channel_label = FormatLabel(config.title, FONT_PRIMARY, self)
         self.processing_rate_selector = Selector(
             "Processing rate",
-            Settings.get_range('processing_rate_range'),
-            int(Settings.get_for_channel(channel, 'processing_rate')),
+            Settings.general().processing_rate_range,
+            config.processing_rate,
             FONT_SECONDARY,
             self
         )
+        self.queue_label = FormatLabel("Queue: %d", FONT_SECONDARY, self)
+        self.lost_label = FormatLabel("Lost: %d", FONT_SECONDARY, self)
         self.instant_label = FormatLabel("Instant: %.2fkV", FONT_PRIMARY, self)
         self.tab = QtWidgets.QTabWidget(self)
         self.direct_tab = DirectTab(
-            int(Settings.get_for_channel(channel, 'direct_processing_size')),
-            Settings.get_view_range(channel + '/direct_x_view_range'),
-            Settings.get_view_range(channel + '/direct_y_view_range'),
-            self
-        )
-        self.fft_tab = FftTab(
-            int(Settings.get_for_channel(channel, 'fft_processing_size')),
-            str(Settings.get_for_channel(channel, 'fft_y_log_mode')) == 'true',
-            Settings.get_view_range(channel + '/fft_x_view_range'),
-            Settings.get_view_range(channel + '/fft_y_view_range'),
+            config.direct_processing_size,
+            config.direct_x_view_range,
+            config.direct_y_view_range,
+            config.trigger(),
+            config.filter_display,
             self
         )
-        self.direct_tab.convert_x_checkbox.setChecked(
-            Settings.get_for_channel(channel, 'direct_x_converted') == 'true')
-        self.fft_tab.convert_x_checkbox.setChecked(
-            Settings.get_for_channel(channel, 'fft_x_converted') == 'true')
+        self.direct_tab.set_filtered(bool(config.filters), config.filter_display)
+        # Hidden tabs are built the first time they are shown, which keeps
+        # their charts out of the startup path.
+        self.fft_page = QtWidgets.QWidget(self)
+        self.waterfall_page = QtWidgets.QWidget(self)
+        self.fft_tab: FftTab | None = None
+        self.waterfall_tab: WaterfallTab | None = None
+        self.direct_tab.convert_x_checkbox.setChecked(config.direct_x_converted)
         self.draw()
 
         self.processing_rate_selector.valueChanged.connect(
             lambda: self.processingRateChanged.emit(
                 self.processing_rate_selector.get_value())
         )
-        self.tab.currentChanged.connect(
-            lambda: self.currentTabChanged.emit(self.tab.currentIndex()))
-        self.fftProcessingSizeChanged = self.fft_tab.processingSizeChanged
-        self.fftXConvertedStateChanged = self.fft_tab.xConvertedStateChanged
+        self.tab.currentChanged.connect(self.on_tab_changed)
+        self.fftXConvertedStateChanged.connect(self.set_fft_x_converted)
+        self.directViewChanged = self.direct_tab.chart.viewChanged
         self.directProcessingSizeChanged = self.direct_tab.processingSizeChanged
         self.directXConvertedStateChanged = self.direct_tab.xConvertedStateChanged
+        self.triggerChanged = self.direct_tab.triggerChanged
+        self.filterDisplayChanged = self.direct_tab.filterDisplayChanged
 
     def draw(self):
         self.tab.addTab(self.direct_tab, "U")
-        self.tab.addTab(self.fft_tab, "FFT")
+        self.tab.addTab(self.fft_page, "FFT")
+        self.tab.addTab(self.waterfall_page, "Waterfall")
+
+        for page in (self.fft_page, self.waterfall_page):
+            page_layout = QtWidgets.QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            page.setLayout(page_layout)
 
         top_bar_widget = QtWidgets.QWidget(self)
         top_bar_layout = QtWidgets.QHBoxLayout()
@@ -328,6 +783,8 @@ class StreamWidget(QtWidgets.QWidget):
         top_bar_layout.addWidget(self.channel_label)
         top_bar_layout.addWidget(self.processing_rate_selector)
         top_bar_layout.addStretch(1)
+        top_bar_layout.addWidget(self.queue_label)
+        top_bar_layout.addWidget(self.lost_label)
         top_bar_layout.addWidget(self.instant_label)
         top_bar_widget.setLayout(top_bar_layout)
 
@@ -337,15 +794,125 @@ class StreamWidget(QtWidgets.QWidget):
         layout.addWidget(self.tab)
         self.setLayout(layout)
 
+    def on_tab_changed(self, index: int):
+        if index == 1 and self.fft_tab is None:
+            self.create_fft_tab()
+        elif index == 2 and self.waterfall_tab is None:
+            self.create_waterfall_tab()
+
+        self.currentTabChanged.emit(index)
+
+    def create_fft_tab(self):
+        config = Settings.channel(self.channel)
+        self.fft_tab = FftTab(
+            config.fft_processing_size,
+            config.fft_segment_size,
+            config.fft_window,
+            config.fft_averaging,
+            config.fft_y_log_mode,
+            config.fft_x_view_range,
+            config.fft_y_view_range,
+            self.fft_page
+        )
+        self.fft_tab.set_x_converted_state(self.fft_x_converted)
+        self.fft_page.layout().addWidget(self.fft_tab)
+
+        self.fft_tab.processingSizeChanged.connect(self.fftProcessingSizeChanged)
+        self.fft_tab.xConvertedStateChanged.connect(self.fftXConvertedStateChanged)
+        self.fft_tab.segmentSizeChanged.connect(self.fftSegmentSizeChanged)
+        self.fft_tab.windowChanged.connect(self.fftWindowChanged)
+        self.fft_tab.averagingChanged.connect(self.fftAveragingChanged)
+        self.fft_tab.chart.viewChanged.connect(self.fftViewChanged)
+
+    def create_waterfall_tab(self):
+        config = Settings.channel(self.channel)
+        self.waterfall_tab = WaterfallTab(
+            config.waterfall_fft_size,
+            config.waterfall_hop,
+            config.waterfall_history,
+            config.waterfall_scale,
+            self.waterfall_page
+        )
+        self.waterfall_tab.set_x_converted(self.fft_x_converted)
+        self.waterfall_page.layout().addWidget(self.waterfall_tab)
+
+        self.waterfall_tab.fftSizeChanged.connect(self.waterfallFftSizeChanged)
+        self.waterfall_tab.hopChanged.connect(self.waterfallHopChanged)
+        self.waterfall_tab.historyChanged.connect(self.waterfallHistoryChanged)
+
+    def set_fft_x_converted(self, converted: bool):
+        self.fft_x_converted = converted
+
+        if self.waterfall_tab is not None:
+            self.waterfall_tab.set_x_converted(converted)
+
+    def configure(self, config, changes: set[str]):
+        if 'title' in changes:
+            self.channel_label.setText(config.title)
+
+        if 'processing_rate' in changes:
+            self.processing_rate_selector.set_value(config.processing_rate)
+
+        if 'direct_processing_size' in changes:
+            self.direct_tab.processing_size_selector.set_value(config.direct_processing_size)
+
+        if 'direct_x_converted' in changes:
+            self.direct_tab.set_x_converted_state(config.direct_x_converted)
+
+        if any(key.startswith('trigger_') for key in changes):
+            self.direct_tab.set_trigger_options(config.trigger())
+
+        if changes & {'filters', 'filter_display'}:
+            self.direct_tab.set_filtered(bool(config.filters), config.filter_display)
+
+        if 'fft_x_converted' in changes:
+            self.set_fft_x_converted(config.fft_x_converted)
+
+            if self.fft_tab is not None:
+                self.fft_tab.set_x_converted_state(config.fft_x_converted)
+
+        # Tabs built later read the new values from the settings themselves.
+        if self.fft_tab is not None:
+            if 'fft_processing_size' in changes:
+                self.fft_tab.processing_size_selector.set_value(config.fft_processing_size)
+
+            if 'fft_segment_size' in changes:
+                self.fft_tab.segment_size_selector.set_value(config.fft_segment_size)
+
+            if 'fft_window' in changes:
+                self.fft_tab.window_selector.set_value(config.fft_window)
+
+            if 'fft_averaging' in changes:
+                self.fft_tab.averaging_selector.set_value(config.fft_averaging)
+
+        if self.waterfall_tab is not None:
+            if 'waterfall_fft_size' in changes:
+                self.waterfall_tab.fft_size_selector.set_value(config.waterfall_fft_size)
+                self.waterfall_tab.hop_selector.set_maximum(config.waterfall_fft_size)
+
+            if 'waterfall_hop' in changes:
+                self.waterfall_tab.hop_selector.set_value(config.waterfall_hop)
+
+            if 'waterfall_history' in changes:
+                self.waterfall_tab.history_selector.set_value(config.waterfall_history)
+                self.waterfall_tab.image.set_history(config.waterfall_history)
+
     def set_direct_label(self, label):
         self.direct_tab.set_label(label)
 
     def set_fft_label(self, label):
-        self.fft_tab.set_label(label)
+        if self.fft_tab is not None:
+            self.fft_tab.set_label(label)
 
     def set_instant_value(self, value):
         self.instant_label.format(value)
 
+    def set_queue_depth(self, depth):
+        self.queue_label.format(depth)
+
+    def set_lost(self, lost):
+        self.lost_label.format(lost)
+
     def set_direct_chart_data(self, x, y):
         self.direct_tab.set_chart_data(x, y)
 
@@ -355,27 +922,81 @@ class StreamWidget(QtWidgets.QWidget):
     def set_deviation(self, deviation):
         self.direct_tab.set_deviation(deviation)
 
+    def set_rms(self, rms):
+        self.direct_tab.set_rms(rms)
+
+    def set_peak_to_peak(self, peak_to_peak):
+        self.direct_tab.set_peak_to_peak(peak_to_peak)
+
     def set_fft_chart_data(self, x, y):
-        self.fft_tab.set_chart_data(x, y)
+        if self.fft_tab is not None:
+            self.fft_tab.set_chart_data(x, y)
+
+    def set_peaks(self, rows):
+        if self.fft_tab is not None:
+            self.fft_tab.set_peaks(rows)
+
+    def add_waterfall_rows(self, rows, bin_width):
+        if self.waterfall_tab is not None:
+            self.waterfall_tab.add_rows(rows, bin_width)
 
     def terminate(self):
         dvr = self.direct_tab.get_chart_view_range()
-        fvr = self.fft_tab.get_chart_view_range()
 
         Settings.set_for_channel(
             self.channel, 'direct_x_view_range', '{}:{}'.format(dvr[0][0], dvr[0][1]))
         Settings.set_for_channel(
             self.channel, 'direct_y_view_range', '{}:{}'.format(dvr[1][0], dvr[1][1]))
-        Settings.set_for_channel(
-            self.channel, 'fft_x_view_range', '{}:{}'.format(fvr[0][0], fvr[0][1]))
-        Settings.set_for_channel(
-            self.channel, 'fft_y_view_range', '{}:{}'.format(fvr[1][0], fvr[1][1]))
 
-        Settings.set_for_channel(
-            self.channel, 'fft_y_log_mode', self.fft_tab.get_y_log_mode())
+        # Tabs that were never opened still hold their saved values.
+        if self.fft_tab is not None:
+            fvr = self.fft_tab.get_chart_view_range()
+
+            Settings.set_for_channel(
+                self.channel, 'fft_x_view_range', '{}:{}'.format(fvr[0][0], fvr[0][1]))
+            Settings.set_for_channel(
+                self.channel, 'fft_y_view_range', '{}:{}'.format(fvr[1][0], fvr[1][1]))
+            Settings.set_for_channel(
+                self.channel, 'fft_y_log_mode', self.fft_tab.get_y_log_mode())
+
+        if self.waterfall_tab is not None:
+            Settings.set_for_channel(
+                self.channel, 'waterfall_scale', self.waterfall_tab.get_scale())
+
+
+class ReplayBar(QtWidgets.QWidget):
+    SCALE = 1000
+
+    def __init__(self, parent: QtWidgets.QWidget) -> None:
+        super().__init__(parent)
+        self.pause_button = QtWidgets.QPushButton('Pause', self)
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal, self)
+        self.draw()
+
+        self.pause_button.toggled.connect(
+            lambda checked: self.pause_button.setText('Resume' if checked else 'Pause'))
+
+    def draw(self):
+        self.pause_button.setCheckable(True)
+        self.slider.setRange(0, self.SCALE)
+
+        layout = QtWidgets.QHBoxLayout()
+
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.pause_button)
+        layout.addWidget(self.slider)
+        self.setLayout(layout)
+
+    def set_position(self, fraction: float):
+        if not self.slider.isSliderDown():
+            self.slider.setValue(int(fraction * self.SCALE))
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    recordingToggled = QtCore.pyqtSignal(bool)
+    replayPaused = QtCore.pyqtSignal(bool)
+    replaySought = QtCore.pyqtSignal(float)
+
     def __init__(self) -> None:
         super().__init__()
         self.stream_widgets: list[StreamWidget] = []
@@ -383,20 +1004,71 @@ class MainWindow(QtWidgets.QMainWindow):
         self.widget = QtWidgets.QWidget()
         self.layout = QtWidgets.QVBoxLayout()
         self.connectionLabel = QtWidgets.QLabel()
+        self.record_button = QtWidgets.QPushButton('Record')
+        self.replay_bar: ReplayBar | None = None
+        self.metrics_panel: QtWidgets.QPlainTextEdit | None = None
+        self.scroll_area = QtWidgets.QScrollArea()
+        self.grid_widget = QtWidgets.QWidget()
+        self.grid_layout = QtWidgets.QGridLayout(self.grid_widget)
+        self.columns = Settings.general().columns
+
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setWidget(self.grid_widget)
+        self.record_button.setCheckable(True)
 
-        self.layout.addWidget(self.connectionLabel)
+        top_bar_layout = QtWidgets.QHBoxLayout()
+        top_bar_layout.addWidget(self.connectionLabel)
+        top_bar_layout.addStretch(1)
+        top_bar_layout.addWidget(self.record_button)
+
+        self.layout.addLayout(top_bar_layout)
+        self.layout.addWidget(self.scroll_area)
 
-        self.setGeometry(0, 0, int(Settings.get('window_width')),
-                         int(Settings.get('window_height')))
-        self.setWindowTitle(Settings.get('window_title'))
+        self.record_button.toggled.connect(self.recordingToggled.emit)
+        self.record_button.toggled.connect(
+            lambda checked: self.record_button.setText('Stop recording' if checked else 'Record'))
+
+        general = Settings.general()
+        self.setGeometry(0, 0, general.window_width, general.window_height)
+        self.setWindowTitle(general.window_title)
 
     def add_stream_widget(self, widget: StreamWidget):
+        index = len(self.stream_widgets)
         self.stream_widgets.append(widget)
-        self.layout.addWidget(widget)
+        widget.setMinimumHeight(300)
+        self.grid_layout.addWidget(
+            widget, index // self.columns, index % self.columns)
+
+    def add_replay_controls(self):
+        self.replay_bar = ReplayBar(self.widget)
+        self.layout.insertWidget(1, self.replay_bar)
+
+        self.replay_bar.pause_button.toggled.connect(self.replayPaused.emit)
+        self.replay_bar.slider.sliderReleased.connect(
+            lambda: self.replaySought.emit(self.replay_bar.slider.value() / ReplayBar.SCALE))
+
+    def add_metrics_panel(self):
+        self.metrics_panel = QtWidgets.QPlainTextEdit(self.widget)
+        self.metrics_panel.setReadOnly(True)
+        self.metrics_panel.setFont(QtGui.QFontDatabase.systemFont(
+            QtGui.QFontDatabase.SystemFont.FixedFont))
+        self.metrics_panel.setFixedHeight(180)
+        self.layout.addWidget(self.metrics_panel)
+
+    def set_metrics_text(self, text: str):
+        if self.metrics_panel is not None:
+            self.metrics_panel.setPlainText(text)
+
+    def set_replay_position(self, fraction: float):
+        if self.replay_bar is not None:
+            self.replay_bar.set_position(fraction)
 
     def set_connection_status(self, status: str):
         self.connectionLabel.setText('Connection status: ' + status)
 
+    def set_settings_status(self, status: str):
+        self.statusBar().showMessage(status)
+
     def show(self):
         self.widget.setLayout(self.layout)
         self.setCentralWidget(self.widget)
@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6 import QtCore, QtWidgets  # noqa: E402
+
+# Tests must never touch the operator's configuration file, so QSettings is
+# pointed at a scratch directory before the package creates its instance.
+QtCore.QSettings.setPath(QtCore.QSettings.Format.NativeFormat,
+                         QtCore.QSettings.Scope.UserScope, tempfile.mkdtemp(prefix='hfr-test-'))
+
+import pytest  # noqa: E402
+from desktop_client_hfr_voltage.settings import Settings  # noqa: E402
+
+
+@pytest.fixture
+def settings():
+    Settings.settings.clear()
+    Settings.set_default()
+    Settings.reload()
+    yield Settings
+    Settings.settings.clear()
+    Settings._snapshot = None
+
+
+@pytest.fixture(scope='session')
+def application():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
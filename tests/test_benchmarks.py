@@ -0,0 +1,41 @@
+from benchmarks.pipeline import search_sustainable
+
+
+def capacity_run(capacity: float, fastest: float):
+    rates = []
+
+    def run(rate: float) -> dict:
+        rates.append(rate)
+        offered = fastest if rate == 0 else rate
+        return {'offered_samples_per_s': offered, 'sustainable': offered <= capacity}
+
+    return run, rates
+
+
+def test_search_bisects_towards_the_capacity():
+    run, rates = capacity_run(1000, 4000)
+    runs, best = search_sustainable(run, 1, 8)
+
+    assert rates[:3] == [0, 2000, 1000]
+    assert len(runs) == 9
+    assert 1000 - 4000 / 2 ** 8 <= best['offered_samples_per_s'] <= 1000
+
+
+def test_search_rate_is_per_channel():
+    run, rates = capacity_run(1000, 8000)
+    search_sustainable(run, 4, 1)
+
+    assert rates == [0, 1000]
+
+
+def test_search_stops_when_the_producer_is_the_limit():
+    run, rates = capacity_run(1000, 500)
+    runs, best = search_sustainable(run, 1, 8)
+
+    assert rates == [0] and best is runs[0]
+
+
+def test_search_without_a_sustainable_run():
+    run, _ = capacity_run(0, 4000)
+
+    assert search_sustainable(run, 1, 3)[1] is None
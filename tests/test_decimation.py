@@ -0,0 +1,37 @@
+from desktop_client_hfr_voltage.decimation import minmax, visible_slice
+import numpy
+
+
+def test_small_views_are_not_decimated():
+    x = numpy.arange(100.0)
+    y = numpy.sin(x)
+
+    assert minmax(x, y, None)[0] is x
+    assert len(minmax(x, y, (0, 100, 200))[0]) == 100
+
+
+def test_each_pixel_keeps_its_extremes_in_time_order():
+    x = numpy.arange(10000.0)
+    y = numpy.random.default_rng(6).normal(size=10000)
+    y[5000] = 100
+    y[7000] = -100
+    dx, dy = minmax(x, y, (0, 10000, 100))
+
+    assert len(dx) <= 2 * 100 + 2
+    assert numpy.all(numpy.diff(dx) > 0)
+    assert dy.max() == 100 and dy.min() == -100
+
+
+def test_only_the_visible_range_and_its_margin_are_kept():
+    x = numpy.arange(10000.0)
+    dx, _ = minmax(x, x, (4000, 5000, 10))
+
+    assert dx[0] >= 3500 - 1 and dx[-1] <= 5500 + 1
+
+
+def test_visible_slice_on_a_descending_axis():
+    x = numpy.arange(10.0)[::-1]
+    visible = visible_slice(x, 3, 5)
+
+    assert set(x[visible]) >= {3, 4, 5}
+    assert visible.stop - visible.start == 5
@@ -0,0 +1,100 @@
+from desktop_client_hfr_voltage.filters import FilterChain, check_filters, parse_filters
+import numpy
+import pytest
+
+
+def signal(count: int = 5000, rate: float = 1000) -> tuple[numpy.ndarray, numpy.ndarray]:
+    times = 100 + numpy.arange(count) / rate
+    noise = numpy.random.default_rng(3).normal(0, 0.3, count)
+    return numpy.sin(2 * numpy.pi * 50 * times) + numpy.sin(2 * numpy.pi * 7 * times) + noise, times
+
+
+def run(chain: FilterChain, values: numpy.ndarray, times: numpy.ndarray, cuts=()):
+    outputs = [chain.process(values[start:stop], times[start:stop])
+               for start, stop in zip([0, *cuts], [*cuts, len(values)])]
+    return numpy.concatenate([output[0] for output in outputs]), numpy.concatenate([output[1] for output in outputs])
+
+
+def test_parse_filters_fills_in_defaults():
+    assert parse_filters('notch:50 lowpass:200:2, resample:500') == [
+        ('notch', (50.0, 30)), ('lowpass', (200.0, 2.0)), ('resample', (500.0, 'linear'))]
+    assert parse_filters(['fir:0.1', 'decimate:4']) == [('fir', (0.1, 101)), ('decimate', (4.0,))]
+
+
+@pytest.mark.parametrize('value, message', [
+    ('median:3', 'unknown filter'),
+    ('bandpass:10', 'bandpass takes 2 to 3 arguments'),
+    ('resample:10:spline', 'unknown resampling'),
+])
+def test_parse_filters_rejects(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_filters(value)
+
+
+@pytest.mark.parametrize('value, rate, message', [
+    ('lowpass:600', 1000, 'between 0 and 500'),
+    ('decimate:10 lowpass:60', 1000, 'between 0 and 50'),
+    ('bandpass:100:50', 1000, 'low frequency must be below'),
+    ('decimate:2.5', 1000, 'integer of at least 2'),
+    ('lowpass:100 resample:500', 1000, 'resample must be the first stage'),
+    ('resample:500:polyphase', 0, 'needs the nominal rate'),
+    ('fir:100:0', 1000, 'fir taps must be positive'),
+])
+def test_check_filters_rejects(value, rate, message):
+    with pytest.raises(ValueError, match=message):
+        check_filters(parse_filters(value), rate)
+
+
+@pytest.mark.parametrize('value', [
+    'notch:50 lowpass:200',
+    'bandstop:40:60:2 highpass:2',
+    'fir:100:31',
+    'fir:100:32 decimate:4',
+    'decimate:3 bandpass:10:100',
+])
+def test_output_does_not_depend_on_block_boundaries(value):
+    values, times = signal()
+    whole = run(FilterChain(parse_filters(value), 1000), values, times)
+    split = run(FilterChain(parse_filters(value), 1000), values, times, [1, 2, 17, 600, 601, 2999, 4998])
+
+    assert numpy.allclose(whole[0], split[0], rtol=0, atol=1e-12)
+    assert numpy.array_equal(whole[1], split[1])
+
+
+@pytest.mark.parametrize('taps', [31, 32])
+def test_fir_output_is_stamped_with_its_delay(taps):
+    values, times = signal()
+    output, stamps = run(FilterChain([('fir', (100.0, taps))], 1000), values, times, [1, 1000, 2500])
+
+    assert numpy.allclose(stamps, times - (taps - 1) / 2 / 1000)
+
+    # A tone well within the pass band comes out unchanged at the stamped times.
+    tone = numpy.sin(2 * numpy.pi * 7 * times)
+    output, stamps = FilterChain([('fir', (100.0, taps))], 1000).process(tone, times)
+    assert numpy.allclose(output[taps:], numpy.sin(2 * numpy.pi * 7 * stamps[taps:]), atol=0.01)
+
+
+def test_decimation_matches_filtering_then_slicing():
+    from scipy.signal import cheby1, sosfilt, sosfilt_zi
+
+    values, times = signal()
+    output, stamps = run(FilterChain([('decimate', (4.0,))], 1000), values, times, [7, 1001, 1002])
+    sos = cheby1(8, 0.05, 0.8 / 4, output='sos')
+    expected, _ = sosfilt(sos, values, zi=sosfilt_zi(sos) * values[0])
+
+    assert numpy.allclose(output, expected[::4])
+    assert numpy.array_equal(stamps, times[::4])
+
+
+def test_gaps_stay_gaps_and_restart_the_filter():
+    values, times = signal(2000)
+    values[700:720] = numpy.nan
+    chain = FilterChain(parse_filters('lowpass:100'), 1000)
+    output, _ = run(chain, values, times, [710, 1500])
+
+    assert numpy.isnan(output[700:720]).all()
+    assert numpy.isfinite(output[:700]).all() and numpy.isfinite(output[720:]).all()
+
+    # After the gap the filter behaves as if the stream started there.
+    restarted, _ = FilterChain(parse_filters('lowpass:100'), 1000).process(values[720:], times[720:])
+    assert numpy.allclose(output[720:], restarted)
@@ -0,0 +1,82 @@
+from desktop_client_hfr_voltage.history import History
+import numpy
+
+
+def test_reads_across_the_ring_match_contiguous_reads():
+    history = History(1, 8)
+    history.extend(numpy.arange(22, dtype=numpy.float64), numpy.arange(22, dtype=numpy.float64))
+    level = history.levels[0]
+
+    # Buckets 3 .. 10 sit at ring slots 3 .. 7 and 0 .. 2.
+    times, low, high, mean = level.read(3, 11)
+    assert numpy.array_equal(times, numpy.arange(6, 22, 2))
+    assert numpy.array_equal(low, numpy.arange(6, 22, 2))
+    assert numpy.array_equal(high, numpy.arange(7, 22, 2))
+    assert numpy.array_equal(mean, numpy.arange(6, 22, 2) + 0.5)
+
+    assert numpy.array_equal(level.read(8, 11)[0], times[5:])
+    assert numpy.shares_memory(level.read(8, 11)[0], level.buckets)
+
+
+def test_levels_aggregate_pairs_of_the_level_below():
+    values = numpy.random.default_rng(2).normal(size=1000)
+    history = History(4, 1024)
+
+    for start in range(0, 1000, 33):
+        history.extend(values[start:start + 33], numpy.arange(start, min(start + 33, 1000)) * 0.5)
+
+    for level in history.levels:
+        width = 1 << level.order
+        count = 1000 // width
+        buckets = values[:count * width].reshape(count, width)
+        times, low, high, mean = level.read(0, count)
+
+        assert level.done == count
+        assert numpy.array_equal(times, numpy.arange(count) * width * 0.5)
+        assert numpy.array_equal(low, buckets.min(axis=1))
+        assert numpy.array_equal(high, buckets.max(axis=1))
+        assert numpy.allclose(mean, buckets.mean(axis=1))
+
+
+def test_gaps_are_left_out_of_buckets():
+    values = numpy.array([1.0, numpy.nan, numpy.nan, numpy.nan, 3.0, 5.0, numpy.nan, 7.0])
+    history = History(2, 8)
+    history.extend(values, numpy.arange(8, dtype=numpy.float64))
+
+    _, low, high, mean = history.levels[0].read(0, 4)
+    assert numpy.array_equal(low, [1, numpy.nan, 3, 7], equal_nan=True)
+    assert numpy.array_equal(high, [1, numpy.nan, 5, 7], equal_nan=True)
+    assert numpy.array_equal(mean, [1, numpy.nan, 4, 7], equal_nan=True)
+
+    _, low, high, mean = history.levels[1].read(0, 2)
+    assert numpy.array_equal(low, [1, 3]) and numpy.array_equal(high, [1, 7])
+    assert numpy.array_equal(mean, [1, 5])
+
+
+def test_query_picks_the_level_closest_to_the_pixels():
+    history = History(8, 64)
+    history.extend(numpy.arange(4096, dtype=numpy.float64), numpy.arange(4096, dtype=numpy.float64))
+
+    order, first, _, low, high, _ = history.query(4096 - 256, 4096, 32)
+    assert order == 3
+    assert numpy.array_equal(first, numpy.arange(4096 - 256, 4096, 8))
+    assert numpy.array_equal(low, first) and numpy.array_equal(high, first + 7)
+
+
+def test_query_falls_back_to_a_coarser_level_that_still_holds_the_range():
+    history = History(8, 64)
+    history.extend(numpy.arange(4096, dtype=numpy.float64), numpy.arange(4096, dtype=numpy.float64))
+
+    # Level 1 holds only the newest 128 samples, level 6 reaches back to 0.
+    order, first, *_ = history.query(0, 256, 128)
+    assert order == 6
+    assert list(first) == [0, 64, 128, 192]
+
+
+def test_query_without_complete_buckets():
+    history = History(4, 16)
+    assert history.query(0, 10, 10) is None
+
+    history.extend([1.0], [0.0])
+    assert history.query(0, 1, 1) is None
+    assert History(0, 16).query(0, 10, 10) is None
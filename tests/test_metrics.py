@@ -0,0 +1,49 @@
+from desktop_client_hfr_voltage import metrics
+import pytest
+
+
+class Stage:
+    channel = 'C9'
+
+    @metrics.timed('test stage')
+    def run(self, value):
+        return value * 2
+
+
+def test_histogram_percentiles_within_a_bucket():
+    histogram = metrics.Histogram()
+
+    for _ in range(99):
+        histogram.record(1e-3)
+
+    histogram.record(0.5)
+
+    assert histogram.count == 100
+    assert histogram.max == 0.5
+    assert 1e-3 <= histogram.percentile(0.5) <= 1e-3 * 2 ** (1 / metrics.BUCKETS_PER_OCTAVE)
+    assert histogram.percentile(1) == 0.5
+    assert histogram.summary()['mean_ms'] == pytest.approx((99e-3 + 0.5) / 100 * 1000)
+
+
+def test_empty_histogram():
+    assert metrics.Histogram().percentile(0.99) == 0
+    assert metrics.Histogram().summary()['count'] == 0
+
+
+def test_timed_methods_are_plain_until_instrumented(monkeypatch):
+    monkeypatch.setattr(metrics, 'histograms', {})
+    monkeypatch.setattr(metrics, 'enabled', False)
+    original = Stage.run
+
+    assert not hasattr(Stage.run, '__wrapped__')
+
+    try:
+        metrics.instrument(Stage)
+        metrics.instrument(Stage)
+
+        assert metrics.enabled
+        assert Stage.run.__wrapped__ is original
+        assert Stage().run(3) == 6
+        assert metrics.histograms['test stage C9'].count == 1
+    finally:
+        Stage.run = original
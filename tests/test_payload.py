@@ -0,0 +1,48 @@
+from desktop_client_hfr_voltage.payload import (HEADER, PayloadError, decode_binary, decode_text,
+                                                encode_binary, gap_block)
+import numpy
+import pytest
+
+
+@pytest.mark.parametrize('dtype', ['<f4', '<f8', '<i2'])
+def test_binary_round_trip(dtype):
+    values = numpy.array([1, -2, 3, 400], dtype=dtype)
+    block = decode_binary(encode_binary(values, 7, 100.0, 0.5, dtype), 2.0)
+
+    assert numpy.array_equal(block.values, values * 2.0)
+    assert block.sequence == 7
+    assert list(block.times()) == [100.0, 100.5, 101.0, 101.5]
+    assert block.last_time() == 101.5
+
+
+def test_binary_without_timestamp_or_period():
+    block = decode_binary(encode_binary([1.0, 2.0], 0, 0, 0), 1.0)
+
+    assert block.timestamp is None and block.period is None
+
+
+@pytest.mark.parametrize('payload', [
+    b'\x01',
+    HEADER.pack(2, 0, 0, 0, 0),
+    HEADER.pack(1, 9, 0, 0, 0),
+    HEADER.pack(1, 0, 0, 0, 0) + b'\x00\x00\x00',
+])
+def test_malformed_binary_is_rejected(payload):
+    with pytest.raises(PayloadError):
+        decode_binary(payload, 1.0)
+
+
+def test_text_with_and_without_sequence():
+    assert decode_text(b'1.5', 2.0).values[0] == 3.0
+    assert decode_text(b'1.5', 2.0).sequence is None
+
+    block = decode_text(b'12,1.5', 1.0)
+    assert block.sequence == 12 and block.values[0] == 1.5
+    assert decode_text(b'13 2.5', 1.0).sequence == 13
+
+
+def test_gap_block_lies_strictly_between_its_neighbours():
+    block = gap_block(3, 0.0, 4.0)
+
+    assert block.gap and numpy.isnan(block.values).all()
+    assert list(block.times()) == [1.0, 2.0, 3.0]
@@ -0,0 +1,115 @@
+from desktop_client_hfr_voltage.payload import Block
+from desktop_client_hfr_voltage.processor import ProcessorManager, StreamBuffer
+from desktop_client_hfr_voltage.settings import Settings
+from desktop_client_hfr_voltage.stream import Source
+import numpy
+import time
+
+
+def test_extend_wraps_around_the_ring():
+    buffer = StreamBuffer(10)
+    buffer.extend(numpy.arange(7), numpy.arange(7))
+    buffer.extend(numpy.arange(7, 13), numpy.arange(7, 13))
+
+    assert buffer.total() == 13
+    assert buffer.filled() == 10
+    assert buffer.oldest() == 3
+    assert buffer.last() == 12
+    assert numpy.array_equal(buffer.latest(10), numpy.arange(3, 13))
+    assert numpy.array_equal(buffer.latest_times(4), numpy.arange(9, 13))
+
+
+def test_extend_longer_than_the_ring_keeps_the_newest():
+    buffer = StreamBuffer(10)
+    buffer.extend(numpy.arange(3), numpy.arange(3))
+    buffer.extend(numpy.arange(3, 28), numpy.arange(3, 28))
+
+    assert buffer.total() == 28
+    assert numpy.array_equal(buffer.latest(10), numpy.arange(18, 28))
+
+
+def test_segment_reads_by_absolute_index_across_the_wrap():
+    buffer = StreamBuffer(10)
+
+    for start in range(0, 25, 5):
+        buffer.extend(numpy.arange(start, start + 5), numpy.arange(start, start + 5))
+
+    assert numpy.array_equal(buffer.segment(15, 25), numpy.arange(15, 25))
+    assert numpy.array_equal(buffer.segment(17, 22), numpy.arange(17, 22))
+    assert len(buffer.segment(20, 20)) == 0
+
+
+def test_latest_before_the_ring_is_full():
+    buffer = StreamBuffer(10)
+    buffer.extend([1.0, 2.0, 3.0], [0.0, 1.0, 2.0])
+
+    assert buffer.filled() == 3
+    assert numpy.array_equal(buffer.latest(3), [1, 2, 3])
+
+
+def test_period_is_the_regression_slope_of_jittered_timestamps():
+    generator = numpy.random.default_rng(1)
+    times = 5.0 + numpy.arange(4096) * 1e-3 + generator.uniform(0, 5e-4, 4096)
+    buffer = StreamBuffer(8192)
+    buffer.extend(numpy.zeros(4096), times)
+
+    assert abs(buffer.period() - 1e-3) < 1e-6
+    assert abs(buffer.sampling_rate() - 1000) < 1
+
+
+def test_period_uses_the_latest_window_only():
+    buffer = StreamBuffer(1000, rate_window=100)
+    buffer.extend(numpy.zeros(500), numpy.arange(500) * 1.0)
+    buffer.extend(numpy.zeros(200), 500 + numpy.arange(200) * 0.5)
+
+    assert abs(buffer.period() - 0.5) < 1e-9
+
+
+def test_rate_is_unknown_below_two_samples():
+    buffer = StreamBuffer(10)
+    assert buffer.sampling_rate() == 0
+
+    buffer.append(1.0, 3.0)
+    assert buffer.period() == 0 and buffer.sampling_rate() == 0
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return condition()
+
+
+def test_sources_are_attached_and_drained_on_the_worker_thread(settings, application):
+    manager = ProcessorManager()
+    processor = manager.create('C0')
+    manager.start()
+    source = Source('C0')
+
+    try:
+        manager.attach(processor, source)
+        assert wait_for(lambda: processor.source is source)
+
+        if source.queue.put(Block(numpy.ones(10), timestamp=1.0, period=0.1)):
+            source.dataAvailable.emit()
+
+        assert wait_for(lambda: processor.received == 10)
+        assert processor.stage_threads['ingest'] == 'Processor C0'
+    finally:
+        manager.terminate(save=False)
+
+
+def test_each_channel_gets_its_own_worker_thread(settings, application):
+    manager = ProcessorManager()
+
+    for channel in Settings.channels():
+        manager.create(channel)
+
+    try:
+        manager.start()
+        assert [thread.objectName() for thread in manager.threads] == ['Processor C0', 'Processor C1']
+        assert [processor.thread() for processor in manager.processors] == manager.threads
+    finally:
+        manager.terminate(save=False)
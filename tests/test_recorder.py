@@ -0,0 +1,58 @@
+from desktop_client_hfr_voltage.payload import Block
+from desktop_client_hfr_voltage.recorder import CHUNK_RECORDS, CaptureFile, Recorder, open_capture
+from desktop_client_hfr_voltage.settings import Settings
+import numpy
+
+
+class FakeSource:
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.topic = '/test/' + channel.lower()
+        self.factor = 2.0
+        self.recorder = None
+
+
+def test_capture_file_round_trip(tmp_path):
+    path = str(tmp_path / 'c0.cap')
+    capture = CaptureFile(path, 'C0', '/test/c0', 2.0)
+    values = numpy.arange(CHUNK_RECORDS + 10, dtype=numpy.float64)
+    capture.write(values[:5], values[:5] / 10)
+    capture.write(values[5:], values[5:] / 10)
+    capture.close()
+
+    header, records = open_capture(path)
+    assert header['channel'] == 'C0' and header['topic'] == '/test/c0' and header['factor'] == 2.0
+    assert header['count'] == len(values)
+    assert numpy.array_equal(records['value'], values)
+    assert numpy.array_equal(records['time'], values / 10)
+
+
+def test_sources_created_while_recording_are_recorded(settings, tmp_path):
+    Settings.set('capture_directory', str(tmp_path))
+    recorder = Recorder()
+    recorder.start([])
+    assert recorder.is_recording()
+
+    source = FakeSource('C0')
+    recorder.attach(source)
+    assert source.recorder is not None
+
+    channel_recorder = source.recorder
+    channel_recorder.put(Block(numpy.array([1.0, 2.0]), timestamp=10.0, period=0.5))
+    channel_recorder.put(Block(numpy.array([3.0]), timestamp=11.0))
+    recorder.stop([source])
+
+    assert source.recorder is None and not recorder.is_recording()
+    header, records = open_capture(channel_recorder.files[0])
+    assert list(records['value']) == [1, 2, 3]
+    assert list(records['time']) == [10, 10.5, 11]
+
+
+def test_sources_are_not_recorded_when_stopped(settings, tmp_path):
+    Settings.set('capture_directory', str(tmp_path))
+    recorder = Recorder()
+    source = FakeSource('C0')
+    recorder.attach(source)
+
+    assert source.recorder is None
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,53 @@
+from desktop_client_hfr_voltage.recorder import CaptureFile
+from desktop_client_hfr_voltage.replay import ReplayStream, load_recording
+import numpy
+import time
+
+
+def capture(path: str, channel: str, values: numpy.ndarray, times: numpy.ndarray) -> str:
+    file = CaptureFile(path, channel, '/test/' + channel.lower(), 1.0)
+    file.write(values, times)
+    file.close()
+    return path
+
+
+def test_capture_replays_every_sample_with_its_time(settings, application, tmp_path):
+    values = numpy.random.default_rng(7).normal(size=20000)
+    times = 1000 + numpy.arange(20000) * 1e-3
+    path = capture(str(tmp_path / 'c0.cap'), 'C0', values, times)
+
+    stream = ReplayStream(ReplayStream.files_from_paths([path], ['C0', 'C1']), 0)
+    source = stream.branch('C0')
+    blocks = []
+
+    try:
+        deadline = time.monotonic() + 5
+
+        while sum(len(block) for block in blocks) < len(values) and time.monotonic() < deadline:
+            blocks.extend(source.queue.drain())
+            time.sleep(0.01)
+    finally:
+        stream.terminate()
+
+    assert numpy.array_equal(numpy.concatenate([block.values for block in blocks]), values)
+    assert numpy.array_equal(numpy.concatenate([block.times() for block in blocks]), times)
+    assert source.fraction() == 1
+
+
+def test_captures_name_their_channel_and_other_files_go_in_order(tmp_path):
+    path = capture(str(tmp_path / 'c1.cap'), 'C1', numpy.zeros(1), numpy.zeros(1))
+    files = ReplayStream.files_from_paths(['a.npy', path, 'b.csv'], ['C0', 'C1', 'C2'])
+
+    assert files == {'C0': ['a.npy'], 'C1': [path, 'b.csv']}
+
+
+def test_sample_files_are_timed_at_the_replay_rate(tmp_path):
+    numpy.save(tmp_path / 'a.npy', numpy.arange(4.0))
+    numpy.savetxt(tmp_path / 'b.csv', numpy.column_stack(([5.0, 6.0], [1.0, 2.0])), delimiter=',')
+
+    values, times = load_recording([str(tmp_path / 'a.npy')], 2.0, 100)
+    assert numpy.array_equal(values, [0, 2, 4, 6])
+    assert numpy.allclose(numpy.diff(times), 0.01)
+
+    values, times = load_recording([str(tmp_path / 'b.csv')], 1.0, 100)
+    assert numpy.array_equal(values, [1, 2]) and numpy.array_equal(times, [5, 6])
@@ -0,0 +1,103 @@
+from desktop_client_hfr_voltage.resampling import RESAMPLE_CUBIC, Interpolator, Polyphase, ratio
+import numpy
+import pytest
+
+
+def run(stage, values: numpy.ndarray, times: numpy.ndarray, cuts=()):
+    outputs = [stage.process(values[start:stop], times[start:stop])
+               for start, stop in zip([0, *cuts], [*cuts, len(values)])]
+    return numpy.concatenate([output[0] for output in outputs]), numpy.concatenate([output[1] for output in outputs])
+
+
+def test_ratio_reduces_the_fraction():
+    assert ratio(48000, 44100) == (160, 147)
+    assert ratio(500, 1000) == (1, 2)
+
+
+@pytest.mark.parametrize('nominal, rate', [(1000, 500), (1000, 2500), (44100, 48000), (1000, 1000)])
+def test_polyphase_matches_resample_poly(nominal, rate):
+    from scipy.signal import resample_poly
+
+    values = numpy.random.default_rng(4).normal(size=3000)
+    polyphase = Polyphase(nominal, rate)
+    output, times = run(polyphase, values, numpy.arange(3000) / nominal, [1, 500, 501, 2222])
+    # The stream repeats its first sample before it starts where resample_poly
+    # pads with zeros, so it is compared with resample_poly over a prefix of
+    # whole output periods of that sample.
+    periods = polyphase.width // polyphase.down + 1
+    prefix = numpy.full(periods * polyphase.down, values[0])
+    expected = resample_poly(numpy.concatenate((prefix, values)), polyphase.up, polyphase.down,
+                             window=('kaiser', 5.0))[periods * polyphase.up:]
+
+    assert len(output) > 0
+    assert numpy.allclose(output, expected[:len(output)])
+    assert numpy.allclose(times, numpy.arange(len(output)) * polyphase.down / (polyphase.up * nominal))
+
+
+# A 3 Hz tone sampled at about 1000 Hz with arrival jitter.
+def jittery(count: int = 4000):
+    generator = numpy.random.default_rng(5)
+    times = 50 + numpy.cumsum(generator.uniform(0.0005, 0.0015, count))
+    return numpy.sin(2 * numpy.pi * 3 * times), times
+
+
+def test_interpolation_lands_on_the_grid():
+    values, times = jittery()
+    output, grid = run(Interpolator(rate=1000), values, times, [3, 1000, 1001, 2500])
+
+    assert numpy.allclose(numpy.diff(grid), 0.001)
+    assert grid[0] == times[0] and grid[-1] < times[-1]
+    assert numpy.abs(output - numpy.sin(2 * numpy.pi * 3 * grid)).max() < 1e-4
+
+
+def test_cubic_interpolation_is_more_accurate_than_linear():
+    values, times = jittery()
+    errors = []
+
+    for method in ('linear', RESAMPLE_CUBIC):
+        output, grid = run(Interpolator(method, 1000), values, times, [700, 1900])
+        errors.append(numpy.abs(output - numpy.sin(2 * numpy.pi * 3 * grid)).max())
+
+    assert errors[1] < errors[0] / 100
+
+
+@pytest.mark.parametrize('method', ['linear', RESAMPLE_CUBIC])
+def test_interpolation_does_not_depend_on_block_boundaries(method):
+    values, times = jittery()
+    whole = run(Interpolator(method, 1000), values, times)
+    split = run(Interpolator(method, 1000), values, times, [1, 2, 3, 999, 1000, 3998])
+
+    # The whole run holds back the same trailing samples as the last block.
+    assert numpy.array_equal(whole[1], split[1])
+    assert numpy.allclose(whole[0], split[0])
+
+
+def test_grid_rate_is_measured_without_a_rate():
+    values, times = jittery()
+    interpolator = Interpolator()
+
+    assert len(interpolator.process(values[:100], times[:100])[0]) == 0
+
+    # The period is the mean over the samples held once there are enough.
+    output, grid = run(interpolator, values[100:], times[100:], [500])
+    expected = (times[599] - times[0]) / 599
+    assert interpolator.period == pytest.approx(expected)
+    assert grid[0] == times[0] and numpy.allclose(numpy.diff(grid), expected)
+
+
+def test_a_long_silence_restarts_the_grid_after_a_gap_sample():
+    times = numpy.concatenate((numpy.arange(100), 1e6 + numpy.arange(100))) * 0.001
+    output, grid = Interpolator(rate=1000).process(numpy.ones(200), times)
+
+    gaps = numpy.flatnonzero(numpy.isnan(output))
+    assert len(gaps) == 1
+    assert grid[gaps[0] + 1] == times[100]
+    assert numpy.allclose(numpy.diff(grid[gaps[0] + 1:]), 0.001)
+
+
+def test_a_clock_stepping_back_does_not_reorder_samples():
+    times = numpy.array([0.0, 0.001, 0.002, 0.0015, 0.004, 0.005])
+    output, grid = Interpolator(rate=1000).process(numpy.arange(6.0), times)
+
+    assert numpy.all(numpy.diff(grid) > 0)
+    assert numpy.all(numpy.diff(output) >= 0)
@@ -0,0 +1,59 @@
+from benchmarks.harness import FakeClient
+from desktop_client_hfr_voltage.payload import Block, PayloadError
+from desktop_client_hfr_voltage.processor import Processor
+from desktop_client_hfr_voltage.results import (Peaks, Publisher, Spectrum, Statistics, Subscriber,
+                                                decimate, decode_peaks, decode_spectrum, decode_statistics,
+                                                encode_peaks, encode_spectrum, encode_statistics)
+import numpy
+import pytest
+
+
+def test_result_payloads_round_trip():
+    statistics = decode_statistics(encode_statistics(Statistics(1, 2, 3, 4, 5, 6, 7), 1, 10.0))
+    assert vars(statistics) == vars(Statistics(1, 2, 3, 4, 5, 6, 7))
+
+    spectrum = decode_spectrum(encode_spectrum(Spectrum(numpy.array([1.0, 0.5]), 0.25, 0.5, 100), 2, 10.0))
+    assert list(spectrum.amplitude) == [1, 0.5]
+    assert list(spectrum.frequencies(True)) == [25, 75]
+
+    rows = numpy.array([[0.1, 2, 30, 0.01]])
+    peaks = decode_peaks(encode_peaks(Peaks(rows, 1000), 3, 10.0))
+    assert numpy.array_equal(peaks.converted(True), [[100, 2, 30, 10]])
+
+
+def test_payloads_of_another_kind_are_rejected():
+    payload = encode_statistics(Statistics(1, 2, 3, 4, 5, 6, 7), 1, 10.0)
+
+    with pytest.raises(PayloadError):
+        decode_spectrum(payload)
+
+    with pytest.raises(PayloadError):
+        decode_statistics(payload[:-1])
+
+
+def test_decimate_keeps_the_maximum_of_each_group():
+    amplitude = numpy.zeros(1025)
+    amplitude[513] = 7
+
+    decimated, width = decimate(amplitude, 512)
+    assert width == 3 and len(decimated) == 342
+    assert decimated[171] == 7 and decimated.sum() == 7
+    assert decimate(amplitude, 2048) == (amplitude, 1)
+
+
+def test_published_results_reach_the_subscriber(settings):
+    client = FakeClient()
+    processor = Processor('C0')
+    processor.publisher = Publisher(client)
+    processor.history = None
+    subscriber = Subscriber('C0', client)
+    means, spectra = [], []
+    subscriber.updateMean.connect(means.append)
+    subscriber.updateFFTChartData.connect(lambda x, y: spectra.append(y))
+
+    processor.on_blocks([Block(numpy.full(4000, 3.0), timestamp=0.0, period=1e-3)])
+    processor.process()
+
+    assert means == [3.0]
+    assert subscriber.received == 4000
+    assert len(spectra) == 1 and numpy.allclose(spectra[0], processor.spectrum.amplitude(), atol=1e-6)
@@ -0,0 +1,77 @@
+from desktop_client_hfr_voltage.processor import StreamBuffer
+from desktop_client_hfr_voltage.running import RunningStatistics
+import numpy
+import pytest
+
+
+def feed(values: numpy.ndarray, window: int, size: int = 4096, step: int = 97):
+    buffer = StreamBuffer(size)
+    statistics = RunningStatistics(window, size)
+
+    for start in range(0, len(values), step):
+        chunk = values[start:start + step]
+        buffer.extend(chunk, numpy.arange(start, start + len(chunk), dtype=numpy.float64))
+        statistics.update(buffer)
+
+    return buffer, statistics
+
+
+def test_matches_numpy_over_the_window():
+    values = 1000 + numpy.random.default_rng(4).normal(size=10000)
+    buffer, statistics = feed(values, 1500)
+    window = values[-1500:]
+
+    assert statistics.count() == 1500
+    assert statistics.mean() == pytest.approx(window.mean(), abs=1e-9)
+    assert statistics.deviation() == pytest.approx(window.std(), rel=1e-9)
+    assert statistics.rms() == pytest.approx(numpy.sqrt((window * window).mean()), rel=1e-9)
+    assert statistics.extremes(buffer) == (window.min(), window.max())
+
+
+def test_gap_samples_are_left_out():
+    values = numpy.random.default_rng(5).normal(size=3000)
+    values[2500:2600] = numpy.nan
+    buffer, statistics = feed(values, 1000)
+    window = values[-1000:]
+    finite = window[~numpy.isnan(window)]
+
+    assert statistics.gaps() == 100
+    assert statistics.count() == 900
+    assert statistics.mean() == pytest.approx(finite.mean(), abs=1e-12)
+    assert statistics.deviation() == pytest.approx(finite.std(), rel=1e-9)
+    assert statistics.extremes(buffer) == (finite.min(), finite.max())
+
+
+def test_gaps_leave_the_window():
+    values = numpy.ones(3000)
+    values[100:200] = numpy.nan
+    _, statistics = feed(values, 1000)
+
+    assert statistics.gaps() == 0
+    assert statistics.count() == 1000 and statistics.mean() == 1
+
+
+def test_rebuild_with_a_new_window():
+    values = numpy.arange(5000, dtype=numpy.float64)
+    buffer, statistics = feed(values, 1000)
+    statistics.rebuild(buffer, 200)
+
+    assert statistics.count() == 200
+    assert statistics.mean() == pytest.approx(values[-200:].mean())
+    assert statistics.extremes(buffer) == (4800, 4999)
+
+
+def test_window_larger_than_the_samples():
+    buffer, statistics = feed(numpy.array([1.0, 3.0]), 1000)
+
+    assert statistics.count() == 2 and statistics.mean() == 2
+    assert statistics.extremes(buffer) == (1, 3)
+
+
+def test_empty_window():
+    buffer = StreamBuffer(100)
+    statistics = RunningStatistics(10, 100)
+    statistics.update(buffer)
+
+    assert statistics.mean() == 0 and statistics.deviation() == 0
+    assert statistics.extremes(buffer) == (0, 0)
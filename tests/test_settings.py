@@ -0,0 +1,106 @@
+from desktop_client_hfr_voltage.settings import Settings, SettingsError, SettingsWatcher
+import pytest
+import re
+
+
+def test_channels_are_groups_with_a_topic_in_natural_order(settings):
+    for channel in ('C10', 'C2', 'Probe'):
+        Settings.set_for_channel(channel, 'topic', '/test/' + channel.lower())
+
+    Settings.set('MQTT/host', 'localhost')
+    Settings.set_for_channel('Notes', 'title', 'no topic')
+
+    assert Settings.channels() == ['C0', 'C1', 'C2', 'C10', 'Probe']
+
+
+@pytest.mark.parametrize('key, value, message', [
+    ('C0/waterfall_fft_size', 32, 'C0/waterfall_fft_size: 32 is outside 64:16384'),
+    ('C0/waterfall_hop', 20000, 'C0/waterfall_hop: 20000 is outside 64:16384'),
+    ('C0/waterfall_hop', 2048, 'C0/waterfall_hop must not exceed waterfall_fft_size'),
+    ('C0/trigger_post', 59900, 'C0/trigger_post: 59900 is outside 50:30000'),
+    ('MQTT/qos', 2, 'MQTT/qos: expected 0 or 1, got 2'),
+    ('C1/fft_window', 'square', 'C1/fft_window: expected one of'),
+])
+def test_invalid_settings_are_rejected_on_reload(settings, key, value, message):
+    Settings.settings.setValue(key, value)
+
+    with pytest.raises(SettingsError, match=re.escape(message)):
+        Settings.reload()
+
+
+def test_waterfall_size_cannot_exceed_the_sample_buffer(settings):
+    Settings.settings.setValue('processing_size_range', '1000:2000:500')
+    Settings.settings.setValue('C0/waterfall_fft_size', 4096)
+
+    with pytest.raises(SettingsError, match='C0/waterfall_fft_size: 4096 exceeds 2000 samples'):
+        Settings.reload()
+
+
+def test_set_updates_the_snapshot_in_place(settings):
+    snapshot = Settings.snapshot()
+
+    Settings.set_for_channel('C0', 'waterfall_hop', '256')
+    Settings.set('columns', 0)
+    Settings.set('results_topic', 'site/results/')
+
+    assert Settings.snapshot() is snapshot
+    assert Settings.channel('C0').waterfall_hop == 256
+    assert Settings.general().columns == 1
+    assert Settings.general().results_topic == 'site/results'
+    assert Settings.get_for_channel('C0', 'waterfall_hop') == '256'
+
+
+def test_set_rejects_a_value_it_cannot_parse(settings):
+    with pytest.raises(SettingsError, match='C0/fft_averaging: expected one of'):
+        Settings.set_for_channel('C0', 'fft_averaging', 'median')
+
+    assert Settings.channel('C0').fft_averaging == 'linear'
+    assert Settings.get_for_channel('C0', 'fft_averaging') == 'linear'
+
+
+def test_set_leaves_new_channels_to_the_next_reload(settings):
+    Settings.set_for_channel('C2', 'topic', '/test/c2')
+    Settings.set('reset', 1)
+
+    assert 'C2' not in Settings.snapshot().channels
+    assert 'C2' in Settings.reload().channels
+
+
+def watch():
+    watcher = SettingsWatcher()
+    changed, rejected = [], []
+    watcher.channelChanged.connect(lambda config, changes: changed.append((config.channel, changes)))
+    watcher.settingsRejected.connect(rejected.append)
+    return watcher, changed, rejected
+
+
+def test_watcher_reports_the_changed_fields(settings, application):
+    watcher, changed, rejected = watch()
+    Settings.settings.setValue('C1/fft_window', 'blackman')
+    Settings.settings.setValue('C1/broker', 'elsewhere')
+    watcher.reload()
+
+    assert changed == [('C1', {'fft_window'})]
+    assert rejected == ['C1/broker not applied: restart required']
+    assert watcher.snapshot is Settings.snapshot()
+
+
+def test_watcher_keeps_the_snapshot_of_an_invalid_edit(settings, application):
+    watcher, changed, rejected = watch()
+    snapshot = watcher.snapshot
+    Settings.settings.setValue('C0/waterfall_hop', 4096)
+    watcher.reload()
+
+    assert changed == []
+    assert rejected == ['Settings not applied: C0/waterfall_hop must not exceed waterfall_fft_size']
+    assert watcher.snapshot is snapshot
+
+
+def test_watcher_asks_for_a_restart_to_add_or_remove_channels(settings, application):
+    watcher, changed, rejected = watch()
+    Settings.settings.setValue('C2/topic', '/test/c2')
+    Settings.settings.remove('C1')
+    watcher.reload()
+
+    assert changed == []
+    assert rejected == ['Channel C2 added: restart required', 'Channel C1 removed: restart required']
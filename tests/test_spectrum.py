@@ -0,0 +1,148 @@
+from desktop_client_hfr_voltage.processor import StreamBuffer
+from desktop_client_hfr_voltage.spectrum import (AVERAGING_LINEAR, AVERAGING_NONE, PeakTracker, SpectrumEngine,
+                                                 Spectrogram, find_peaks, get_amplitude_scale, segment_power)
+import numpy
+
+
+def storage(values: numpy.ndarray, size: int = 65536) -> StreamBuffer:
+    buffer = StreamBuffer(size)
+    buffer.extend(values, numpy.arange(len(values), dtype=numpy.float64))
+    return buffer
+
+
+def test_sine_amplitude_is_read_at_its_bin():
+    n = numpy.arange(4096)
+    engine = SpectrumEngine(1024, 4096, 'boxcar')
+    engine.update(storage(3 * numpy.sin(2 * numpy.pi * 100 * n / 1024) + 2 * numpy.cos(numpy.pi * n)))
+
+    amplitude = engine.amplitude()
+    assert abs(amplitude[100] - 3) < 1e-9
+    # The Nyquist bin has no negative-frequency twin, so it is not doubled.
+    assert abs(amplitude[-1] - 2) < 1e-9
+
+
+def test_dc_and_nyquist_bins_are_scaled_by_half():
+    scale = get_amplitude_scale('hann', 1024, 1024)
+
+    assert scale[0] == scale[1] / 2 and scale[-1] == scale[1] / 2
+
+    # An odd transform length has no Nyquist bin.
+    odd = get_amplitude_scale('hann', 1024, 1025)
+    assert odd[0] == odd[1] / 2 and odd[-1] == odd[1]
+
+
+def test_linear_average_covers_exactly_the_span():
+    # 1021 samples are transformed at 1024 points: the span fits 14 of them.
+    engine = SpectrumEngine(1021, 8161, 'hann', AVERAGING_LINEAR)
+    values = numpy.random.default_rng(2).normal(size=20000)
+    engine.update(storage(values))
+
+    assert engine.nfft == 1024 and len(engine._history) == 14
+
+    hop = engine.hop
+    starts = 20000 - 1021 - numpy.arange(14)[::-1] * hop
+    frames = numpy.stack([values[start:start + 1021] for start in starts])
+    expected = segment_power(frames, engine._taper, engine.nfft).mean(axis=0)
+    assert numpy.allclose(engine._power, expected)
+
+
+def test_incremental_updates_match_one_update():
+    values = numpy.random.default_rng(3).normal(size=12288)
+    whole = SpectrumEngine(512, 4096, 'hann', AVERAGING_LINEAR)
+    whole.update(storage(values))
+
+    pieces = SpectrumEngine(512, 4096, 'hann', AVERAGING_LINEAR)
+    buffer = StreamBuffer(65536)
+
+    for start in range(0, 12288, 700):
+        buffer.extend(values[start:start + 700], numpy.arange(start, min(start + 700, 12288)) * 1.0)
+        pieces.update(buffer)
+
+    assert numpy.allclose(pieces.amplitude(), whole.amplitude())
+
+
+def test_gaps_do_not_poison_the_spectrum():
+    values = numpy.sin(numpy.arange(4096) / 10)
+    values[1000:1010] = numpy.nan
+    engine = SpectrumEngine(1024, 4096, 'hann', AVERAGING_NONE)
+
+    assert engine.update(storage(values))
+    assert numpy.isfinite(engine.amplitude()).all()
+
+
+def test_not_ready_before_a_whole_segment():
+    engine = SpectrumEngine(1024, 4096)
+
+    assert not engine.update(storage(numpy.zeros(1000)))
+    assert not engine.ready()
+
+
+def test_spectrogram_adds_one_row_per_hop():
+    n = numpy.arange(65536)
+    buffer = StreamBuffer(65536)
+    spectrogram = Spectrogram(256, 128, 100, 'boxcar')
+    buffer.extend(numpy.sin(2 * numpy.pi * 32 * n[:1024] / 256), n[:1024] * 1.0)
+
+    rows = spectrogram.update(buffer)
+    assert rows.shape == (1, 129)
+    assert rows[0].argmax() == 32 and abs(rows[0, 32] - 1) < 1e-6
+    assert spectrogram.update(buffer) is None
+
+    buffer.extend(numpy.zeros(640), n[1024:1664] * 1.0)
+    assert len(spectrogram.update(buffer)) == 5
+
+
+def test_spectrogram_skips_rows_beyond_its_history():
+    buffer = StreamBuffer(65536)
+    spectrogram = Spectrogram(256, 128, 10)
+    spectrogram.update(buffer)
+    buffer.extend(numpy.zeros(10000), numpy.arange(10000.0))
+
+    assert len(spectrogram.update(buffer)) == 10
+
+
+def lines(*peaks: tuple[float, float], size: int = 512) -> numpy.ndarray:
+    bins = numpy.arange(size, dtype=numpy.float64)
+    return sum(height * numpy.exp(-(bins - centre) ** 2 / 18) for centre, height in peaks)
+
+
+def test_gaussian_peaks_are_located_between_bins():
+    position, height, width = find_peaks(lines((100.3, 1), (300.75, 2), (400, 0.5)), 2)
+
+    assert numpy.allclose(position, [300.75, 100.3])
+    assert numpy.allclose(height, [2, 1])
+    # Half-power width of a gaussian with a deviation of three bins.
+    assert numpy.allclose(width, 2 * numpy.sqrt(numpy.log(2)) * 3)
+
+
+def test_parabolic_interpolation_stays_near_the_peak():
+    position, height, _ = find_peaks(lines((100.3, 1)), 1, 'parabolic')
+
+    assert abs(position[0] - 100.3) < 0.1 and 0.95 < height[0] <= 1.05
+
+
+def test_a_single_track_gets_a_drift():
+    tracker = PeakTracker(1)
+    tracker.update(lines((100, 1)), 0.5, 10.0)
+    rows = tracker.update(lines((101, 1)), 0.5, 11.0)
+
+    assert numpy.allclose(rows[:, 0], [50.5])
+    assert numpy.allclose(rows[:, 3], [PeakTracker.SMOOTHING * 0.5])
+
+
+def test_peaks_continue_the_nearest_track_within_tolerance():
+    tracker = PeakTracker(3)
+    tracker.update(lines((100, 1), (200, 2), (300, 3)), 1.0, 0.0)
+    rows = tracker.update(lines((99, 1), (202, 2), (310, 3)), 1.0, 2.0)
+
+    drifts = dict(zip(numpy.round(rows[:, 0]), rows[:, 3]))
+    assert numpy.isclose(drifts[99], PeakTracker.SMOOTHING * -0.5)
+    assert numpy.isclose(drifts[202], PeakTracker.SMOOTHING)
+    assert drifts[310] == 0
+
+
+def test_tracker_returns_the_same_rows_without_new_samples():
+    tracker = PeakTracker(1)
+    rows = tracker.update(lines((100, 1)), 1.0, 5.0)
+
+    assert tracker.update(lines((120, 1)), 1.0, 5.0) is rows
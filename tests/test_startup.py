@@ -0,0 +1,32 @@
+import os
+import pytest
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_after_import(module: str) -> set[str]:
+    code = ('import sys, {}\n'
+            'print(" ".join(sorted({{name.split(".")[0] for name in sys.modules}})))').format(module)
+    environment = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=environment,
+                            capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+@pytest.mark.parametrize('module', [
+    'desktop_client_hfr_voltage.__main__',
+    'desktop_client_hfr_voltage.settings',
+    'desktop_client_hfr_voltage.headless',
+])
+def test_entry_modules_load_neither_scipy_nor_pyqtgraph(module):
+    assert not loaded_after_import(module) & {'scipy', 'pyqtgraph'}
+
+
+@pytest.mark.parametrize('module', [
+    'desktop_client_hfr_voltage.processor',
+    'desktop_client_hfr_voltage.controller',
+])
+def test_processing_loads_scipy_on_first_use(module):
+    assert 'scipy' not in loaded_after_import(module)
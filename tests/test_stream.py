@@ -0,0 +1,360 @@
+from benchmarks.harness import FakeClient
+from desktop_client_hfr_voltage.payload import Block, encode_binary
+from desktop_client_hfr_voltage.settings import Settings
+from desktop_client_hfr_voltage.stream import (Backoff, Connection, SequenceTracker, Source, StagingQueue, Stream,
+                                               subscription_filters)
+import numpy
+import pytest
+
+
+def block(start: int, count: int) -> Block:
+    return Block(numpy.arange(start, start + count, dtype=numpy.float64), timestamp=float(start), period=1.0)
+
+
+# Message number index of a producer sending ten samples a message.
+def message(index: int, sequence: int | None = None) -> Block:
+    numbered = block(10 * index, 10)
+    numbered.sequence = index if sequence is None else sequence
+    return numbered
+
+
+def sequences(blocks: list[Block]) -> list:
+    return ['gap' if item.gap else item.sequence for item in blocks]
+
+
+def test_shed_skips_only_the_overflow():
+    queue = StagingQueue(1000)
+    queue.put(block(0, 1001))
+
+    assert queue.shed == 1
+    assert queue.depth() == 1001
+
+    gap, kept = queue.drain()
+    assert gap.gap and len(gap) == 1
+    assert numpy.isnan(gap.values).all()
+    assert list(gap.times()) == [0.0]
+    assert len(kept) == 1000 and kept.values[0] == 1 and kept.times()[0] == 1
+
+
+def test_repeated_overflow_merges_into_one_gap_sample():
+    queue = StagingQueue(1000)
+
+    for start in range(0, 2000, 100):
+        queue.put(block(start, 100))
+
+    assert queue.shed == 1000
+
+    blocks = queue.drain()
+    gaps = [item for item in blocks if item.gap]
+    assert len(gaps) == 1 and len(gaps[0]) == 1 and blocks[0] is gaps[0]
+    assert 0 <= gaps[0].times()[0] < 1000
+
+    values = numpy.concatenate([item.values for item in blocks[1:]])
+    assert numpy.array_equal(values, numpy.arange(1000, 2000))
+
+
+def test_no_shed_within_the_limit():
+    queue = StagingQueue(1000)
+
+    for start in range(0, 1000, 100):
+        queue.put(block(start, 100))
+
+    assert queue.shed == 0
+    assert not any(item.gap for item in queue.drain())
+
+
+def test_put_reports_only_the_first_block_after_a_drain():
+    queue = StagingQueue()
+
+    assert queue.put(block(0, 10))
+    assert not queue.put(block(10, 10))
+    assert queue.depth() == 20
+    assert [len(item) for item in queue.drain()] == [10, 10]
+    assert queue.depth() == 0
+    assert queue.put(block(20, 10))
+
+
+class Message:
+    def __init__(self, payload: bytes, topic: str = '/test/c0'):
+        self.payload = payload
+        self.topic = topic
+
+
+def test_source_signals_once_per_drain(settings):
+    source = Source('C0')
+    signals = []
+    source.dataAvailable.connect(lambda: signals.append(1))
+
+    for value in range(5):
+        source.on_message(None, None, Message(str(value).encode()))
+
+    assert len(signals) == 1
+    values = numpy.concatenate([item.values for item in source.queue.drain()])
+    assert numpy.array_equal(values, numpy.arange(5))
+
+    source.on_message(None, None, Message(b'5'))
+    assert len(signals) == 2
+
+
+def test_source_counts_undecodable_messages(settings):
+    source = Source('C0')
+    source.on_message(None, None, Message(b'not a number'))
+
+    assert source.dropped == 1 and source.lost() == 1
+    assert source.queue.depth() == 0
+
+
+def test_tracker_passes_unnumbered_blocks_through():
+    tracker = SequenceTracker(4, 1000)
+    unnumbered = block(0, 10)
+
+    assert tracker.accept(unnumbered) == [unnumbered]
+    assert tracker.expected is None
+
+
+def test_tracker_reorders_within_the_window():
+    tracker = SequenceTracker(4, 1000)
+
+    assert sequences(tracker.accept(message(0))) == [0]
+    assert tracker.accept(message(2)) == []
+    assert tracker.accept(message(3)) == []
+    assert sequences(tracker.accept(message(1))) == [1, 2, 3]
+    assert tracker.counters() == {'gaps': 0, 'missing': 0, 'duplicates': 0, 'reordered': 1, 'late': 0,
+                                  'restarts': 0}
+
+
+def test_tracker_counts_duplicates_released_and_pending():
+    tracker = SequenceTracker(4, 1000)
+    tracker.accept(message(0))
+    tracker.accept(message(2))
+
+    assert tracker.accept(message(0)) == []
+    assert tracker.accept(message(2)) == []
+    assert tracker.duplicates == 2
+
+
+def test_tracker_fills_a_lost_message_with_a_gap_of_its_samples():
+    tracker = SequenceTracker(2, 1000)
+    tracker.accept(message(0))
+
+    assert tracker.accept(message(2)) == []
+    assert tracker.accept(message(3)) == []
+
+    released = tracker.accept(message(4))
+    assert sequences(released) == ['gap', 2, 3, 4]
+    assert tracker.gaps == 1 and tracker.missing == 10
+    assert numpy.isnan(released[0].values).all()
+    assert 9 < released[0].times()[0] < 20
+
+    # The lost message arriving after its slot was given up is late.
+    assert tracker.accept(message(1)) == []
+    assert tracker.late == 1 and tracker.duplicates == 0
+
+
+def test_tracker_caps_the_gap_length():
+    tracker = SequenceTracker(0, 5)
+    tracker.accept(message(0))
+
+    released = tracker.accept(message(3))
+    assert sequences(released) == ['gap', 3]
+    assert len(released[0]) == 5
+    assert tracker.missing == 20
+
+
+def test_tracker_follows_the_sequence_across_the_wrap():
+    tracker = SequenceTracker(4, 1000)
+    first = SequenceTracker.MODULO - 2
+    released = []
+
+    for index, sequence in enumerate([first, first + 1, 0, 1]):
+        released += tracker.accept(message(index, sequence))
+
+    assert sequences(released) == [first, first + 1, 0, 1]
+    assert tracker.counters() == {'gaps': 0, 'missing': 0, 'duplicates': 0, 'reordered': 0, 'late': 0,
+                                  'restarts': 0}
+
+
+def test_tracker_restarts_on_a_jump_in_either_direction():
+    tracker = SequenceTracker(4, 1000)
+    tracker.accept(message(0, 5000000))
+    tracker.accept(message(2, 5000002))
+
+    # The producer restarted: the pending message of the old run is dropped.
+    assert sequences(tracker.accept(message(3, 0))) == [0]
+    assert sequences(tracker.accept(message(4, 1))) == [1]
+    assert sequences(tracker.accept(message(5, 5000000))) == [5000000]
+    assert tracker.restarts == 2 and tracker.gaps == 0
+
+
+@pytest.mark.parametrize('topics, excluded, filters', [
+    (['site/a/u', 'site/b/u', 'site/a/u'], (), ['site/#']),
+    (['/test/c0', '/test/c1'], (), ['/test/#']),
+    (['/c0', '/c1'], (), ['/c0', '/c1']),
+    (['site/a/u'], (), ['site/a/u']),
+    (['site/a/u', 'site/+/i'], (), ['site/+/i', 'site/a/u']),
+    (['site/a/u', 'site/b/u'], ['site/c/u'], ['site/a/u', 'site/b/u']),
+    (['site/a/u', 'site/b/u'], ['other/c/u'], ['site/#']),
+])
+def test_subscription_filters(topics, excluded, filters):
+    assert subscription_filters(topics, True, excluded) == filters
+
+
+def test_subscription_filters_without_wildcard():
+    assert subscription_filters(['site/b/u', 'site/a/u'], False) == ['site/a/u', 'site/b/u']
+
+
+class RecordingClient(FakeClient):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.calls = []
+
+    def subscribe(self, topic, qos=0):
+        self.calls.append(('subscribe', [item[0] for item in topic]))
+        return 0, 1
+
+    def unsubscribe(self, topic):
+        self.calls.append(('unsubscribe', topic))
+        return 0, 1
+
+
+def test_connection_dispatches_by_topic_and_pattern(settings):
+    Settings.set_for_channel('C1', 'topic', '/test/+/c1')
+    connection = Connection('localhost', FakeClient(), True)
+    first, second = Source('C0'), Source('C1')
+    connection.add(first)
+    connection.add(second)
+
+    connection.on_message(None, None, Message(b'1', '/test/c0'))
+    connection.on_message(None, None, Message(b'2', '/test/rack/c1'))
+    connection.on_message(None, None, Message(b'3', '/test/c2'))
+
+    assert [block.values[0] for block in first.queue.drain()] == [1]
+    assert [block.values[0] for block in second.queue.drain()] == [2]
+
+    connection.remove(first)
+    connection.on_message(None, None, Message(b'4', '/test/c0'))
+    assert first.queue.depth() == 0
+
+
+def test_connection_sync_subscribes_before_unsubscribing(settings):
+    client = RecordingClient()
+    connection = Connection('localhost', client, True)
+    first = Source('C0')
+    connection.add(first)
+    connection.sync()
+    connection.sync()
+
+    assert client.calls == [('subscribe', ['/test/c0'])]
+
+    connection.add(Source('C1'))
+    connection.sync()
+    assert client.calls[1:] == [('subscribe', ['/test/#']), ('unsubscribe', ['/test/c0'])]
+
+    connection.remove(first)
+    connection.sync()
+    assert client.calls[3:] == [('subscribe', ['/test/c1']), ('unsubscribe', ['/test/#'])]
+
+
+def test_channels_are_spread_over_connections_per_broker(settings, application):
+    Settings.set('MQTT/connections', 2)
+
+    for channel in ('C2', 'C3'):
+        Settings.set_for_channel(channel, 'topic', '/test/' + channel.lower())
+
+    Settings.set_for_channel('C3', 'broker', 'remote')
+    Settings.reload()
+    stream = Stream(FakeClient)
+
+    try:
+        hosts = [stream.connection(channel).host for channel in ('C0', 'C1', 'C2', 'C3')]
+        assert hosts == ['localhost', 'localhost', 'localhost', 'remote']
+        assert len(stream.connections) == 3
+        assert stream.connection('C0') is stream.connection('C2') is not stream.connection('C1')
+    finally:
+        stream.terminate()
+
+
+def test_backoff_doubles_up_to_the_maximum_and_resets():
+    backoff = Backoff(0.5, 4)
+
+    for ceiling in (0.5, 1, 2, 4, 4, 4):
+        assert ceiling / 2 <= backoff.next() <= ceiling
+
+    backoff.reset()
+    assert 0.25 <= backoff.next() <= 0.5
+
+
+def binary_source() -> Source:
+    Settings.set_for_channel('C0', 'payload_format', 'binary')
+    return Source('C0')
+
+
+# Ten samples a message at 100 samples per second.
+def send(source: Source, start: int, period: float = 0.01):
+    values = numpy.arange(start, start + 10)
+    source.on_message(None, None, Message(encode_binary(values, 0, 1000 + start * 0.01, period)))
+
+
+def test_reconnect_fills_the_missed_samples_with_a_gap(settings):
+    source = binary_source()
+    resumed = []
+    source.resumed.connect(resumed.append)
+    send(source, 0)
+    send(source, 10)
+
+    source.resume()
+    send(source, 120)
+    send(source, 130)
+
+    blocks = source.queue.drain()
+    assert [item.gap for item in blocks] == [False, False, True, False, False]
+    assert len(blocks[2]) == 100 and source.missing == 100 and source.lost() == 100
+    assert numpy.all((blocks[2].times() > 1000.19) & (blocks[2].times() < 1001.2))
+    assert len(resumed) == 1 and source.reconnects == 1
+    assert source.counters()['missing'] == 100
+
+
+def test_reconnect_without_a_lost_sample_adds_no_gap(settings):
+    source = binary_source()
+    send(source, 0)
+    source.resume()
+    send(source, 10)
+
+    assert not any(item.gap for item in source.queue.drain())
+    assert source.missing == 0 and source.reconnects == 1
+
+
+def test_reconnect_gap_is_capped_and_marks_an_unknown_rate(settings):
+    source = binary_source()
+    source.gap_limit = 500
+    send(source, 0)
+    source.resume()
+    send(source, 1000)
+
+    gap = [item for item in source.queue.drain() if item.gap]
+    assert len(gap[0]) == 500 and source.missing == 990
+
+    unknown = Source('C1')
+    unknown.on_message(None, None, Message(b'1', '/test/c1'))
+    unknown.resume()
+    unknown.on_message(None, None, Message(b'2', '/test/c1'))
+
+    gap = [item for item in unknown.queue.drain() if item.gap]
+    assert len(gap) == 1 and len(gap[0]) == 1
+
+
+def test_connecting_resumes_every_source_and_resets_the_backoff(settings):
+    connection = Connection('localhost', FakeClient(), True, persistent=True)
+    sources = [Source('C0'), Source('C1')]
+    states = []
+    connection.notify = states.append
+
+    for source in sources:
+        connection.add(source)
+
+    connection.backoff.next()
+    connection.on_connect(None, None, {'session present': 1}, 0)
+
+    assert [source.reconnects for source in sources] == [1, 1]
+    assert connection.backoff.attempts == 0
+    assert connection.session_present and states == [True]
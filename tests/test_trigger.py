@@ -0,0 +1,78 @@
+from desktop_client_hfr_voltage.processor import StreamBuffer
+from desktop_client_hfr_voltage.trigger import SLOPE_BOTH, SLOPE_FALLING, Trigger
+import numpy
+
+
+# A square wave of the given period, low for the first half of each period.
+def square(count: int, period: int = 100) -> numpy.ndarray:
+    return numpy.where(numpy.arange(count) % period < period // 2, -1.0, 1.0)
+
+
+def feed(trigger: Trigger, values: numpy.ndarray, size: int = 4096, block: int = 0) -> StreamBuffer:
+    buffer = StreamBuffer(size)
+
+    for start in range(0, len(values), block or len(values)):
+        chunk = values[start:start + (block or len(values))]
+        buffer.extend(chunk, numpy.arange(start, start + len(chunk), dtype=numpy.float64))
+        trigger.update(buffer)
+
+    return buffer
+
+
+def test_frames_are_aligned_on_the_crossing():
+    trigger = Trigger(0, pre=10, post=40)
+    feed(trigger, square(1000))
+
+    # Rising edges at 50, 150, ..., 950.
+    assert trigger.triggers == 10
+    assert numpy.array_equal(trigger.frame(), numpy.where(trigger.offsets() < 0, -1.0, 1.0))
+
+
+def test_falling_and_both_slopes():
+    falling = Trigger(0, SLOPE_FALLING, pre=10, post=20)
+    both = Trigger(0, SLOPE_BOTH, pre=10, post=20)
+    feed(falling, square(1000))
+    feed(both, square(1000))
+
+    assert falling.triggers == 9
+    assert numpy.array_equal(falling.frame(), numpy.where(falling.offsets() < 0, 1.0, -1.0))
+    assert both.triggers == 19
+
+
+def test_holdoff_skips_crossings():
+    trigger = Trigger(0, pre=0, post=10, holdoff=250)
+    feed(trigger, square(1000))
+
+    # Edges at 50, 150, ... are taken every third one.
+    assert trigger.triggers == 4
+
+
+def test_updates_in_blocks_find_the_same_frames():
+    values = square(3000, 70) + numpy.random.default_rng(1).normal(0, 0.01, 3000)
+    whole = Trigger(0, pre=30, post=50, holdoff=90, averages=8)
+    blocks = Trigger(0, pre=30, post=50, holdoff=90, averages=8)
+    feed(whole, values)
+    feed(blocks, values, size=512, block=37)
+
+    assert whole.triggers == blocks.triggers
+    assert numpy.allclose(whole.frame(), blocks.frame())
+
+
+def test_frames_are_averaged_over_the_newest():
+    values = square(1000) * numpy.repeat([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0], 100)
+    trigger = Trigger(0, pre=0, post=10, averages=3)
+    feed(trigger, values)
+
+    # Frames of the rising edges at 750, 850 and 950.
+    assert numpy.allclose(trigger.frame(), 9.0)
+
+
+def test_frames_with_gaps_are_left_out():
+    values = square(400)
+    values[160] = numpy.nan
+    trigger = Trigger(0, pre=0, post=20)
+    feed(trigger, values)
+
+    # The edge at 150 still counts, but its frame is not averaged.
+    assert trigger.triggers == 4
+    assert trigger.ready() and numpy.array_equal(trigger.frame(), numpy.ones(20))
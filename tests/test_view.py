@@ -0,0 +1,69 @@
+from PyQt6 import QtCore, QtGui
+from desktop_client_hfr_voltage.view import StreamWidget, WaterfallImage
+import numpy
+
+
+def render(image: WaterfallImage) -> QtGui.QImage:
+    rect = image.boundingRect()
+    target = QtGui.QImage(int(rect.width()), int(rect.height()), QtGui.QImage.Format.Format_RGB32)
+    painter = QtGui.QPainter(target)
+    image.paint(painter)
+    painter.end()
+    return target
+
+
+def test_rows_fill_a_ring_oldest_first(application):
+    image = WaterfallImage(4, 'linear')
+    image.add_rows(numpy.array([[0.0, 0.0], [1.0, 1.0]]))
+    image.add_rows(numpy.array([[2.0, 2.0], [3.0, 3.0], [4.0, 4.0]]))
+
+    assert image.boundingRect() == QtCore.QRectF(0, 0, 2, 4)
+    assert image.filled == 4
+    assert list(image.history()[:, 0]) == [1, 2, 3, 4]
+
+    image.refresh_levels()
+    target = render(image)
+    # Item y grows upwards in the plot, so the oldest row is drawn at y = 0.
+    rows = [QtGui.QColor(target.pixel(0, y)).value() for y in range(4)]
+    assert rows == sorted(rows) and rows[0] < rows[-1]
+
+
+def test_history_change_keeps_the_newest_rows(application):
+    image = WaterfallImage(5, 'log')
+    image.add_rows(numpy.arange(1, 4, dtype=numpy.float32)[:, None] * numpy.ones((1, 3)))
+    image.set_history(2)
+
+    assert image.rows.shape == (2, 3)
+    assert list(image.history()[:, 0]) == [2, 3]
+
+    image.set_history(6)
+    assert list(image.history()[:, 0]) == [2, 3]
+
+
+def test_new_bin_count_starts_over(application):
+    image = WaterfallImage(3, 'log')
+    image.add_rows(numpy.ones((2, 4)))
+    image.add_rows(numpy.ones((1, 8)))
+
+    assert image.rows.shape == (3, 8) and image.filled == 1
+
+
+def test_levels_follow_the_scale(application):
+    image = WaterfallImage(3, 'linear')
+    image.add_rows(numpy.array([[1.0, 100.0]]))
+    linear = image.levels
+    image.set_scale('log')
+
+    assert linear[1] > 90 and image.levels[1] < 41
+
+
+def test_hidden_tabs_are_built_when_first_shown(settings, application):
+    widget = StreamWidget('C0', None)
+    assert widget.fft_tab is None and widget.waterfall_tab is None
+
+    widget.tab.setCurrentIndex(2)
+    assert widget.fft_tab is None and widget.waterfall_tab is not None
+
+    widget.tab.setCurrentIndex(1)
+    assert widget.fft_tab is not None
+    assert widget.waterfall_tab.hop_selector.selector.maximum() == 1024